@@ -0,0 +1,104 @@
+"""
+A global, bounded pool of the documents that have cached data (HTML trees, offset converters, artifacts like DNMs).
+
+Documents keep the data derived from their content until they are released (see :meth:`Document.release_artifacts`).
+In long-running jobs over many documents, lingering references to documents can keep lots of HTML trees alive.
+If a memory budget is set (``--document-memory-budget``), the pool keeps track of the documents with cached data
+and releases the least recently used ones once the memory of the cached data exceeds the budget.
+Documents that are currently used can be pinned (``with document: ...``), which prevents them from being released.
+
+The memory is only estimated based on the size of the document
+(e.g. an lxml tree needs about 10 bytes per byte of HTML).
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import weakref
+from collections import OrderedDict
+from typing import Optional, TYPE_CHECKING
+
+from spotterbase.utils.config_loader import ConfigExtension, ConfigLoader
+
+if TYPE_CHECKING:
+    from spotterbase.corpora.interface import Document
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentArtifactPool:
+    def __init__(self, budget: Optional[int] = None):
+        self.budget: Optional[int] = budget     # in bytes (None: documents are not tracked)
+        # id of the document -> (weak reference to the document, estimated memory)
+        # (the least recently used document comes first)
+        self._documents: OrderedDict[int, tuple[weakref.ref[Document], int]] = OrderedDict()
+        self.total_memory: int = 0
+        self.number_of_evictions: int = 0
+
+    def is_enabled(self) -> bool:
+        return self.budget is not None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def update(self, document: Document, memory: int):
+        """ Records the (new) memory estimate of the document's cached data and marks it as most recently used.
+        Afterwards, other documents are released if the budget is exceeded. """
+        if self.budget is None:
+            return
+        key = id(document)
+        entry = self._documents.pop(key, None)
+        if entry is None:
+            ref = weakref.ref(document, lambda ref: self._forget(key, ref))
+        else:
+            ref = entry[0]
+            self.total_memory -= entry[1]
+        self._documents[key] = (ref, memory)
+        self.total_memory += memory
+        if self.total_memory > self.budget:
+            self._evict(keep=document)
+
+    def touch(self, document: Document):
+        """ Marks the document as most recently used """
+        if self._documents and id(document) in self._documents:
+            self._documents.move_to_end(id(document))
+
+    def remove(self, document: Document):
+        entry = self._documents.pop(id(document), None)
+        if entry is not None:
+            self.total_memory -= entry[1]
+
+    def _forget(self, key: int, ref: weakref.ref[Document]):
+        # called when a document is garbage collected
+        entry = self._documents.get(key)
+        if entry is not None and entry[0] is ref:
+            del self._documents[key]
+            self.total_memory -= entry[1]
+
+    def _evict(self, keep: Document):
+        assert self.budget is not None
+        for key in list(self._documents):
+            if self.total_memory <= self.budget:
+                break
+            entry = self._documents.get(key)    # (it might have been garbage collected in the meantime)
+            document = entry[0]() if entry is not None else None
+            if document is None or document is keep or document.is_pinned():
+                continue
+            logger.debug(f'Releasing {document.get_uri()} (document memory budget exceeded)')
+            document.release_artifacts()
+            self.number_of_evictions += 1
+
+
+class DocumentArtifactPoolExtension(ConfigExtension):
+    def prepare_argparser(self, argparser: argparse.ArgumentParser):
+        argparser.add_argument('--document-memory-budget', type=int,
+                               help='approximate memory budget (in MB) for cached document data like HTML trees '
+                                    '(least recently used documents are released when it is exceeded)')
+
+    def process_namespace(self, args: argparse.Namespace):
+        if args.document_memory_budget is not None:
+            ARTIFACT_POOL.budget = args.document_memory_budget * 2 ** 20
+
+
+ARTIFACT_POOL = DocumentArtifactPool()
+ConfigLoader.default_extensions.append(DocumentArtifactPoolExtension())
@@ -0,0 +1,119 @@
+""" A persistent cache for data that is derived from documents (e.g. offset tables).
+
+Creating e.g. the :class:`~spotterbase.selectors.offset_converter.OffsetConverter` of a document
+requires a walk over the entire DOM.
+When the same documents are processed repeatedly (e.g. by several spotters or evaluations),
+the results can be cached in the cache directory.
+The entries are keyed by the document URI and a hash of the document content,
+so changed documents are not affected.
+The cache requires the ``diskcache`` package, which is only imported if the cache is enabled.
+
+The canonical XPaths of the nodes are not cached: they are computed lazily and only for the nodes
+that are actually needed (see :meth:`~spotterbase.selectors.selector_converter.SelectorConverter.get_path`),
+which is cheaper than storing and loading the paths of all nodes.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import pickle
+import zlib
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from lxml import etree
+from lxml.etree import _Element
+
+from spotterbase.data.locator import CacheDir
+from spotterbase.rdf.uri import Uri
+from spotterbase.selectors.offset_converter import OffsetConverter
+from spotterbase.utils.config_loader import ConfigFlag, ConfigInt
+
+if TYPE_CHECKING:
+    import diskcache
+
+logger = logging.getLogger(__name__)
+
+PERSISTENT_DOCUMENT_CACHE = ConfigFlag('--persistent-document-cache',
+                                       'cache offset tables of documents persistently in the cache directory '
+                                       '(requires diskcache)')
+DOCUMENT_CACHE_SIZE_LIMIT = ConfigInt('--document-cache-size-limit',
+                                      'size limit (in bytes) of the persistent document cache', default=2 ** 30)
+
+# should be changed if the format of the cached data changes
+_FORMAT_VERSION: int = 2     # 2: documents are parsed as UTF-8 even without a charset declaration
+
+
+class DocumentData:
+    """ The data that is cached for a document """
+    def __init__(self, offset_converter: OffsetConverter, node_by_id: dict[str, _Element]):
+        self.offset_converter = offset_converter
+        self.node_by_id = node_by_id
+
+
+class _PersistentDocumentCache:
+    """
+        Least recently used entries are evicted once the size limit is reached.
+        The cache is opened lazily (by default in the cache directory) and re-opened in forked processes,
+        as the underlying SQLite connections must not be shared between processes.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self._directory: Optional[Path] = directory
+        self._cache: Optional['diskcache.Cache'] = None
+        self._pid: int = os.getpid()
+        # caches opened by the parent process (they must not be used - or closed - after forking)
+        self._inherited_caches: list['diskcache.Cache'] = []
+
+    def is_enabled(self) -> bool:
+        return bool(PERSISTENT_DOCUMENT_CACHE)
+
+    def _require_cache(self) -> 'diskcache.Cache':
+        if self._cache is not None and self._pid != os.getpid():
+            self._inherited_caches.append(self._cache)
+            self._cache = None
+        if self._cache is None:
+            import diskcache    # optional dependency (only needed if the cache is enabled)
+            directory = self._directory or CacheDir.get() / 'document_cache'
+            logger.info(f'Opening document cache at {directory}')
+            self._cache = diskcache.Cache(
+                str(directory),
+                size_limit=DOCUMENT_CACHE_SIZE_LIMIT.value or 2 ** 30,
+                eviction_policy='least-recently-used',
+            )
+            self._pid = os.getpid()
+            atexit.register(self._close_at_exit, self._cache, self._pid)
+        return self._cache
+
+    @staticmethod
+    def _close_at_exit(cache: 'diskcache.Cache', pid: int):
+        if pid == os.getpid():
+            cache.close()
+
+    @staticmethod
+    def get_key(uri: Uri, content: bytes) -> str:
+        # the parse result (and therefore the offsets) could change with the libxml2 version
+        libxml_version = '.'.join(map(str, etree.LIBXML_VERSION))
+        return f'{uri}|{hashlib.blake2b(content, digest_size=16).hexdigest()}|{libxml_version}|{_FORMAT_VERSION}'
+
+    def get(self, key: str, root: _Element) -> Optional[DocumentData]:
+        value = self._require_cache().get(key)
+        if value is None:
+            return None
+        offset_data, ids = pickle.loads(zlib.decompress(value))
+        try:
+            offset_converter = OffsetConverter.from_bytes(root, offset_data)
+        except ValueError:
+            logger.warning(f'Cached data for {key} does not match the document - ignoring it')
+            return None
+        get_node = offset_converter.get_node_at_pre_order_index
+        return DocumentData(offset_converter, {id_: get_node(index) for id_, index in ids})
+
+    def put(self, key: str, data: DocumentData):
+        get_index = data.offset_converter.get_pre_order_index
+        ids = [(id_, get_index(node)) for id_, node in data.node_by_id.items()]
+        value = zlib.compress(pickle.dumps((data.offset_converter.to_bytes(), ids)), level=1)
+        self._require_cache().set(key, value)
+
+
+DOCUMENT_CACHE = _PersistentDocumentCache()
@@ -1,15 +1,20 @@
 import abc
-from io import TextIOWrapper
-from typing import IO, Iterable, Iterator, Optional, TextIO
+from io import TextIOWrapper, BytesIO
+from typing import IO, Iterable, Iterator, Optional, TextIO, Any, Callable, Hashable, TypeVar
 
 from lxml.etree import _ElementTree, _Element
 import lxml.etree as etree
 
+from spotterbase.corpora.artifact_pool import ARTIFACT_POOL
+from spotterbase.corpora.document_cache import DOCUMENT_CACHE, DocumentData
 from spotterbase.model_core import FragmentTarget, PathSelector, OffsetSelector
 from spotterbase.rdf.uri import Uri
 from spotterbase.selectors.dom_range import DomRange
 from spotterbase.selectors.offset_converter import OffsetConverter
 from spotterbase.selectors.selector_converter import SelectorConverter
+from spotterbase.utils.timing import timed
+
+_T = TypeVar('_T')
 
 
 class Document(abc.ABC):
@@ -17,6 +22,11 @@ class Document(abc.ABC):
     _offset_converter: Optional[OffsetConverter] = None
     _selector_converter: Optional[SelectorConverter] = None
     _node_by_id: Optional[dict[str, _Element]] = None
+    _document_cache_key: Optional[str] = None    # key for the persistent document cache (if enabled)
+    _artifacts: Optional[dict[Hashable, Any]] = None     # see get_artifact
+    _prefetched_content: Optional[bytes] = None     # see prefetch
+    _content_size: int = 0      # for estimating the memory of cached data (see artifact_pool)
+    _pins: int = 0              # see __enter__
 
     @abc.abstractmethod
     def get_uri(self) -> Uri:
@@ -29,13 +39,104 @@ class Document(abc.ABC):
     def open_binary(self) -> IO[bytes]:
         raise NotImplementedError()
 
+    def read_binary(self) -> bytes:
+        """ Returns the content of the document (can be overwritten if there is a faster way than open_binary) """
+        with self.open_binary() as fp:
+            return fp.read()
+
+    def get_size_estimate(self) -> Optional[int]:
+        """ Returns the (approximate) size of the document in bytes if it can be determined cheaply
+        (e.g. for scheduling) or None otherwise. """
+        return None
+
+    def get_archive_location(self) -> Optional[tuple[str, int]]:
+        """ Returns the archive (e.g. a zip file) that contains the document and the position of the document
+        in the archive (or None if the document is not stored in an archive).
+        Processing the documents of an archive together and in order reduces I/O. """
+        return None
+
+    def get_artifact(self, key: Hashable, make_artifact: Callable[[], _T]) -> _T:
+        """ Returns the artifact (e.g. a DNM) for the key, creating it with ``make_artifact`` if necessary.
+        Artifacts are cached until :meth:`release_artifacts` is called
+        (e.g. so that several spotters can share a DNM). """
+        if self._artifacts is None:
+            self._artifacts = {}
+        if key not in self._artifacts:
+            self._artifacts[key] = make_artifact()
+            self._update_memory_estimate()
+        else:
+            ARTIFACT_POOL.touch(self)
+        return self._artifacts[key]
+
+    def __enter__(self) -> 'Document':
+        """ Pins the document (see :mod:`spotterbase.corpora.artifact_pool`) until the end of the ``with`` block.
+        Afterwards, the document is released. """
+        self._pins += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._pins -= 1
+        if not self._pins:
+            self.release_artifacts()
+
+    def is_pinned(self) -> bool:
+        return self._pins > 0
+
+    def _update_memory_estimate(self):
+        if not ARTIFACT_POOL.is_enabled():
+            return
+        # rough estimates based on measurements for arXMLiv documents
+        factor = 0
+        if self._html_tree is not None:
+            factor += 10
+        if self._offset_converter is not None:
+            factor += 4
+        if self._artifacts:
+            factor += 3 * len(self._artifacts)
+        ARTIFACT_POOL.update(self, factor * self._content_size)
+
+    def release_artifacts(self):
+        """ Drops the cached data (the HTML tree, artifacts and everything else derived from the content)
+        to free memory. It is re-created when needed. """
+        ARTIFACT_POOL.remove(self)
+        self._artifacts = None
+        self._html_tree = None
+        self._offset_converter = None
+        self._selector_converter = None
+        self._node_by_id = None
+        self._document_cache_key = None
+        self._prefetched_content = None
+
+    def prefetch(self) -> int:
+        """ Reads the content of the document into memory, so that :meth:`get_html_tree` does not have to wait for I/O
+        (see :mod:`spotterbase.corpora.prefetch`). Returns the number of bytes read. """
+        with timed('prefetch'):
+            content = self.read_binary()
+        self._prefetched_content = content
+        return len(content)
+
+    def discard_prefetched_content(self):
+        """ Drops the prefetched content if it has not been used yet (the document is read again when needed) """
+        self._prefetched_content = None
+
     def has_cached_tree(self) -> bool:
         return self._html_tree is not None
 
     def get_html_tree(self, *, cached: bool) -> _ElementTree:
         if cached and self._html_tree is not None:
+            ARTIFACT_POOL.touch(self)
             return self._html_tree
-        with self.open_text() as fp:
+        content = self._prefetched_content
+        self._prefetched_content = None     # the content is only needed once
+        if content is None:
+            with timed('read'):
+                content = self.read_binary()
+        if DOCUMENT_CACHE.is_enabled():
+            self._document_cache_key = DOCUMENT_CACHE.get_key(self.get_uri(), content)
+        with timed('parse'):
+            # The bytes are passed to libxml2 directly (decoding them in Python first would be slower).
+            # The encoding has to be specified explicitly, otherwise libxml2 guesses it
+            # (e.g. latin-1 if the document does not declare a charset).
             # note: the choice of parser is difficult.
             # Options:
             # - HTMLParser:  has some weird bugs that are hard to re-produce
@@ -44,27 +145,46 @@ class Document(abc.ABC):
             # - XMLParser:   cannot parse all documents
             # - html5parser: introduces new nodes (e.g. tbody), which breaks offsets and XPaths.
             #                Unfortunately, modern browsers do the same.
-            tree: _ElementTree = etree.parse(fp, parser=etree.HTMLParser())  # type: ignore
+            parser = etree.HTMLParser(encoding='utf-8')
+            tree: _ElementTree = etree.parse(BytesIO(content), parser=parser)  # type: ignore
         if cached:
             if self._html_tree is not None:
                 raise RuntimeError('HTML tree was created twice - '
                                    'this may be the result of multithreading, which SpotterBase does not support')
             self._html_tree = tree
+            self._content_size = len(content)
+            self._update_memory_estimate()
         return tree
 
     def get_node_for_id(self, node_id: str) -> _Element:
         if self._node_by_id is None:
-            nodes: Iterable[_Element] = self.get_html_tree(cached=True).xpath('//*[@id]')   # type: ignore
-            self._node_by_id = {node.attrib['id']: node for node in nodes}  # type: ignore
+            self._node_by_id = self._make_node_by_id()
         return self._node_by_id[node_id]
 
+    def _make_node_by_id(self) -> dict[str, _Element]:
+        nodes: Iterable[_Element] = self.get_html_tree(cached=True).xpath('//*[@id]')   # type: ignore
+        return {node.attrib['id']: node for node in nodes}  # type: ignore
+
     def get_offset_converter(self) -> OffsetConverter:
         if self._offset_converter is None:
-            converter = OffsetConverter(self.get_html_tree(cached=True).getroot())
+            root = self.get_html_tree(cached=True).getroot()
+            with timed('offset_converter'):
+                key = self._document_cache_key
+                if key is not None:
+                    cached_data = DOCUMENT_CACHE.get(key, root)
+                    if cached_data is None:
+                        cached_data = DocumentData(OffsetConverter(root), self._node_by_id or self._make_node_by_id())
+                        DOCUMENT_CACHE.put(key, cached_data)
+                    converter = cached_data.offset_converter
+                    if self._node_by_id is None:
+                        self._node_by_id = cached_data.node_by_id
+                else:
+                    converter = OffsetConverter(root)
             if self._offset_converter is not None:
                 raise RuntimeError('OffsetConverter was created twice - '
                                    'this may be the result of multithreading, which SpotterBase does not support')
             self._offset_converter = converter
+            self._update_memory_estimate()
         return self._offset_converter
 
     def get_selector_converter(self) -> SelectorConverter:
@@ -112,3 +232,8 @@ class Corpus(abc.ABC):
 
     def get_documents(self) -> Iterator[Document]:
         return iter(self)
+
+    def get_number_of_documents(self) -> Optional[int]:
+        """ Returns the number of documents in the corpus if it can be determined reasonably quickly
+        (e.g. for progress updates) or None otherwise. """
+        return None
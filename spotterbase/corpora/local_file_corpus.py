@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import IO, Iterator
+from typing import IO, Iterator, Optional
 
 from spotterbase.corpora.interface import Corpus, DocumentNotInCorpusException, Document, DocumentNotFoundError
 from spotterbase.rdf.uri import Uri
@@ -16,6 +16,9 @@ class LocalDocument(Document):
     def open_binary(self) -> IO[bytes]:
         return self._path.open('rb')
 
+    def get_size_estimate(self) -> Optional[int]:
+        return self._path.stat().st_size
+
 
 class _LocalCorpus(Corpus):
     def get_uri(self) -> Uri:
@@ -0,0 +1,102 @@
+"""
+Prefetching of documents, i.e. reading (and decompressing) the content of upcoming documents
+in a background thread while the current document is processed.
+
+The number of prefetched documents is limited by the prefetch depth.
+The memory limit caps the size of all prefetched contents that are held in memory, including the one
+of the document that is currently processed (a single document can exceed it if nothing else is held).
+The content of a document is held until the next document is requested.
+If it has not been used by then (see :meth:`Document.get_html_tree`), it is discarded.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import Iterable, Iterator, Optional
+
+from spotterbase.corpora.interface import Document
+
+logger = logging.getLogger(__name__)
+
+
+class _Prefetcher:
+    def __init__(self, documents: Iterable[Document], depth: int, memory_limit: int):
+        self.documents = documents
+        self.depth = depth
+        self.memory_limit = memory_limit
+
+        self._ready: queue.Queue[Optional[tuple[Document, int]]] = queue.Queue()
+        self._condition = threading.Condition()
+        self._documents_in_flight: int = 0     # prefetched, but not yielded yet
+        self._bytes_held: int = 0               # size of the prefetched contents that are held in memory
+        self._stopped: bool = False
+
+    def _has_capacity(self, size_estimate: int) -> bool:
+        if self._stopped or (self._documents_in_flight == 0 and self._bytes_held == 0):
+            return True
+        return self._documents_in_flight < self.depth and self._bytes_held + size_estimate <= self.memory_limit
+
+    def _read_documents(self):
+        try:
+            for document in self.documents:
+                size_estimate = document.get_size_estimate() or 0
+                with self._condition:
+                    self._condition.wait_for(lambda: self._has_capacity(size_estimate))
+                    if self._stopped:
+                        return
+                    self._documents_in_flight += 1
+                try:
+                    size = document.prefetch()
+                except Exception as e:
+                    # the error will occur again when the document is processed (and handled there)
+                    logger.debug(f'Failed to prefetch {document.get_uri()}: {e}')
+                    size = 0
+                with self._condition:
+                    if self._bytes_held and self._bytes_held + size > self.memory_limit:
+                        # the estimate was too low - the document will be read when it is needed
+                        document.discard_prefetched_content()
+                        size = 0
+                    self._bytes_held += size
+                self._ready.put((document, size))
+        finally:
+            self._ready.put(None)
+
+    def _release(self, document: Document, size: int):
+        document.discard_prefetched_content()      # (if it has not been used)
+        with self._condition:
+            self._bytes_held -= size
+            self._condition.notify()
+
+    def __iter__(self) -> Iterator[Document]:
+        thread = threading.Thread(target=self._read_documents, daemon=True, name='document-prefetcher')
+        thread.start()
+        previous: Optional[tuple[Document, int]] = None
+        try:
+            while True:
+                # the previous document is done once the next one is requested
+                if previous is not None:
+                    self._release(*previous)
+                    previous = None
+                item = self._ready.get()
+                if item is None:
+                    break
+                with self._condition:
+                    self._documents_in_flight -= 1
+                    self._condition.notify()
+                previous = item
+                yield item[0]
+        finally:
+            if previous is not None:
+                self._release(*previous)
+            with self._condition:
+                self._stopped = True
+                self._condition.notify()
+
+
+def prefetch_documents(documents: Iterable[Document], depth: int, memory_limit: int = 2 ** 28) -> Iterator[Document]:
+    """ Yields the documents, prefetching up to ``depth`` documents
+    (holding up to ``memory_limit`` bytes) in a background thread. """
+    if depth <= 0:
+        return iter(documents)
+    return iter(_Prefetcher(documents, depth, memory_limit))
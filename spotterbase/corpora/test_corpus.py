@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import IO, Iterator
+from typing import IO, Iterator, Optional
 
 from spotterbase.corpora.interface import Corpus, DocumentNotInCorpusException, Document, DocumentNotFoundError
 from spotterbase.rdf.uri import Uri
@@ -20,6 +20,9 @@ class TestDocument(Document):
     def open_binary(self) -> IO[bytes]:
         return self._path.open('rb')
 
+    def get_size_estimate(self) -> Optional[int]:
+        return self._path.stat().st_size
+
 
 class _TestCorpus(Corpus):
     def get_uri(self) -> Uri:
@@ -39,6 +42,9 @@ class _TestCorpus(Corpus):
             uri = TEST_CORPUS_URI / path.name.removesuffix('.html')
             yield TestDocument(uri, path)
 
+    def get_number_of_documents(self) -> Optional[int]:
+        return len(list(TEST_CORPUS_DIR.glob('*.html')))
+
 
 TEST_CORPUS: Corpus = _TestCorpus()
 
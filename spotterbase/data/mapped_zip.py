@@ -0,0 +1,102 @@
+"""
+Direct reads of zip members from memory-mapped archives.
+
+If the location of a member in a zip archive is already known (e.g. from
+:mod:`spotterbase.plugins.arxiv.arxmliv_index`), it can be read without :class:`zipfile.ZipFile`,
+which would parse the central directory and read the member through several layers of file objects.
+Instead, the archive is memory-mapped and the member is decompressed directly from the mapping
+(stored members are not copied at all).
+The mappings are read-only and do not have a file offset,
+so, unlike ``ZipFile`` objects, they can be used by forked processes.
+Only stored and deflated members are supported.
+"""
+from __future__ import annotations
+
+import logging
+import mmap
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_COMPRESSION_TYPES: frozenset[int] = frozenset({zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED})
+
+# signature, version, flags, compression, time, date, crc, compressed size, size, file name length, extra length
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+class ZipMemberInfo(NamedTuple):
+    """ The location of a file in a zip archive (the relevant parts of :class:`zipfile.ZipInfo`) """
+    name: str
+    header_offset: int
+    compress_size: int
+    file_size: int
+    crc: int
+    compress_type: int
+
+    @classmethod
+    def from_zip_info(cls, zip_info: zipfile.ZipInfo) -> ZipMemberInfo:
+        return cls(name=zip_info.filename, header_offset=zip_info.header_offset,
+                   compress_size=zip_info.compress_size, file_size=zip_info.file_size, crc=zip_info.CRC,
+                   compress_type=zip_info.compress_type)
+
+
+class MappedZipArchives:
+    """ Keeps the most recently used archives mapped """
+
+    def __init__(self, max_open: int = 100):
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._mappings: OrderedDict[str, mmap.mmap] = OrderedDict()
+
+    def get(self, archive: Path) -> mmap.mmap:
+        key = str(archive)
+        with self._lock:
+            mapping = self._mappings.get(key)
+            if mapping is not None:
+                self._mappings.move_to_end(key)
+                return mapping
+            with open(archive, 'rb') as fp:
+                mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mappings[key] = mapping
+            while len(self._mappings) > self.max_open:
+                # the mapping is released once there are no more views of it
+                self._mappings.popitem(last=False)
+            return mapping
+
+    def read_member(self, archive: Path, member: ZipMemberInfo) -> bytes | memoryview:
+        """ Returns the content of the member.
+        For stored members, it is a view of the mapped archive (i.e. nothing is copied). """
+        if member.compress_type not in SUPPORTED_COMPRESSION_TYPES:
+            raise NotImplementedError(f'Unsupported compression type {member.compress_type} for {member.name}')
+        mapping = self.get(archive)
+        try:
+            signature, _, flags, _, _, _, _, _, _, name_length, extra_length = \
+                _LOCAL_HEADER.unpack_from(mapping, member.header_offset)
+        except struct.error:
+            raise zipfile.BadZipFile(f'{archive} is too short for {member.name}')
+        start = member.header_offset + _LOCAL_HEADER.size
+        if signature != _LOCAL_HEADER_SIGNATURE or \
+                mapping[start:start + name_length] != member.name.encode('utf-8' if flags & 0x800 else 'cp437'):
+            raise zipfile.BadZipFile(f'No local header for {member.name} at offset {member.header_offset} of {archive} '
+                                     f'(the archive might have changed)')
+        if flags & 0x1:
+            raise NotImplementedError(f'{member.name} is encrypted')
+        start += name_length + extra_length
+        compressed = memoryview(mapping)[start:start + member.compress_size]
+        if member.compress_type == zipfile.ZIP_STORED:
+            content: bytes | memoryview = compressed
+        else:
+            content = zlib.decompress(compressed, wbits=-15, bufsize=member.file_size)
+        if len(content) != member.file_size or zlib.crc32(content) != member.crc:
+            raise zipfile.BadZipFile(f'Bad CRC-32 or size for {member.name} in {archive}')
+        return content
+
+
+SHARED_MAPPED_ZIPS = MappedZipArchives()
@@ -1,135 +1,195 @@
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import io
 import logging
+import os
+import threading
+import weakref
 import zipfile
-from collections import deque
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, IO, Dict, Deque, Tuple
+from typing import IO, Optional, cast
 
 from spotterbase.utils.config_loader import ConfigExtension, ConfigLoader
 
 logger = logging.getLogger(__name__)
 
 
-# TODO: Use collections.OrderedDict for LRU mechanism
+class _ZipMember(io.BufferedIOBase):
+    """ A file in an :class:`OpenedZipFile`, which releases its reference to the zip file when it is closed """
+
+    def __init__(self, file: IO[bytes], zip_file: OpenedZipFile):
+        super().__init__()
+        self._file = file
+        self._zip_file = zip_file
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self._file.seekable()
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        return self._file.read(-1 if size is None else size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._file.read1(size)   # type: ignore
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._file.close()
+        finally:
+            super().close()
+            self._zip_file.release()
+
 
 class OpenedZipFile(zipfile.ZipFile):
     """ A zip file that is currently opened in the :class:`ZipFileCache`.
 
-    The expiry (an integer) indicates when the zip file may be closed.
-    The expiry is increased when the zip file is used. """
+    Opened member files (and ``with`` blocks) hold references to the zip file.
+    If the cache evicts the zip file while it is still referenced, it is closed when the last reference is released.
+    """
 
-    def __init__(self, filename: str, expiry: int):
+    def __init__(self, filename: str):
         zipfile.ZipFile.__init__(self, filename)
-        self.expiry: int = expiry
-        # we need to keep track of opened files to make sure we don't close the zip file too soon
-        self.opened_files: List[IO] = []
-        self._is_blocked: bool = False
+        self._lock = threading.Lock()
+        self._references: int = 0
+        self._evicted: bool = False
 
     def __enter__(self) -> OpenedZipFile:
-        self._is_blocked = True
+        self.acquire()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._is_blocked = False
+        self.release()
 
-    def open(self, *args, **kwargs) -> IO:
+    def open(self, *args, **kwargs) -> IO[bytes]:
         """ Opens a zip file (like ``zipfile.ZipFile.open``) """
-        file = super().open(*args, **kwargs)
-        self.opened_files.append(file)
-        return file
-
-    def clean(self):
-        """ Remove closed files from the ``opened_files`` list """
-        self.opened_files = [file for file in self.opened_files if not file.closed]
+        self.acquire()
+        try:
+            file = super().open(*args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        return cast(IO[bytes], _ZipMember(file, self))
+
+    def acquire(self):
+        with self._lock:
+            self._references += 1
+
+    def release(self):
+        with self._lock:
+            self._references -= 1
+            close = self._evicted and self._references == 0
+        if close:
+            self.close()
+
+    def evict(self) -> bool:
+        """ Closes the zip file once it is no longer referenced. Returns True if it was closed right away. """
+        with self._lock:
+            self._evicted = True
+            close = self._references == 0
+        if close:
+            self.close()
+        return close
 
     def __setattr__(self, key, value):
         if key == '__class__':
             raise Exception('You are doing something that overwrites __class__, which would cause problems later on')
         super().__setattr__(key, value)
 
-    def can_be_closed(self) -> bool:
-        return not self.opened_files and not self._is_blocked
+
+@dataclasses.dataclass
+class ZipFileCacheStatistics:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    # evictions of zip files that were still in use (they are closed once they are no longer used)
+    deferred_closes: int = 0
 
 
 class ZipFileCache(object):
-    """ A cache for opened zip files """
+    """ A cache for opened zip files with a least-recently-used eviction policy.
+
+    It can be used from multiple threads (e.g. for prefetching documents).
+    Forked child processes do not use the zip files opened by the parent process
+    (they would share the file offsets with the parent), they open the zip files again.
+    """
 
     def __init__(self, max_open: int = 100):
         assert max_open > 0
         self.max_open = max_open
-
-        self.zipfiles: Dict[str, OpenedZipFile] = {}  # file name -> opened zip file
-
-        # zipfiledeque records expiry dates for opened zip files.
-        # Files on the left expire earliest.
-        # If the expiry is increased, a new record is appended (i.e. it may contain outdated records).
-        self.zipfiledeque: Deque[Tuple[str, int]] = deque()  # pairs (file name, expiry)
-
-        # STATISTICS
-        # how often a zip file was requested
-        self.stat_requested: int = 0
-        # how often the zip file was already open
-        self.stat_successes: int = 0
-        # how often an expiry was extended because files in the zip file were closed
-        self.stat_extended_because_open: int = 0
-
-    def _make_space(self):
-        """ Make sure that there is space for at least one more open zip file """
-        number_of_unprocessed_records = len(self.zipfiledeque)
-        while len(self.zipfiles) >= self.max_open and number_of_unprocessed_records:
-            number_of_unprocessed_records -= 1
-            name, expiry = self.zipfiledeque.popleft()
-            ozf = self.zipfiles[name]
-            ozf.clean()
-            if ozf.expiry == expiry:  # otherwise it's an outdated record
-                if ozf.can_be_closed():
-                    self.zipfiles[name].close()
-                    del self.zipfiles[name]
-                else:
-                    self.stat_extended_because_open += 1
-                    self._push_back(ozf, name)
-        if len(self.zipfiles) >= self.max_open:
-            raise Exception('Failed to make space for another zip file - make sure that all files were closed.')
-
-    def _push_back(self, ozf: OpenedZipFile, name: str):
-        """ adds a new record for ozf and increases the expiry """
-        ozf.expiry = self.zipfiledeque[-1][1] + 1
-        self.zipfiledeque.append((name, ozf.expiry))
-
-    def _remove_outdated_records(self):
-        old = self.zipfiledeque
-        self.zipfiledeque = deque()
-        for e in old:
-            if self.zipfiles[e[0]].expiry == e[1]:
-                self.zipfiledeque.append(e)
+        self._lock = threading.RLock()
+        self._pid: int = os.getpid()
+        # resolved file name -> opened zip file (the least recently used one comes first)
+        self.zipfiles: OrderedDict[str, OpenedZipFile] = OrderedDict()
+        self.statistics = ZipFileCacheStatistics()
+
+        if hasattr(os, 'register_at_fork'):
+            # the lock might have been held by another thread during the fork
+            cache_ref = weakref.ref(self)
+
+            def after_fork_in_child():
+                cache = cache_ref()
+                if cache is not None:
+                    cache._lock = threading.RLock()
+                    cache._forget_parent_zipfiles()
+
+            os.register_at_fork(after_in_child=after_fork_in_child)
+
+    def _forget_parent_zipfiles(self):
+        # closing the zip files only closes the file descriptors of this process
+        for zf in self.zipfiles.values():
+            zf.close()
+        self.zipfiles = OrderedDict()
+        self.statistics = ZipFileCacheStatistics()
+        self._pid = os.getpid()
 
     def __getitem__(self, path: Path) -> zipfile.ZipFile:
-        self.stat_requested += 1
+        with self._lock:
+            return self._get(path)
+
+    def open_member(self, path: Path, member: str) -> IO[bytes]:
+        """ Opens a file in the zip file (eviction can not interfere between getting the zip file and opening it) """
+        with self._lock:
+            return self._get(path).open(member)
+
+    def _get(self, path: Path) -> OpenedZipFile:
+        if self._pid != os.getpid():
+            self._forget_parent_zipfiles()
         name = str(path.resolve())
-        if name not in self.zipfiles:
-            expiry = self.zipfiledeque[-1][1] + 1 if len(self.zipfiledeque) else 0
-            ozf = OpenedZipFile(name, expiry=expiry)
-            self.zipfiles[name] = ozf
-            self.zipfiledeque.append((name, expiry))
-            self._make_space()
-            return ozf
-        else:
-            self.stat_successes += 1
-            ozf = self.zipfiles[name]
-            self._push_back(ozf, name)
-            if len(self.zipfiledeque) > 20 * self.max_open:
-                self._remove_outdated_records()
+        ozf = self.zipfiles.get(name)
+        if ozf is not None:
+            self.statistics.hits += 1
+            self.zipfiles.move_to_end(name)
             return ozf
+        self.statistics.misses += 1
+        ozf = OpenedZipFile(name)
+        self.zipfiles[name] = ozf
+        while len(self.zipfiles) > self.max_open:
+            _, evicted = self.zipfiles.popitem(last=False)
+            self.statistics.evictions += 1
+            if not evicted.evict():
+                self.statistics.deferred_closes += 1
+        return ozf
 
     def close(self):
         """ Close the zip file cache """
-        for zf in self.zipfiles.values():
-            zf.clean()
-            if zf.opened_files:
-                logger.warning(f'{zf.filename} still has open files')
-            zf.close()
+        with self._lock:
+            for zf in self.zipfiles.values():
+                if not zf.evict():
+                    logger.warning(f'{zf.filename} still has open files')
+            self.zipfiles = OrderedDict()
 
     def __del__(self):
         self.close()
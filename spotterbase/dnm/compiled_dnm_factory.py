@@ -0,0 +1,145 @@
+import array
+from itertools import repeat
+from typing import Callable, Iterable, Optional, Any
+
+from spotterbase.dnm.dnm import DnmFactory, DnmMeta, Dnm
+from spotterbase.dnm.linked_str import compact_refs
+from spotterbase.dnm.node_based_dnm_factory import NodeProcessor, TextExtractingNP, TextExtractingBlockedNP, \
+    SkippingNP, TokenAfterNodeNP, ReplacingNP
+
+# The references for text are consecutive offsets.
+# Copying them from slices of an array with all offsets is much faster than creating them from ranges.
+# Every factory keeps such an array, which grows as needed, but only up to _MAX_OFFSET_ARRAY_SIZE entries
+# (2 MB - larger offsets are created from ranges).
+_MAX_OFFSET_ARRAY_SIZE: int = 2 ** 18
+
+
+# kinds of entries on the stack of CompiledDnmFactory.make_dnm_from_meta
+_APPLY = 0      # (_APPLY, node, processor): apply the processor to the node
+_TAIL = 1       # (_TAIL, node, None): add the tail of the node
+_TOKEN = 2      # (_TOKEN, token, offset): add a token that references the offset
+
+
+class CompiledDnmFactory(DnmFactory):
+    """ Creates the same DNMs as a :class:`~spotterbase.dnm.node_based_dnm_factory.NodeBasedDnmFactory`
+    (optionally followed by post-processing with string replacements), but is substantially faster.
+
+    The :class:`NodeBasedDnmFactory` lets every node processor return (nested) iterators, which are only
+    materialized at the end.
+    Instead, this factory evaluates the standard node processors (:class:`TextExtractingNP`,
+    :class:`TextExtractingBlockedNP`, :class:`TokenAfterNodeNP`, :class:`ReplacingNP` and :class:`SkippingNP`)
+    directly in a single, non-recursive traversal of the DOM that writes the string and the references
+    into flat arrays.
+    Other node processors (including subclasses of the standard ones) are supported as well,
+    but they are evaluated with their ``apply`` method.
+
+    ``string_replacements`` can be used for post-processing (e.g. whitespace normalization):
+    it gets the string of the DNM and returns replacements as expected by
+    :meth:`~spotterbase.dnm.linked_str.LinkedStr.replacements_at_positions` (with string positions).
+    """
+
+    def __init__(self, root_processor: NodeProcessor,
+                 string_replacements: Optional[Callable[[str], Iterable[tuple[int, int, str]]]] = None,
+                 compact_refs: bool = False):
+        self._root_processor = root_processor
+        self.string_replacements = string_replacements
+        self.compact_refs = compact_refs
+        self._offset_array: array.array = array.array('q')
+
+    def _get_offset_array(self, required_size: int) -> array.array:
+        current_size = len(self._offset_array)
+        if current_size < required_size and current_size < _MAX_OFFSET_ARRAY_SIZE:
+            new_size = min(max(required_size, 2 * current_size), _MAX_OFFSET_ARRAY_SIZE)
+            self._offset_array.extend(range(current_size, new_size))
+        return self._offset_array
+
+    def make_dnm_from_meta(self, dnm_meta: DnmMeta) -> Dnm:
+        if dnm_meta.embedded_annotations:
+            raise ValueError('dnm_meta should not contain embedded annotations before creating the DNM')
+
+        strings: list[str] = []
+        start_refs = array.array('q')
+        end_refs = array.array('q')
+        get_offset_data = dnm_meta.offset_converter.get_offset_data
+        offsets = self._get_offset_array(get_offset_data(dnm_meta.dom).node_text_offset_after + 2)
+        max_offset = len(offsets) - 1
+
+        stack: list[tuple[int, Any, Any]] = [(_APPLY, dnm_meta.dom, self._root_processor)]
+        while stack:
+            kind, x, y = stack.pop()
+            if kind == _TAIL:
+                tail = x.tail
+                offset = get_offset_data(x).node_text_offset_after
+                strings.append(tail)
+                if offset + len(tail) < max_offset:
+                    start_refs += offsets[offset:offset + len(tail)]
+                    end_refs += offsets[offset + 1:offset + len(tail) + 1]
+                else:
+                    start_refs.extend(range(offset, offset + len(tail)))
+                    end_refs.extend(range(offset + 1, offset + len(tail) + 1))
+                continue
+            if kind == _TOKEN:
+                strings.append(x)
+                start_refs.extend(repeat(y, len(x)))
+                end_refs.extend(repeat(y, len(x)))
+                continue
+
+            node, processor = x, y
+            processor_type = type(processor)
+            if processor_type is TextExtractingNP:
+                relevant_processor = processor.get_node_processor(node)
+                if relevant_processor is not None:
+                    stack.append((_APPLY, node, relevant_processor))
+                    continue
+                child_processor = processor
+            elif processor_type is TextExtractingBlockedNP:
+                child_processor = processor.child_processor
+            elif processor_type is SkippingNP:
+                continue
+            elif processor_type is TokenAfterNodeNP:
+                stack.append((_TOKEN, processor.token, get_offset_data(node).node_text_offset_after))
+                stack.append((_APPLY, node, processor.node_processor))
+                continue
+            elif processor_type is ReplacingNP:
+                replacement, dom_offset_range = processor.get_replacement(node, dnm_meta)
+                strings.append(replacement)
+                start_refs.extend(repeat(dom_offset_range.start, len(replacement)))
+                end_refs.extend(repeat(dom_offset_range.end, len(replacement)))
+                continue
+            else:
+                r = processor.apply(node, dnm_meta)
+                start_refs.extend(r[0])
+                end_refs.extend(r[1])
+                strings.extend(r[2])
+                continue
+
+            # extract the text and process the children
+            if text := node.text:
+                offset = get_offset_data(node).node_text_offset_before
+                strings.append(text)
+                if offset + len(text) + 1 < max_offset:
+                    start_refs += offsets[offset + 1:offset + len(text) + 1]
+                    end_refs += offsets[offset + 2:offset + len(text) + 2]
+                else:
+                    start_refs.extend(range(offset + 1, offset + len(text) + 1))
+                    end_refs.extend(range(offset + 2, offset + len(text) + 2))
+            for child in reversed(node):
+                if child.tail:
+                    stack.append((_TAIL, child, None))
+                stack.append((_APPLY, child, child_processor))
+
+        string = ''.join(strings)
+        if len(string) != len(start_refs) or len(string) != len(end_refs):
+            raise Exception('Lengths of string, start_refs, and end_refs do not match. '
+                            'This is likely a bug in a NodeProcessor.')
+
+        dnm: Dnm
+        if self.compact_refs:
+            dnm = Dnm(meta_info=dnm_meta, string=string, start_refs=compact_refs(start_refs),
+                      end_refs=compact_refs(end_refs))
+        else:
+            dnm = Dnm(meta_info=dnm_meta, string=string, start_refs=start_refs.tolist(), end_refs=end_refs.tolist())
+
+        if self.string_replacements is not None:
+            dnm = dnm.replacements_at_positions(self.string_replacements(string), positions_are_references=False)
+        return dnm
@@ -2,6 +2,7 @@ import functools
 import re
 from typing import Callable
 
+from spotterbase.dnm.compiled_dnm_factory import CompiledDnmFactory
 from spotterbase.dnm.dnm import DnmFactory, Dnm
 from spotterbase.dnm.node_based_dnm_factory import NodeBasedDnmFactory, TextExtractingNP, SkippingNP, ReplacingNP, \
     TokenAfterNodeNP, TextExtractingBlockedNP
@@ -12,13 +13,17 @@ from spotterbase.dnm.simple_dnm_factory import SimpleDnmFactory
 LINEBREAK_PLACEHOLDER = 'SB-LINEBREAK-PLACEHOLDER'
 
 
+def whitespace_normalization_replacements(string: str) -> list[tuple[int, int, str]]:
+    return [
+        (match.start(), match.end(), '\n' if LINEBREAK_PLACEHOLDER in match.group() else ' ')
+        for match in re.finditer(f'(\\s|{LINEBREAK_PLACEHOLDER})+', string)
+        if match.group() != ' '
+    ]
+
+
 def whitespace_normalization_post_processing(dnm: Dnm) -> Dnm:
     return dnm.replacements_at_positions(
-        [
-            (match.start(), match.end(), '\n' if LINEBREAK_PLACEHOLDER in match.group() else ' ')
-            for match in re.finditer(f'(\\s|{LINEBREAK_PLACEHOLDER})+', str(dnm))
-            if match.group() != ' '
-        ],
+        whitespace_normalization_replacements(str(dnm)),
         positions_are_references=False
     )
 
@@ -31,7 +36,13 @@ def get_arxmliv_dnm_factory(
         keep_replacements_as_annotations: bool = True,
         normalize_white_space: bool = True,
         wrap_replacements_with_spaces: bool = False,
+        compact_refs: bool = False,
+        compiled: bool = False,
 ) -> DnmFactory:
+    """ Creates a DNM factory for arXMLiv documents.
+
+    If ``compiled`` is set, a :class:`CompiledDnmFactory` is used, which creates the same DNMs, but faster.
+    """
     processor = TextExtractingNP()
 
     base_affix = '@' if decorate_replacements else ''
@@ -81,7 +92,14 @@ def get_arxmliv_dnm_factory(
             'ltx_para', TokenAfterNodeNP(LINEBREAK_PLACEHOLDER, TextExtractingBlockedNP(processor))
         )
 
-    factory: DnmFactory = NodeBasedDnmFactory(processor)
+    if compiled:
+        return CompiledDnmFactory(
+            processor,
+            string_replacements=whitespace_normalization_replacements if normalize_white_space else None,
+            compact_refs=compact_refs,
+        )
+
+    factory: DnmFactory = NodeBasedDnmFactory(processor, compact_refs=compact_refs)
     if normalize_white_space:
         factory = PostProcessingDnmFactory(factory, whitespace_normalization_post_processing)
     return factory
@@ -97,6 +115,7 @@ def get_simple_arxmliv_factory(
         token_suffix: str = '',
         keep_titles: bool = True,
         core_token_processor: Callable[[str], str] = _default_core_token_processor,
+        compact_refs: bool = False,
 ) -> SimpleDnmFactory:
     def tp(token: str) -> str:  # token processor
         return token_prefix + core_token_processor(token) + token_suffix
@@ -119,7 +138,8 @@ def get_simple_arxmliv_factory(
         class_rules['ltx_title'] = ''
     return SimpleDnmFactory(
         nodes_to_replace=node_rules,
-        classes_to_replace=class_rules
+        classes_to_replace=class_rules,
+        compact_refs=compact_refs,
     )
 
 
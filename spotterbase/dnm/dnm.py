@@ -16,6 +16,7 @@ from spotterbase.selectors.anno_by_offset import AnnoByOffset
 from spotterbase.selectors.dom_range import DomRange
 from spotterbase.selectors.offset_converter import OffsetConverter, DomOffsetRange, OffsetType
 from spotterbase.selectors.selector_converter import SelectorConverter
+from spotterbase.utils.timing import timed
 
 
 class DnmFactory(abc.ABC):
@@ -37,15 +38,21 @@ class DnmFactory(abc.ABC):
             )
         )
 
-    def dnm_from_document(self, document: Document) -> Dnm:
-        return self.make_dnm_from_meta(
-            DnmMeta(
-                document.get_html_tree(cached=True).getroot(),
-                document.get_offset_converter(),
-                document.get_selector_converter(),
-                document.get_uri(),
-            )
+    def dnm_from_document(self, document: Document, cached: bool = False) -> Dnm:
+        """ If ``cached``, the DNM is stored as an artifact of the document (see :meth:`Document.get_artifact`),
+        i.e. it is shared with everyone else who requests a DNM from this factory for the document.
+        It is kept until the artifacts of the document are released, so this should only be used if someone
+        takes care of that (e.g. the spotter runner releases them after processing a document). """
+        if cached:
+            return document.get_artifact((DnmFactory, self), lambda: self.dnm_from_document(document, cached=False))
+        dnm_meta = DnmMeta(
+            document.get_html_tree(cached=True).getroot(),
+            document.get_offset_converter(),
+            document.get_selector_converter(),
+            document.get_uri(),
         )
+        with timed('dnm'):
+            return self.make_dnm_from_meta(dnm_meta)
 
 
 @dataclasses.dataclass(slots=True)
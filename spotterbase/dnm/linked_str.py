@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import array
 import bisect
 import dataclasses
-import itertools
+import operator
 import re
 from typing import TypeVar, Sequence, Generic, Optional, Iterable
 
@@ -25,7 +26,11 @@ class _RelData(Generic[_MetaInfoType]):
 
 
 class LinkedStr(Generic[_MetaInfoType]):
-    """ Should be treated as immutable! For optimization, references are used (e.g. when created a sub-linked-str) """
+    """ Should be treated as immutable! For optimization, references are used (e.g. when created a sub-linked-str)
+
+    The start/end references can be any sequence of ints.
+    For large strings, :func:`compact_refs` should be used to reduce the memory footprint.
+    """
 
     # relative data (for sub-linked-strs)
     # Note that the other attributes (e.g. _string) take precedence
@@ -111,8 +116,11 @@ class LinkedStr(Generic[_MetaInfoType]):
             start, stop, step = item.indices(len(self))
             if step == 1:
                 return type(self)(meta_info=self._meta_info, _rel_data=_RelData(self, start, stop))
-            return type(self)(meta_info=self._meta_info, string=str(self)[item], start_refs=self.get_start_refs()[item],
-                              end_refs=self.get_end_refs()[item])
+            start_refs, end_refs = self.get_start_refs()[item], self.get_end_refs()[item]
+            if isinstance(start_refs, memoryview):   # avoid non-contiguous memoryviews
+                start_refs, end_refs = compact_refs(start_refs), compact_refs(end_refs)
+            return type(self)(meta_info=self._meta_info, string=str(self)[item], start_refs=start_refs,
+                              end_refs=end_refs)
         elif isinstance(item, int):
             return type(self)(meta_info=self._meta_info, string=str(self)[item],
                               start_refs=[self.get_start_refs()[item]],
@@ -180,61 +188,92 @@ class LinkedStr(Generic[_MetaInfoType]):
             replacements: Iterable[tuple[int, int, str]],   # more efficient if we do all at once
             positions_are_references: bool = True,    # if False, positions are indices into the string
     ) -> LinkedStr_T:
+        """ Replaces the specified ranges with new strings.
 
-        @dataclasses.dataclass(frozen=True, slots=True)
-        class Entry:
-            start_str: int
-            end_str: int
-            start_ref: int
-            end_ref: int
-            replacement: str
-
-        entries: list[Entry] = []
-        for start, end, replacement in replacements:
-            if positions_are_references:
-                start_ref, end_ref = start, end
-                start_str, end_str = self.get_indices_from_ref_range(start, end)
-            else:
-                start_str, end_str = start, end
-                start_ref, end_ref = self.get_start_refs()[start], self.get_end_refs()[end - 1]
-            entries.append(Entry(start_str, end_str, start_ref, end_ref, replacement))
+        All replacements are processed in a single pass and the new references are assembled from slices
+        of the old references.
+        Overlapping ranges are merged and their replacements are concatenated
+        (in the order of their start positions).
+        """
+        start_refs = self.get_start_refs()
+        end_refs = self.get_end_refs()
+
+        # entries: (start_str, end_str, start_ref, end_ref, replacement)
+        entries: list[tuple[int, int, int, int, str]]
+        if positions_are_references:
+            get_indices = self.get_indices_from_ref_range
+            entries = []
+            for start, end, replacement in replacements:
+                start_str, end_str = get_indices(start, end)
+                entries.append((start_str, end_str, start, end, replacement))
+        else:
+            entries = [
+                (start, end, start_refs[start], end_refs[end - 1], replacement)
+                for start, end, replacement in replacements
+            ]
 
         if not entries:
             return self   # nothing to do
 
-        entries.sort(key=lambda e: e.start_str)
-
-        # TODO: maybe we can support for overlapping replacements (just concatenate the replacements)
-        assert all(x.end_str <= y.start_str for x, y in itertools.pairwise(entries)), 'Some ranges are overlapping'
+        entries.sort(key=operator.itemgetter(0))
 
-        new_start_refs: list[int] = []
-        new_end_refs: list[int] = []
+        compact = isinstance(start_refs, memoryview)
+        ref_list_type = _compact_ref_list if compact else list
+        new_start_refs: list[Sequence[int]] = []
+        new_end_refs: list[Sequence[int]] = []
         strings: list[str] = []
 
-        start_refs = self.get_start_refs()
-        end_refs = self.get_end_refs()
         string = str(self)
 
         previous_end: int = 0
-        for entry in entries:
-            # copy until start of range
-            new_start_refs.extend(start_refs[previous_end:entry.start_str])
-            new_end_refs.extend(end_refs[previous_end:entry.start_str])
-            strings.append(string[previous_end:entry.start_str])
+        for start_str, end_str, start_ref, end_ref, replacement in entries:
+            # copy until start of range (nothing is copied for overlapping ranges)
+            new_start_refs.append(start_refs[previous_end:start_str])
+            new_end_refs.append(end_refs[previous_end:start_str])
+            strings.append(string[previous_end:start_str])
 
             # put replacement string
-            new_start_refs.extend(itertools.repeat(entry.start_ref, len(entry.replacement)))
-            new_end_refs.extend(itertools.repeat(entry.end_ref, len(entry.replacement)))
-            strings.append(entry.replacement)
+            new_start_refs.append(ref_list_type((start_ref,)) * len(replacement))
+            new_end_refs.append(ref_list_type((end_ref,)) * len(replacement))
+            strings.append(replacement)
 
-            previous_end = entry.end_str
+            previous_end = max(previous_end, end_str)
 
-        new_start_refs.extend(start_refs[previous_end:])
-        new_end_refs.extend(end_refs[previous_end:])
+        new_start_refs.append(start_refs[previous_end:])
+        new_end_refs.append(end_refs[previous_end:])
         strings.append(string[previous_end:])
 
-        return type(self)(meta_info=self.get_meta_info(), string=''.join(strings), start_refs=new_start_refs,
-                          end_refs=new_end_refs)
+        return type(self)(meta_info=self.get_meta_info(), string=''.join(strings),
+                          start_refs=_concat_refs(new_start_refs, compact),
+                          end_refs=_concat_refs(new_end_refs, compact))
+
+
+def _compact_ref_list(refs: Iterable[int]) -> array.array:
+    return array.array('q', refs)
+
+
+def _concat_refs(pieces: list[Sequence[int]], compact: bool) -> Sequence[int]:
+    if compact:
+        refs = array.array('q')
+        for piece in pieces:
+            refs.frombytes(memoryview(piece).cast('B'))   # type: ignore  # pieces are (views of) arrays
+        return memoryview(refs)
+    result: list[int] = []
+    for piece in pieces:
+        result.extend(piece)
+    return result
+
+
+def compact_refs(refs: Iterable[int]) -> memoryview:
+    """ Stores references as 64-bit integers in an ``array.array`` and returns a memoryview of it.
+
+    Compared to a list of Python ints, this requires about a fifth of the memory.
+    Furthermore, slicing a memoryview does not copy the underlying data,
+    which means that sub-linked-strs share the references with the linked str they are based on.
+    """
+    if not isinstance(refs, array.array):
+        refs = array.array('q', refs)
+    return memoryview(refs)
 
 
 def string_to_lstr(string: str) -> LinkedStr[None]:
@@ -1,16 +1,18 @@
 import abc
 from itertools import chain, repeat
-from typing import Iterable, Optional
+from typing import Iterable, Optional, Sequence
 
 from lxml.etree import _Element
 
 from spotterbase.dnm.dnm import DnmMeta, DnmFactory, Dnm
+from spotterbase.dnm.linked_str import compact_refs
 from spotterbase.dnm.replacement_pattern import ReplacementPattern
 from spotterbase.dnm.xml_util import get_node_classes
 from spotterbase.model_core.annotation import Annotation
 from spotterbase.model_core.body import ReplacedHtmlBody
-from spotterbase.rdf.literal import HtmlFragment
+from spotterbase.rdf.literal import LazyHtmlFragment
 from spotterbase.selectors.dom_range import DomRange
+from spotterbase.selectors.offset_converter import DomOffsetRange
 
 
 class NodeProcessor(abc.ABC):
@@ -28,6 +30,16 @@ class ReplacingNP(NodeProcessor):
         self.keep_annotation = keep_annotation
 
     def apply(self, node: _Element, dnm_meta: DnmMeta) -> tuple[Iterable[int], Iterable[int], Iterable[str]]:
+        replacement, dom_offset_range = self.get_replacement(node, dnm_meta)
+        return (
+            repeat(dom_offset_range.start, len(replacement)),
+            repeat(dom_offset_range.end, len(replacement)),
+            [replacement]
+        )
+
+    def get_replacement(self, node: _Element, dnm_meta: DnmMeta) -> tuple[str, DomOffsetRange]:
+        """ Returns the replacement string and the range of the node.
+        If the annotation should be kept, it is added to the embedded annotations of ``dnm_meta``. """
         dom_offset_range = dnm_meta.offset_converter.convert_dom_range(DomRange.from_node(node))
         replacement: str
         number = dnm_meta.embedded_annotations.get_next_replacement_number(self.category)
@@ -37,33 +49,18 @@ class ReplacingNP(NodeProcessor):
             replacement = self.replacement_pattern(self.category)
 
         if self.keep_annotation:
-            # we need to make a copy without the tail
-            import copy
-            node_copy = copy.deepcopy(node)
-            node_copy.tail = None
-
-            # TODO: the following should be a bit more efficient, but it seems to remove
-            #   the children from the original DOM
-            # node_copy = Element(node.tag, attrib=node.attrib)    # type: ignore
-            # node_copy.text = node.text
-            # for child in node.getchildren():   # type: ignore
-            #     node_copy.append(child)
-
+            # the node is only serialized (without the tail) if the annotation is actually exported
             dnm_meta.embedded_annotations.insert(
                 replacement,
                 dom_offset_range,
                 Annotation(
                     uri=dnm_meta.uri / f'dnm-replacement/{self.category.replace(" ", "-")}#{number}',
-                    body=ReplacedHtmlBody(HtmlFragment(node_copy, wrapped_in_div=False)),
+                    body=ReplacedHtmlBody(LazyHtmlFragment(node, strip_tail=True)),
                 ),
                 replacement_unique=self.number_replacements,
             )
 
-        return (
-            repeat(dom_offset_range.start, len(replacement)),
-            repeat(dom_offset_range.end, len(replacement)),
-            [replacement]
-        )
+        return replacement, dom_offset_range
 
 
 class SkippingNP(NodeProcessor):
@@ -103,19 +100,19 @@ class TextExtractingNP(NodeProcessor):
             raise ValueError(f'Processor for class {class_} already registered')
         self._class_processors[class_] = processor
 
+    def get_node_processor(self, node: _Element) -> Optional[NodeProcessor]:
+        """ Returns the processor registered for the node (or None if the text should be extracted) """
+        if node.tag in self._tag_processors:
+            return self._tag_processors[node.tag]
+        for c in get_node_classes(node):
+            if c in self._class_processors:
+                return self._class_processors[c]
+        return None
+
     def apply(self, node: _Element, dnm_meta: DnmMeta) -> tuple[Iterable[int], Iterable[int], Iterable[str]]:
         # NOTE: This is a time-critical method.
         # Using local functions (in particular `recurse`) made it substantially faster.
-        _tag_processors = self._tag_processors
-        _class_processors = self._class_processors
-
-        def get_relevant_node_processor(node: _Element) -> Optional[NodeProcessor]:
-            if node.tag in _tag_processors:
-                return _tag_processors[node.tag]
-            for c in get_node_classes(node):
-                if c in _class_processors:
-                    return _class_processors[c]
-            return None
+        get_relevant_node_processor = self.get_node_processor
 
         # start_refs: list[Iterable[int]] = []
         start_refs: list[Iterable[int]] = []
@@ -249,18 +246,27 @@ class SourceHtmlNP(NodeProcessor):
 
 
 class NodeBasedDnmFactory(DnmFactory):
-    def __init__(self, root_processor: NodeProcessor):
+    def __init__(self, root_processor: NodeProcessor, compact_refs: bool = False):
+        """ If ``compact_refs`` is set, the references of the DNM are stored in arrays
+        (see :func:`~spotterbase.dnm.linked_str.compact_refs`). """
         self._root_processor = root_processor
+        self.compact_refs = compact_refs
 
     def make_dnm_from_meta(self, dnm_meta: DnmMeta) -> Dnm:
         if dnm_meta.embedded_annotations:
             raise ValueError('dnm_meta should not contain embedded annotations before creating the DNM')
 
-        start_refs, end_refs, strings = self._root_processor.apply(dnm_meta.dom, dnm_meta)
+        start_ref_iter, end_ref_iter, strings = self._root_processor.apply(dnm_meta.dom, dnm_meta)
 
         string = ''.join(strings)
-        start_refs = list(start_refs)
-        end_refs = list(end_refs)
+        start_refs: Sequence[int]
+        end_refs: Sequence[int]
+        if self.compact_refs:
+            start_refs = compact_refs(start_ref_iter)
+            end_refs = compact_refs(end_ref_iter)
+        else:
+            start_refs = list(start_ref_iter)
+            end_refs = list(end_ref_iter)
 
         if len(string) != len(start_refs) or len(string) != len(end_refs):
             raise Exception('Lengths of string, start_refs, and end_refs do not match. '
@@ -1,24 +1,29 @@
+import array
 import itertools
-from typing import Optional
+from typing import Optional, MutableSequence
 
 from lxml.etree import _Element
 
 from spotterbase.dnm.dnm import DnmFactory, Dnm, DnmMeta
+from spotterbase.dnm.linked_str import compact_refs
 from spotterbase.dnm.xml_util import get_node_classes
 
 
 class SimpleDnmFactory(DnmFactory):
     def __init__(self, nodes_to_replace: Optional[dict[str, str]] = None,
-                 classes_to_replace: Optional[dict[str, str]] = None):
+                 classes_to_replace: Optional[dict[str, str]] = None, compact_refs: bool = False):
+        """ If ``compact_refs`` is set, the references of the DNM are stored in arrays
+        (see :func:`~spotterbase.dnm.linked_str.compact_refs`). """
         self.nodes_to_replace = nodes_to_replace or {}
         self.classes_to_replace = classes_to_replace or {}
+        self.compact_refs = compact_refs
 
     def make_dnm_from_meta(self, dnm_meta: DnmMeta) -> Dnm:
         if dnm_meta.embedded_annotations:
             raise ValueError('dnm_meta should not contain embedded annotations before creating the DNM')
 
-        start_refs: list[int] = []
-        end_refs: list[int] = []
+        start_refs: MutableSequence[int] = array.array('q') if self.compact_refs else []
+        end_refs: MutableSequence[int] = array.array('q') if self.compact_refs else []
         strings: list[str] = []
         offset_converter = dnm_meta.offset_converter
 
@@ -54,6 +59,9 @@ class SimpleDnmFactory(DnmFactory):
 
         recurse(dnm_meta.dom)
 
+        if self.compact_refs:
+            return Dnm(meta_info=dnm_meta, string=''.join(strings), start_refs=compact_refs(start_refs),
+                       end_refs=compact_refs(end_refs))
         return Dnm(meta_info=dnm_meta, string=''.join(strings), start_refs=start_refs, end_refs=end_refs)
 
     def _get_replacement(self, node: _Element) -> Optional[str]:
@@ -117,64 +117,70 @@ class RangeMatching:
             doc = Resolver.get_document(doc_uri)
             if doc is None:
                 raise Exception(f'Document {doc_uri} not found')
-            offset_equi = OffsetEquis.from_doc_simple(doc, offset_equi_config)
-
-            def anno_to_interval(anno: AnnoWithFragTarget) -> Interval:
-                dom_range = doc.get_selector_converter().target_to_dom(anno.target)[0]
-                offset_range = doc.get_offset_converter().convert_dom_range(dom_range)
-                minimized_offset_range = offset_equi.minimize_range(offset_range)
-                if minimized_offset_range.start > minimized_offset_range.end:
-                    # TODO: Actually raise a meaningful exception or skip the annotation and print a warning
-                    # This happens if an annotation is in a completely invisible range
-                    print('PROBLEM WITH', anno.anno.uri)
-                    print(dom_range)
-                    print(offset_range)
-                    print(minimized_offset_range)
-                return Interval(minimized_offset_range.start, minimized_offset_range.end, anno)
-
-            golden_intervals = IntervalTree([
-                anno_to_interval(anno)
-                for anno in golden.fragment_annos_by_source.get(doc_uri, [])
-            ])
-
-            golden_to_prediction: dict[AnnoWithFragTarget, list[Interval[AnnoWithFragTarget]]] = {
-                i.data: [] for i in golden_intervals
-            }
-            prediction_to_golden: dict[AnnoWithFragTarget, list[Interval[AnnoWithFragTarget]]] = {}
-
-            for p_anno in prediction.fragment_annos_by_source.get(doc_uri, []):
-                prediction_to_golden[p_anno] = []
-                interval = anno_to_interval(p_anno)
-                for golden_interval in golden_intervals[interval.begin:interval.end]:
-                    golden_to_prediction[golden_interval.data].append(interval)
-                    prediction_to_golden[p_anno].append(golden_interval)
-
-            for golden_interval in golden_intervals.all_intervals:
-                if not golden_to_prediction[golden_interval.data]:
-                    result.golden_only.append(golden_interval.data)
-                elif len(golden_to_prediction[golden_interval.data]) == 1:
-                    prediction_interval = golden_to_prediction[golden_interval.data][0]
-                    if prediction_interval.begin == golden_interval.begin and \
-                            prediction_interval.end == golden_interval.end:
-                        result.precise_matches.append(
-                            AnnoWithFragTargetPair(golden_interval.data, prediction_interval.data)
-                        )
-                    else:
-                        result.overlaps.append(AnnoWithFragTargetPair(golden_interval.data, prediction_interval.data))
-                else:
-                    result.golden_in_multimatches.append(golden_interval.data)
-                    for prediction_interval in golden_to_prediction[golden_interval.data]:
-                        result.multimatches.append(
-                            AnnoWithFragTargetPair(golden=golden_interval.data, prediction=prediction_interval.data)
-                        )
-            for prediction_interval in prediction_to_golden:
-                if not prediction_to_golden[prediction_interval]:
-                    result.prediction_only.append(prediction_interval)
-                elif len(prediction_to_golden[prediction_interval]) > 1:
-                    result.prediction_in_multimatches.append(prediction_interval)
+            with doc:    # the document is released afterwards (see corpora.artifact_pool)
+                cls._add_document_matches(result, doc_uri, doc, golden, prediction, offset_equi_config)
 
         return result
 
+    @staticmethod
+    def _add_document_matches(result: RangeMatching, doc_uri: Uri, doc: Document, golden: AnnoCollection,
+                              prediction: AnnoCollection, offset_equi_config: OffsetEquiConfig):
+        offset_equi = OffsetEquis.from_doc_simple(doc, offset_equi_config)
+
+        def anno_to_interval(anno: AnnoWithFragTarget) -> Interval:
+            dom_range = doc.get_selector_converter().target_to_dom(anno.target)[0]
+            offset_range = doc.get_offset_converter().convert_dom_range(dom_range)
+            minimized_offset_range = offset_equi.minimize_range(offset_range)
+            if minimized_offset_range.start > minimized_offset_range.end:
+                # TODO: Actually raise a meaningful exception or skip the annotation and print a warning
+                # This happens if an annotation is in a completely invisible range
+                print('PROBLEM WITH', anno.anno.uri)
+                print(dom_range)
+                print(offset_range)
+                print(minimized_offset_range)
+            return Interval(minimized_offset_range.start, minimized_offset_range.end, anno)
+
+        golden_intervals = IntervalTree([
+            anno_to_interval(anno)
+            for anno in golden.fragment_annos_by_source.get(doc_uri, [])
+        ])
+
+        golden_to_prediction: dict[AnnoWithFragTarget, list[Interval[AnnoWithFragTarget]]] = {
+            i.data: [] for i in golden_intervals
+        }
+        prediction_to_golden: dict[AnnoWithFragTarget, list[Interval[AnnoWithFragTarget]]] = {}
+
+        for p_anno in prediction.fragment_annos_by_source.get(doc_uri, []):
+            prediction_to_golden[p_anno] = []
+            interval = anno_to_interval(p_anno)
+            for golden_interval in golden_intervals[interval.begin:interval.end]:
+                golden_to_prediction[golden_interval.data].append(interval)
+                prediction_to_golden[p_anno].append(golden_interval)
+
+        for golden_interval in golden_intervals.all_intervals:
+            if not golden_to_prediction[golden_interval.data]:
+                result.golden_only.append(golden_interval.data)
+            elif len(golden_to_prediction[golden_interval.data]) == 1:
+                prediction_interval = golden_to_prediction[golden_interval.data][0]
+                if prediction_interval.begin == golden_interval.begin and \
+                        prediction_interval.end == golden_interval.end:
+                    result.precise_matches.append(
+                        AnnoWithFragTargetPair(golden_interval.data, prediction_interval.data)
+                    )
+                else:
+                    result.overlaps.append(AnnoWithFragTargetPair(golden_interval.data, prediction_interval.data))
+            else:
+                result.golden_in_multimatches.append(golden_interval.data)
+                for prediction_interval in golden_to_prediction[golden_interval.data]:
+                    result.multimatches.append(
+                        AnnoWithFragTargetPair(golden=golden_interval.data, prediction=prediction_interval.data)
+                    )
+        for prediction_interval in prediction_to_golden:
+            if not prediction_to_golden[prediction_interval]:
+                result.prediction_only.append(prediction_interval)
+            elif len(prediction_to_golden[prediction_interval]) > 1:
+                result.prediction_in_multimatches.append(prediction_interval)
+
     def print_overlap_details(self):
         """Prints overlapping annotations in detail to help find out why they only overlap instead of being equal"""
 
@@ -1,5 +1,11 @@
 import abc
+import hashlib
+import logging
 import re
+import sqlite3
+import zipfile
+import zlib
+from io import BytesIO
 from pathlib import Path
 from typing import IO, Iterator, Optional
 
@@ -7,11 +13,15 @@ from spotterbase.corpora import CORPUS_PATH_ARG_GROUP
 from spotterbase.plugins.arxiv.arxiv import ArxivId
 from spotterbase.corpora.interface import Document, Corpus, DocumentNotFoundError, CannotLocateCorpusDataError, \
     DocumentNotInCorpusException
-from spotterbase.data.locator import Locator, LocatorFailedException
+from spotterbase.data.locator import Locator, LocatorFailedException, CacheDir
+from spotterbase.data.mapped_zip import ZipMemberInfo, SHARED_MAPPED_ZIPS, SUPPORTED_COMPRESSION_TYPES
 from spotterbase.data.zipfilecache import SHARED_ZIP_CACHE
 from spotterbase.model_core.sb import SB
+from spotterbase.plugins.arxiv.arxmliv_index import ArXMLivIndex
 from spotterbase.rdf.uri import Uri
 
+logger = logging.getLogger(__name__)
+
 ARXMLIV_RELEASES: list[str] = ['08.2017', '08.2018', '08.2019', '2020']
 
 
@@ -52,24 +62,64 @@ class SimpleArXMLivDocument(ArXMLivDocument):
     def open_binary(self) -> IO[bytes]:
         return self.path.open('rb')
 
+    def get_size_estimate(self) -> Optional[int]:
+        return self.path.stat().st_size
+
 
 class ZipArXMLivDocument(ArXMLivDocument):
-    def __init__(self, arxivid: ArxivId, release: str, path_to_zipfile: Path, filename: str):
+    def __init__(self, arxivid: ArxivId, release: str, path_to_zipfile: Path, filename: str,
+                 member: Optional[ZipMemberInfo] = None):
         super().__init__(arxivid, release)
         self.path_to_zipfile = path_to_zipfile
         self.filename = filename
+        self.member = member    # from the index (avoids reading the central directory of the zip file)
+
+    def _can_read_directly(self) -> bool:
+        return self.member is not None and self.member.compress_type in SUPPORTED_COMPRESSION_TYPES
+
+    def read_binary(self) -> bytes:
+        if self._can_read_directly():
+            assert self.member is not None
+            try:
+                content = SHARED_MAPPED_ZIPS.read_member(self.path_to_zipfile, self.member)
+                return content if isinstance(content, bytes) else bytes(content)
+            except (zipfile.BadZipFile, zlib.error) as e:
+                logger.warning(f'Failed to read {self.filename} directly (falling back to zipfile): {e}')
+        with self._open_with_zipfile() as fp:
+            return fp.read()
 
     def open_binary(self) -> IO[bytes]:
-        zf = SHARED_ZIP_CACHE[self.path_to_zipfile]
+        if self._can_read_directly():
+            return BytesIO(self.read_binary())
+        return self._open_with_zipfile()
+
+    def _open_with_zipfile(self) -> IO[bytes]:
         try:
             # Creating zipfile.Path overwrites __class__, which is a problem as we are subclassing...
             # return (zipfile.Path(zf) / self.filename).open(*args, **kwargs)
-            return zf.open(self.filename)
+            return SHARED_ZIP_CACHE.open_member(self.path_to_zipfile, self.filename)
         except KeyError as e:
             missing = DocumentNotFoundError(f'Failed to find {self.filename} in {self.path_to_zipfile}: {e}')
             missing.__suppress_context__ = True
             raise missing
 
+    def get_size_estimate(self) -> Optional[int]:
+        if self.member is not None:
+            return self.member.file_size
+        try:
+            return SHARED_ZIP_CACHE[self.path_to_zipfile].getinfo(self.filename).file_size
+        except KeyError:
+            return None
+
+    def get_archive_location(self) -> Optional[tuple[str, int]]:
+        if self.member is not None:
+            return str(self.path_to_zipfile), self.member.header_offset
+        try:
+            zip_info = SHARED_ZIP_CACHE[self.path_to_zipfile].getinfo(self.filename)
+        except KeyError:
+            return None
+        return str(self.path_to_zipfile), zip_info.header_offset
+
 
 class ArXMLivCorpus(Corpus):
     filename_regex = re.compile(r'^(?P<oldprefix>[a-z-]+)?(?P<digits>[0-9.]+).html$')
@@ -84,8 +134,47 @@ class ArXMLivCorpus(Corpus):
             how_to_get='SIGMathLing members can download the arXMLiv copora from ' +
                        'https://sigmathling.kwarc.info/resources/')
         self._uri: Uri = ArXMLivUris.get_corpus_uri(release)
+        self._index: Optional[ArXMLivIndex] = None
+        self._index_unavailable: bool = False
+        self._yymm_locations: dict[str, Path] = {}
+
+    def get_index(self) -> Optional[ArXMLivIndex]:
+        """ The index of the zip archives of the release (see :mod:`spotterbase.plugins.arxiv.arxmliv_index`)
+        or None if it cannot be used (e.g. because the cache directory is not writable). """
+        if self._index is None and not self._index_unavailable:
+            try:
+                corpus_path = str(self.get_path().resolve())
+                directory = CacheDir.get('arxmliv_index')
+                directory.mkdir(exist_ok=True)
+                path_hash = hashlib.blake2b(corpus_path.encode('utf-8'), digest_size=6).hexdigest()
+                index = ArXMLivIndex(directory / f'{self.release}-{path_hash}.sqlite', self._member_to_arxivid)
+                index.open()
+                self._index = index
+            except (OSError, sqlite3.Error) as e:
+                self._disable_index(e)
+        return self._index
+
+    def _disable_index(self, error: Exception):
+        logger.warning(f'Cannot use the index for arXMLiv {self.release} (the zip archives are read instead): {error}')
+        self._index = None
+        self._index_unavailable = True
+
+    @classmethod
+    def _member_to_arxivid(cls, member_name: str) -> Optional[str]:
+        arxivid = cls.filename_to_arxivid_or_none(member_name.split('/')[-1])
+        return arxivid.identifier if arxivid is not None else None
 
     def get_document_by_id(self, arxivid: ArxivId) -> ArXMLivDocument:
+        # the index is not updated here (indexing the whole release just to look up a single document would take long)
+        if (index := self.get_index()) is not None:
+            try:
+                found = index.lookup(arxivid.identifier)
+            except sqlite3.Error as e:
+                self._disable_index(e)
+                found = None
+            if found is not None:
+                archive, member = found
+                return ZipArXMLivDocument(arxivid, self.release, archive, member.name, member)
         location = self._get_yymm_location(arxivid.yymm)
         if location.name.endswith('.zip'):
             return ZipArXMLivDocument(arxivid, self.release, location,
@@ -108,12 +197,16 @@ class ArXMLivCorpus(Corpus):
             raise CannotLocateCorpusDataError(e)
 
     def _get_yymm_location(self, yymm: str) -> Path:
+        if yymm in self._yymm_locations:
+            return self._yymm_locations[yymm]
         path = self.get_path()
         for directory in [path / f'{yymm}', path / 'data' / f'{yymm}']:
             if directory.is_dir():
+                self._yymm_locations[yymm] = directory
                 return directory
         for zip_path in [path / f'{yymm}.zip', path / 'data' / f'{yymm}.zip']:
             if zip_path.is_file():
+                self._yymm_locations[yymm] = zip_path
                 return zip_path
         raise DocumentNotFoundError(f'Failed to find a folder for "{yymm}" in {path}')
 
@@ -136,17 +229,45 @@ class ArXMLivCorpus(Corpus):
                 return ArxivId(match.group('digits'))
         return None
 
+    def _get_updated_index(self, locations: list[Path]) -> Optional[ArXMLivIndex]:
+        """ Returns the index after indexing the zip archives at the yymm locations (or None if it is unavailable) """
+        if (index := self.get_index()) is not None:
+            try:
+                index.update([location for location in locations if not location.is_dir()])
+            except sqlite3.Error as e:
+                self._disable_index(e)
+        return self._index
+
     def __iter__(self) -> Iterator[ArXMLivDocument]:
-        for yymm_location in self._iter_yymm_locations():
+        locations = list(self._iter_yymm_locations())
+        index = self._get_updated_index(locations)
+        for yymm_location in locations:
             if yymm_location.is_dir():
                 for path in yymm_location.iterdir():
                     if arxivid := self.filename_to_arxivid_or_none(path.name):
                         yield SimpleArXMLivDocument(arxivid, self.release, path)
             else:
                 assert yymm_location.name.endswith('.zip')
-                for name in SHARED_ZIP_CACHE[yymm_location].namelist():
-                    if arxivid := self.filename_to_arxivid_or_none(name.split('/')[-1]):
-                        yield ZipArXMLivDocument(arxivid, self.release, yymm_location, name)
+                if index is not None:
+                    for identifier, member in index.get_members(yymm_location):
+                        yield ZipArXMLivDocument(ArxivId(identifier), self.release, yymm_location, member.name,
+                                                 member)
+                else:
+                    for name in SHARED_ZIP_CACHE[yymm_location].namelist():
+                        if arxivid := self.filename_to_arxivid_or_none(name.split('/')[-1]):
+                            yield ZipArXMLivDocument(arxivid, self.release, yymm_location, name)
+
+    def get_number_of_documents(self) -> Optional[int]:
+        # only requires directory listings and the index
+        locations = list(self._iter_yymm_locations())
+        index = self._get_updated_index(locations)
+        if index is None:
+            return None
+        count = 0
+        for yymm_location in locations:
+            if yymm_location.is_dir():
+                count += sum(1 for path in yymm_location.iterdir() if self.filename_regex.match(path.name))
+        return count + index.count()
 
 
 ARXMLIV_CORPORA: dict[str, ArXMLivCorpus] = {
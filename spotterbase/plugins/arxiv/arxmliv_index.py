@@ -0,0 +1,187 @@
+"""
+A persistent index of the documents in the zip archives of an arXMLiv release.
+
+Listing the documents of a release requires reading the central directories of all zip archives,
+which takes minutes for a full release.
+The index stores the archive and the location in it (member name, offset of the local header, sizes, CRC)
+for every document.
+It is an SQLite database in the cache directory (one per release and corpus location).
+Archives are (re-)indexed when they are new or if their modification time or size changed.
+Every process keeps its own connection to the database (it is re-opened after forking).
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import sqlite3
+import zipfile
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from spotterbase.data.mapped_zip import ZipMemberInfo
+
+logger = logging.getLogger(__name__)
+
+# should be changed if the schema changes
+_FORMAT_VERSION: int = 2     # 2: arXiv ids do not have to be unique
+
+_SCHEMA = '''
+CREATE TABLE archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE members (
+    arxiv_id TEXT NOT NULL,
+    archive INTEGER NOT NULL REFERENCES archives(id),
+    name TEXT NOT NULL,
+    header_offset INTEGER NOT NULL,
+    compress_size INTEGER NOT NULL,
+    file_size INTEGER NOT NULL,
+    crc INTEGER NOT NULL,
+    compress_type INTEGER NOT NULL,
+    PRIMARY KEY (archive, name)
+);
+CREATE INDEX members_by_archive ON members(archive, header_offset);
+CREATE INDEX members_by_arxiv_id ON members(arxiv_id);
+'''
+
+
+_MEMBER_COLUMNS = 'name, header_offset, compress_size, file_size, crc, compress_type'
+
+
+class ArXMLivIndex:
+    """ ``member_to_arxivid`` returns the arXiv id for the name of a zip member
+    (or ``None`` if the member is not a document). """
+
+    def __init__(self, path: Path, member_to_arxivid: Callable[[str], Optional[str]]):
+        self.path = path
+        self.member_to_arxivid = member_to_arxivid
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: int = os.getpid()
+        # connections opened by the parent process (they must not be used - or closed - after forking)
+        self._inherited_connections: list[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            if connection.execute('PRAGMA user_version').fetchone()[0] != _FORMAT_VERSION:
+                with connection:
+                    connection.execute('DROP TABLE IF EXISTS members')
+                    connection.execute('DROP TABLE IF EXISTS archives')
+                    for statement in _SCHEMA.split(';'):
+                        if statement.strip():
+                            connection.execute(statement)
+                    connection.execute(f'PRAGMA user_version = {_FORMAT_VERSION}')
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if self._connection is not None and self._pid != os.getpid():
+            self._inherited_connections.append(self._connection)
+            self._connection = None
+        if self._connection is None:
+            self._connection = self._open()
+            self._pid = os.getpid()
+        yield self._connection
+
+    def open(self):
+        """ Opens the database (unless it is open already). Raises an exception if it cannot be used. """
+        with self._connect():
+            pass
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    @staticmethod
+    def _archive_key(archive: Path) -> str:
+        return str(archive.resolve())
+
+    def _is_up_to_date(self, connection: sqlite3.Connection, archive: Path) -> bool:
+        stat = archive.stat()
+        row = connection.execute('SELECT mtime_ns, size FROM archives WHERE path = ?',
+                                 (self._archive_key(archive),)).fetchone()
+        return row is not None and tuple(row) == (stat.st_mtime_ns, stat.st_size)
+
+    def _index_archive(self, connection: sqlite3.Connection, archive: Path):
+        logger.info(f'Indexing {archive}')
+        stat = archive.stat()
+        with zipfile.ZipFile(archive) as zf:
+            zip_infos = zf.infolist()
+        key = self._archive_key(archive)
+        with connection:    # a single transaction
+            connection.execute('DELETE FROM members WHERE archive IN (SELECT id FROM archives WHERE path = ?)', (key,))
+            connection.execute('DELETE FROM archives WHERE path = ?', (key,))
+            archive_id = connection.execute('INSERT INTO archives (path, mtime_ns, size) VALUES (?, ?, ?)',
+                                            (key, stat.st_mtime_ns, stat.st_size)).lastrowid
+            connection.executemany(
+                f'INSERT OR REPLACE INTO members (arxiv_id, archive, {_MEMBER_COLUMNS}) '
+                f'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((arxiv_id, archive_id, *ZipMemberInfo.from_zip_info(zip_info))
+                 for zip_info in zip_infos if (arxiv_id := self.member_to_arxivid(zip_info.filename)) is not None)
+            )
+            duplicates = connection.execute(
+                'SELECT arxiv_id, COUNT(*) FROM members '
+                'WHERE arxiv_id IN (SELECT arxiv_id FROM members WHERE archive = ?) '
+                'GROUP BY arxiv_id HAVING COUNT(*) > 1', (archive_id,)
+            ).fetchall()
+        if duplicates:
+            logger.warning(f'{len(duplicates)} documents in {archive} occur more than once in the corpus '
+                           f'(e.g. {duplicates[0][0]}) - lookups by id return the first occurrence')
+
+    def update(self, archives: list[Path]):
+        """ Indexes new or changed archives and removes archives that are not in ``archives`` from the index """
+        with self._connect() as connection:
+            for archive in archives:
+                if not self._is_up_to_date(connection, archive):
+                    self._index_archive(connection, archive)
+            keys = {self._archive_key(archive) for archive in archives}
+            with connection:
+                for archive_id, key in connection.execute('SELECT id, path FROM archives').fetchall():
+                    if key not in keys:
+                        connection.execute('DELETE FROM members WHERE archive = ?', (archive_id,))
+                        connection.execute('DELETE FROM archives WHERE id = ?', (archive_id,))
+
+    def get_members(self, archive: Path) -> list[tuple[str, ZipMemberInfo]]:
+        """ Returns the arXiv ids and members of the (indexed) archive, ordered by their position in the archive """
+        with self._connect() as connection:
+            return [
+                (row[0], ZipMemberInfo._make(row[1:]))
+                for row in connection.execute(
+                    f'SELECT arxiv_id, {_MEMBER_COLUMNS} FROM members '
+                    f'WHERE archive = (SELECT id FROM archives WHERE path = ?) ORDER BY header_offset',
+                    (self._archive_key(archive),)
+                )
+            ]
+
+    def count(self) -> int:
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM members').fetchone()[0]
+
+    def lookup(self, arxiv_id: str) -> Optional[tuple[Path, ZipMemberInfo]]:
+        """ Returns the archive and member for the document (if it is indexed).
+        If the document occurs in several archives, the first one (ordered by path) is returned.
+        The archive is re-indexed if it changed. """
+        with self._connect() as connection:
+            for _ in range(2):
+                row = connection.execute(
+                    f'SELECT archives.path, {_MEMBER_COLUMNS} '
+                    f'FROM members JOIN archives ON members.archive = archives.id WHERE arxiv_id = ? '
+                    f'ORDER BY archives.path, header_offset LIMIT 1', (arxiv_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                archive = Path(row[0])
+                if not archive.is_file():
+                    return None
+                if self._is_up_to_date(connection, archive):
+                    return archive, ZipMemberInfo._make(row[1:])
+                self._index_archive(connection, archive)
+        return None
@@ -43,7 +43,7 @@ def iter_triples(corpus: ArXMLivCorpus, centi: bool = False) -> TripleI:
     yield from CorpusInfo(uri=corpus_uri, label=f'arXMLiv {corpus.release}', based_on=ArxivUris.dataset).to_triples()
 
     logger.info(f'Iterating over documents in {corpus.get_path()}')
-    progress_updater = ProgressUpdater('{progress} documents processed')
+    progress_updater = ProgressUpdater('{progress} documents processed', unit='documents')
     for i, document in enumerate(corpus):
         if i % 1000 == 0:
             progress_updater.update(i)
@@ -65,7 +65,8 @@ def iter_triples(corpus: ArXMLivCorpus, centi: bool = False) -> TripleI:
                                (ArXMLivUris.severity_error, 'error')]:
             yield from Tag(uri=sev_uri, label=label, belongs_to=tag_set.uri).to_triples()
 
-        progress_updater = ProgressUpdater('Created severity annotation for {progress} documents')
+        progress_updater = ProgressUpdater('Created severity annotation for {progress} documents',
+                                           total=len(np) + len(w) + len(e), unit='documents')
         i = 0
         for docs, sev in [(np, ArXMLivUris.severity_no_problem), (w, ArXMLivUris.severity_warning),
                           (e, ArXMLivUris.severity_error)]:
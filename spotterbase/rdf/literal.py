@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 import datetime
 from typing import Callable, Any
 from typing import Optional
@@ -12,7 +13,7 @@ from spotterbase.rdf.uri import Uri
 from spotterbase.rdf.vocab import XSD, RDF
 
 
-__all__ = ['Literal', 'HtmlFragment']
+__all__ = ['Literal', 'HtmlFragment', 'LazyHtmlFragment']
 
 
 class HtmlFragment:
@@ -51,6 +52,35 @@ class HtmlFragment:
         return self._literal_string
 
 
+class LazyHtmlFragment(HtmlFragment):
+    """An :class:`HtmlFragment` that consists of a node in an existing DOM.
+
+    Unlike ``HtmlFragment(node, wrapped_in_div=False)``, the node is neither moved nor copied.
+    Instead, it is only serialized (or copied) when needed.
+    This means that the node should not be modified as long as the fragment is in use.
+    If ``strip_tail`` is set, the tail of the node is not part of the fragment.
+    """
+
+    def __init__(self, node: etree._Element, strip_tail: bool = True):
+        self.node = node
+        self.strip_tail = strip_tail
+
+    def get_wrapped_lxml_element(self) -> etree._Element:
+        if self._lxml_root is None:
+            node_copy = copy.deepcopy(self.node)
+            if self.strip_tail:
+                node_copy.tail = None
+            self._lxml_root = etree.Element('div')
+            self._lxml_root.append(node_copy)
+        return self._lxml_root
+
+    def get_literal_string(self) -> str:
+        if self._literal_string is None:
+            self._literal_string = etree.tostring(self.node, method='html', encoding='unicode',
+                                                  with_tail=not self.strip_tail).strip()
+        return self._literal_string
+
+
 _LITERAL_TO_PYTHON_FUNCTIONS: dict[Uri, Callable[[str], Any]] = {
     XSD.string: lambda s: s,
     XSD.integer: int,
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import array
 import bisect
 import dataclasses
 import enum
-from typing import Optional
+from typing import Iterable, Optional, Sequence
 
-from lxml.etree import _Element, _Comment
+from lxml.etree import _Element, Comment, Element, ProcessingInstruction, Entity
 
 from spotterbase.selectors.dom_range import DomPoint, DomRange
 
@@ -78,75 +79,169 @@ class OffsetConverter:
 
     Notes on efficiency:
 
-    * Recurses through entire DOM at initialization, which takes time (approximately 1/6th of parsing time).
+    * Iterates over the entire DOM at initialization, which takes time.
+        To keep this cheap, the offsets are stored in arrays indexed by the position of the node in pre-order
+        (rather than creating a :class:`NodeOffsetData` object for every node).
     * If a single offset is of interest, using an html tree (`lxml.html.parse`) and `.text_content()`
         with a custom implementation is every efficient (10x faster).
         However, I expect that there will often be more than 10 offets to convert.
     """
 
     root: _Element
-    _node_to_offset: dict[_Element, NodeOffsetData]
-    _nodes_pre_order: list[tuple[_Element, NodeOffsetData]]
-    _nodes_post_order: list[tuple[_Element, NodeOffsetData]]
+    _node_to_index: dict[_Element, int]
+    _nodes_pre_order: list[_Element]
+    _post_order: array.array             # pre-order indices of the nodes in post-order
+    _text_offsets_before: array.array
+    _node_text_offsets_before: array.array
+    _text_offsets_after: array.array
+    _node_text_offsets_after: array.array
+    # the "after" offsets in post-order (they are sorted, so we can bisect them)
+    _text_offsets_after_post_order: array.array
+    _node_text_offsets_after_post_order: array.array
 
     def __init__(self, root: _Element):
-        node_to_offset = {}
-        nodes_pre_order = []
-        nodes_post_order = []
+        node_to_index: dict[_Element, int] = {}
+        nodes_pre_order: list[_Element] = []
+        post_order = array.array('q')
+        text_offsets_before = array.array('q')
+        node_text_offsets_before = array.array('q')
+        text_offsets_after = array.array('q')
+        node_text_offsets_after = array.array('q')
+        text_offsets_after_post_order = array.array('q')
+        node_text_offsets_after_post_order = array.array('q')
         text_counter: int = 0
         node_counter: int = 0
 
-        def recurse(node: _Element):
+        # nodes whose end has not been reached yet (with their pre-order indices)
+        open_nodes: list[_Element] = []
+        open_indices: list[int] = []
+
+        def close_node():
             nonlocal text_counter, node_counter
-            text_counter_start = text_counter
-            node_counter_start = node_counter
+            node = open_nodes.pop()
+            index = open_indices.pop()
+            node_counter += 1
+            post_order.append(index)
+            text_offsets_after[index] = text_counter
+            node_text_offsets_after[index] = text_counter + node_counter + 1
+            text_offsets_after_post_order.append(text_counter)
+            node_text_offsets_after_post_order.append(text_counter + node_counter + 1)
+            if open_nodes and (t := node.tail):
+                text_counter += len(t)
+
+        # Iterating over root.iter() is faster than a recursion (or etree.iterwalk)
+        # and does not run into recursion limits for deeply nested nodes.
+        for node in root.iter():
+            if open_nodes:
+                parent = node.getparent()
+                while open_nodes[-1] is not parent:
+                    close_node()
+                if node.tag is Comment:  # it's probably better to ignore comments...
+                    if t := node.tail:
+                        text_counter += len(t)
+                    continue
+                node_counter += 1
+
+            index = len(nodes_pre_order)
+            node_to_index[node] = index
             nodes_pre_order.append(node)
+            open_nodes.append(node)
+            open_indices.append(index)
+            text_offsets_before.append(text_counter)
+            node_text_offsets_before.append(text_counter + node_counter)
+            text_offsets_after.append(0)        # set when the node is closed
+            node_text_offsets_after.append(0)
 
             if t := node.text:
                 text_counter += len(t)
 
-            for child in node.iterchildren():
-                skip = isinstance(child, _Comment)  # it's probably better to ignore comments...
-                if not skip:
-                    node_counter += 1
-                    recurse(child)
-                if t := child.tail:
-                    text_counter += len(t)
-
-            node_counter += 1
-
-            nodes_post_order.append(node)
-            node_to_offset[node] = NodeOffsetData(
-                text_offset_before=text_counter_start,
-                node_text_offset_before=text_counter_start + node_counter_start,
-                text_offset_after=text_counter,
-                node_text_offset_after=text_counter + node_counter + 1
-            )
-
-        recurse(root)
+        while open_nodes:
+            close_node()
 
         self.root = root
-        self._node_to_offset = node_to_offset
-        self._nodes_pre_order = [(node, node_to_offset[node]) for node in nodes_pre_order]
-        self._nodes_post_order = [(node, node_to_offset[node]) for node in nodes_post_order]
-
-    def get_offset_data(self, node: _Element) -> NodeOffsetData:
-        if node in self._node_to_offset:
-            return self._node_to_offset[node]
+        self._node_to_index = node_to_index
+        self._nodes_pre_order = nodes_pre_order
+        self._post_order = post_order
+        self._text_offsets_before = text_offsets_before
+        self._node_text_offsets_before = node_text_offsets_before
+        self._text_offsets_after = text_offsets_after
+        self._node_text_offsets_after = node_text_offsets_after
+        self._text_offsets_after_post_order = text_offsets_after_post_order
+        self._node_text_offsets_after_post_order = node_text_offsets_after_post_order
+
+    def to_bytes(self) -> bytes:
+        """ Returns a compact binary representation of the offsets, which can be loaded with :meth:`from_bytes`
+        (e.g. to cache them persistently). """
+        return b''.join(a.tobytes() for a in self._get_arrays())
+
+    @classmethod
+    def from_bytes(cls, root: _Element, data: bytes) -> OffsetConverter:
+        """ Restores an offset converter from the result of :meth:`to_bytes`.
+        ``root`` must be (a re-parsed version of) the same DOM that was used for the original offset converter. """
+        # the nodes that are not skipped, in pre-order
+        nodes: list[_Element] = list(root.iter(Element, ProcessingInstruction, Entity))
+        values = array.array('q')
+        values.frombytes(data)
+        n = len(nodes)
+        if len(values) != 7 * n:
+            raise ValueError('The data does not match the DOM')
+        arrays = [values[i * n:(i + 1) * n] for i in range(7)]
+
+        converter = cls.__new__(cls)
+        converter.root = root
+        converter._nodes_pre_order = nodes
+        converter._node_to_index = dict(zip(nodes, range(len(nodes))))
+        (converter._post_order, converter._text_offsets_before, converter._node_text_offsets_before,
+         converter._text_offsets_after, converter._node_text_offsets_after,
+         converter._text_offsets_after_post_order, converter._node_text_offsets_after_post_order) = arrays
+        return converter
+
+    def get_pre_order_index(self, node: _Element) -> int:
+        """ Returns the position of the node in pre-order (ignoring comments) """
+        return self._get_index(node)
+
+    def get_node_at_pre_order_index(self, index: int) -> _Element:
+        return self._nodes_pre_order[index]
+
+    def _get_arrays(self) -> list[array.array]:
+        return [self._post_order, self._text_offsets_before, self._node_text_offsets_before,
+                self._text_offsets_after, self._node_text_offsets_after,
+                self._text_offsets_after_post_order, self._node_text_offsets_after_post_order]
+
+    def _get_index(self, node: _Element) -> int:
+        if node in self._node_to_index:
+            return self._node_to_index[node]
         if node.getroottree().getroot() != self.root:
             raise Exception('Node does not belong to the tree used by this tracker')
         if not isinstance(node, _Element):
             raise ValueError(f'{node} is not a valid XML node')
         raise Exception('The node could not be found (maybe you added it to the DOM after creating the tracker?)')
 
+    def _get_offsets_at_index(self, index: int, offset_type: OffsetType) -> tuple[int, int]:
+        if offset_type == OffsetType.Text:
+            return self._text_offsets_before[index], self._text_offsets_after[index]
+        elif offset_type == OffsetType.NodeText:
+            return self._node_text_offsets_before[index], self._node_text_offsets_after[index]
+        else:
+            raise Exception('Unsupported offset type')
+
+    def get_offset_data(self, node: _Element) -> NodeOffsetData:
+        index = self._get_index(node)
+        return NodeOffsetData(
+            text_offset_before=self._text_offsets_before[index],
+            node_text_offset_before=self._node_text_offsets_before[index],
+            text_offset_after=self._text_offsets_after[index],
+            node_text_offset_after=self._node_text_offsets_after[index],
+        )
+
     def get_offset(self, point: _Element | DomPoint, offset_type: OffsetType) -> int:
         if isinstance(point, _Element):
-            return self.get_offset_data(point).get_offsets_of_type(offset_type)[0]
+            return self._get_offsets_at_index(self._get_index(point), offset_type)[0]
         if offset_type != OffsetType.NodeText:
             # this requires careful design and some testing.
             raise Exception('Getting text offsets for a DomPoint is not supported')
 
-        node_offsets = self.get_offset_data(point.node).get_offsets_of_type(offset_type)
+        node_offsets = self._get_offsets_at_index(self._get_index(point.node), offset_type)
 
         if point.text_offset is not None:
             offset = node_offsets[0] + point.text_offset + 1
@@ -164,13 +259,56 @@ class OffsetConverter:
             else:
                 return node_offsets[0]
 
+    def get_node_text_offsets(self, points: Iterable[DomPoint]) -> list[int]:
+        """ Like :meth:`get_offset` with ``OffsetType.NodeText``, but for many points at once
+        (the results are in the same order). """
+        node_to_index = self._node_to_index
+        offsets_before = self._node_text_offsets_before
+        offsets_after = self._node_text_offsets_after
+        results: list[int] = []
+        for point in points:
+            node = point.node
+            index = node_to_index[node] if node in node_to_index else self._get_index(node)
+            if point.text_offset is not None:
+                results.append(offsets_before[index] + point.text_offset + 1 + point.after)
+            elif point.tail_offset is not None:
+                results.append(offsets_after[index] + point.tail_offset + point.after)
+            else:
+                results.append(offsets_after[index] if point.after else offsets_before[index])
+        return results
+
     def get_dom_point(self, offset: int, offset_type: OffsetType, is_start: Optional[bool] = None) -> DomPoint:
-        assert offset >= 0
-        if offset > self._nodes_post_order[-1][1].get_offsets_of_type(offset_type)[1] + 1:
+        self._check_offset_range(offset, offset, offset_type)
+        return self._get_dom_point(offset, offset_type, is_start, [0, 0])
+
+    def get_dom_points(self, offsets: Sequence[int], offset_type: OffsetType,
+                       is_start: Optional[bool] = None) -> list[DomPoint]:
+        """ Like :meth:`get_dom_point`, but for many offsets at once (the results are in the same order).
+
+        The offsets are processed in sorted order, so every search only has to consider
+        the nodes after the ones found for the previous offset.
+        """
+        if not offsets:
+            return []
+        order = sorted(range(len(offsets)), key=offsets.__getitem__)
+        self._check_offset_range(offsets[order[0]], offsets[order[-1]], offset_type)
+        results: list[Optional[DomPoint]] = [None] * len(offsets)
+        lower_bounds = [0, 0]
+        for i in order:
+            results[i] = self._get_dom_point(offsets[i], offset_type, is_start, lower_bounds)
+        return results  # type: ignore  # all entries are set
+
+    def _check_offset_range(self, min_offset: int, max_offset: int, offset_type: OffsetType):
+        assert min_offset >= 0
+        if max_offset > self._get_offsets_at_index(0, offset_type)[1] + 1:
             raise Exception('Offset is too large for this DOM. Maybe it refers to a different document?')
 
+    def _get_dom_point(self, offset: int, offset_type: OffsetType, is_start: Optional[bool],
+                       lower_bounds: list[int]) -> DomPoint:
+        """ ``lower_bounds`` are lower bounds for the bisections in pre-order and post-order, respectively.
+        They get updated, so they can be re-used for larger offsets. """
         if offset_type == OffsetType.NodeText:
-            return self._get_dom_point_node_text(offset)
+            return self._get_dom_point_node_text(offset, lower_bounds)
         else:
             assert offset_type == OffsetType.Text
             assert is_start is not None
@@ -179,38 +317,37 @@ class OffsetConverter:
             if not is_start:
                 offset_alt -= 1
 
-            index = bisect.bisect_right(self._nodes_pre_order, offset_alt,
-                                        key=lambda entry: entry[1].get_offsets_of_type(OffsetType.Text)[0]) - 1
-            node, offset_data = self._nodes_pre_order[index]
-            offsets = offset_data.get_offsets_of_type(OffsetType.Text)
-            if offsets[1] > offset_alt:
-                return DomPoint(node, text_offset=offset - offsets[0])
-            index = bisect.bisect_right(self._nodes_post_order, offset_alt,
-                                        key=lambda entry: entry[1].get_offsets_of_type(OffsetType.Text)[1]) - 1
-            node, offset_data = self._nodes_post_order[index]
-            offsets = offset_data.get_offsets_of_type(OffsetType.Text)
-            return DomPoint(node, tail_offset=offset - offsets[1])
-
-    def _get_dom_point_node_text(self, offset: int):
+            index = lower_bounds[0] = bisect.bisect_right(self._text_offsets_before, offset_alt, lo=lower_bounds[0])
+            index -= 1
+            if self._text_offsets_after[index] > offset_alt:
+                return DomPoint(self._nodes_pre_order[index], text_offset=offset - self._text_offsets_before[index])
+            position = lower_bounds[1] = bisect.bisect_right(self._text_offsets_after_post_order, offset_alt,
+                                                             lo=lower_bounds[1])
+            index = self._post_order[position - 1]
+            return DomPoint(self._nodes_pre_order[index], tail_offset=offset - self._text_offsets_after[index])
+
+    def _get_dom_point_node_text(self, offset: int, lower_bounds: list[int]) -> DomPoint:
         # option 1: it's a text (not a tail)
-        index = bisect.bisect_right(self._nodes_pre_order, offset,
-                                    key=lambda entry: entry[1].get_offsets_of_type(OffsetType.NodeText)[0]) - 1
-        node, offset_data = self._nodes_pre_order[index]
-        offsets = offset_data.get_offsets_of_type(OffsetType.NodeText)
-        if offsets[1] >= offset:
-            if offset == offsets[0]:  # actually, it's the node
+        index = lower_bounds[0] = bisect.bisect_right(self._node_text_offsets_before, offset, lo=lower_bounds[0])
+        index -= 1
+        offset_before = self._node_text_offsets_before[index]
+        offset_after = self._node_text_offsets_after[index]
+        if offset_after >= offset:
+            node = self._nodes_pre_order[index]
+            if offset == offset_before:  # actually, it's the node
                 return DomPoint(node)
-            if offset == offsets[1]:
+            if offset == offset_after:
                 return DomPoint(node, after=True)
-            return DomPoint(node, text_offset=offset - offsets[0] - 1)
+            return DomPoint(node, text_offset=offset - offset_before - 1)
         # option 2: it's a tail
-        index = bisect.bisect_right(self._nodes_post_order, offset,
-                                    key=lambda entry: entry[1].get_offsets_of_type(OffsetType.NodeText)[1]) - 1
-        node, offset_data = self._nodes_post_order[index]
-        offsets = offset_data.get_offsets_of_type(OffsetType.NodeText)
-        if offsets[1] == offset:
+        position = lower_bounds[1] = bisect.bisect_right(self._node_text_offsets_after_post_order, offset,
+                                                         lo=lower_bounds[1])
+        index = self._post_order[position - 1]
+        node = self._nodes_pre_order[index]
+        offset_after = self._node_text_offsets_after[index]
+        if offset_after == offset:
             return DomPoint(node, after=True)
-        return DomPoint(node, tail_offset=offset - offsets[1])
+        return DomPoint(node, tail_offset=offset - offset_after)
 
     def convert_dom_range(self, dom_range: DomRange) -> DomOffsetRange:
         return DomOffsetRange(
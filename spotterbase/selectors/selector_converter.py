@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import re
-from typing import Optional, Any
+from collections import OrderedDict
+from typing import Optional, Any, Iterable
 
 from lxml.etree import _Element, XPathEvalError
 
@@ -15,12 +16,21 @@ from spotterbase.selectors.offset_converter import OffsetConverter, OffsetType
 # Warning: this regex is used in other places
 PATH_SELECTOR_REGEX = re.compile(r'(?P<type>(node)|(after-node)|(char))\((?P<xpath>.*?)(, *(?P<offset>[0-9]+))?\)')
 
+# maximum number of XPaths that are cached after being resolved with the XPath engine
+_MAX_CACHED_XPATHS: int = 2 ** 12
+
 
 class SelectorConverter:
     def __init__(self, document_uri: Uri, dom: _Element, offset_converter: OffsetConverter):
         self._document_uri: Uri = document_uri
         self._dom: _Element = dom
         self._offset_converter: OffsetConverter = offset_converter
+        # cache for the XPaths of nodes (they are needed very often when creating selectors)
+        self._node_to_path: dict[_Element, str] = {}
+        self._path_to_node: dict[str, _Element] = {}
+        # cache for other XPaths (resolving them with the XPath engine is relatively expensive
+        # and often the same paths are needed repeatedly)
+        self._xpath_to_node: OrderedDict[str, _Element] = OrderedDict()
 
     @property
     def offset_converter(self) -> OffsetConverter:
@@ -80,16 +90,7 @@ class SelectorConverter:
         match = PATH_SELECTOR_REGEX.fullmatch(path)
         if match is None:
             raise Exception(f'Invalid path: {path!r}')
-        try:
-            node: Any = self._dom.xpath(match.group('xpath'))
-        except XPathEvalError as e:
-            raise Exception(f'Error occurred when evaluating xPath {path!r}') from e
-        if isinstance(node, list):
-            if len(node) != 1:
-                raise Exception(f'XPath {path} does not yield unique node (yields {len(node)} nodes)')
-            node = node[0]
-        if not isinstance(node, _Element):
-            raise Exception('XPath does not point to normal node')
+        node = self._resolve_xpath(match.group('xpath'))
         type_ = match.group('type')
         offset = match.group('offset')
         if type_ in {'node', 'after-node'}:
@@ -102,6 +103,56 @@ class SelectorConverter:
         total_text_offset = int(offset) + self.offset_converter.get_offset(node, OffsetType.Text)
         return self.offset_converter.get_dom_point(total_text_offset, OffsetType.Text, is_start)
 
+    def _resolve_xpath(self, xpath: str) -> _Element:
+        if xpath.startswith('/'):
+            canonical_node = self._resolve_canonical_xpath(xpath)
+            if canonical_node is not None:
+                return canonical_node
+        node = self._xpath_to_node.get(xpath)
+        if node is not None:
+            self._xpath_to_node.move_to_end(xpath)
+        else:
+            node = self._xpath_to_node[xpath] = self._evaluate_xpath(xpath)
+            if len(self._xpath_to_node) > _MAX_CACHED_XPATHS:
+                self._xpath_to_node.popitem(last=False)
+        return node
+
+    def _evaluate_xpath(self, xpath: str) -> _Element:
+        try:
+            node: Any = self._dom.xpath(xpath)
+        except XPathEvalError as e:
+            raise Exception(f'Error occurred when evaluating xPath {xpath!r}') from e
+        if isinstance(node, list):
+            if len(node) != 1:
+                raise Exception(f'XPath {xpath} does not yield unique node (yields {len(node)} nodes)')
+            node = node[0]
+        if not isinstance(node, _Element):
+            raise Exception('XPath does not point to normal node')
+        return node
+
+    def _resolve_canonical_xpath(self, xpath: str) -> Optional[_Element]:
+        """ Resolves an XPath as produced by ``getpath`` (e.g. /html/body/div[2]/p) using the path cache
+        (see :meth:`get_path`), i.e. without an XPath engine.
+        The XPath is resolved step by step, computing the paths of the children of a node where necessary.
+        Returns None if that is not possible (then the XPath engine should take care of it,
+        e.g. to create the appropriate error message). """
+        path_to_node = self._path_to_node
+        if xpath in path_to_node:
+            return path_to_node[xpath]
+        node: Optional[_Element] = None
+        prefix = ''
+        for step in xpath[1:].split('/'):
+            prefix += '/' + step
+            if prefix not in path_to_node:
+                if node is None:
+                    self.get_path(self._dom.getroottree().getroot())
+                elif len(node) and node[0] not in self._node_to_path:
+                    self._compute_sibling_paths(node[0])
+                if prefix not in path_to_node:
+                    return None
+            node = path_to_node[prefix]
+        return node
+
     def dom_to_selectors(self, dom_range: DomRange, sub_ranges: Optional[list[DomRange]] = None)\
             -> list[PathSelector | OffsetSelector]:
         path_selector = self.dom_to_path_selector(dom_range)
@@ -112,6 +163,30 @@ class SelectorConverter:
         offset_selector = self.dom_to_offset_selector(dom_range)
         return [path_selector, offset_selector]
 
+    def dom_ranges_to_selectors(self, dom_ranges: Iterable[DomRange]) -> list[list[PathSelector | OffsetSelector]]:
+        """ Like :meth:`dom_to_selectors` (without sub-ranges), but for many ranges at once.
+
+        The end points of all ranges are converted together: the offsets are computed in a single pass
+        (see :meth:`OffsetConverter.get_node_text_offsets`) and the path of every distinct point
+        is computed only once (ranges often share end points or nodes).
+        """
+        points = [point for dom_range in dom_ranges for point in (dom_range.start, dom_range.end)]
+        offsets = self.offset_converter.get_node_text_offsets(points)
+        # a DomPoint is not hashable
+        paths: dict[tuple[_Element, Optional[int], Optional[int], bool], str] = {}
+        point_paths: list[str] = []
+        for point in points:
+            key = (point.node, point.text_offset, point.tail_offset, point.after)
+            path = paths.get(key)
+            if path is None:
+                path = paths[key] = self._dom_point_to_path(point)
+            point_paths.append(path)
+        return [
+            [PathSelector(start=point_paths[i], end=point_paths[i + 1]),
+             OffsetSelector(start=offsets[i], end=offsets[i + 1])]
+            for i in range(0, len(points), 2)
+        ]
+
     def dom_to_fragment_target(
             self, target_uri: UriLike, dom_range: DomRange, sub_ranges: Optional[list[DomRange]] = None
     ) -> FragmentTarget:
@@ -132,17 +207,62 @@ class SelectorConverter:
         )
 
     def _dom_point_to_path(self, dom_point: DomPoint) -> str:
-        roottree = dom_point.node.getroottree()
         if dom_point.text_offset is not None:
-            return f'char({roottree.getpath(dom_point.node)},{dom_point.text_offset + int(dom_point.after)})'
+            return f'char({self.get_path(dom_point.node)},{dom_point.text_offset + int(dom_point.after)})'
         elif dom_point.tail_offset is not None:
             offset = self.offset_converter.get_offset_data(dom_point.node).text_offset_after + dom_point.tail_offset
             parent = dom_point.node.getparent()
             assert parent is not None
             parent_offset = self.offset_converter.get_offset_data(parent).text_offset_before
-            return f'char({roottree.getpath(parent)},{offset - parent_offset + int(dom_point.after)})'
+            return f'char({self.get_path(parent)},{offset - parent_offset + int(dom_point.after)})'
         else:
             if dom_point.after:
-                return f'after-node({roottree.getpath(dom_point.node)})'
+                return f'after-node({self.get_path(dom_point.node)})'
+            else:
+                return f'node({self.get_path(dom_point.node)})'
+
+    def get_path(self, node: _Element) -> str:
+        """ Returns the same XPath as ``node.getroottree().getpath(node)``, but the results are cached.
+
+        Whenever the path of a node is needed, the paths of all its siblings are computed as well
+        (this requires a single pass over the siblings, while ``getpath`` requires a pass for every node).
+        """
+        node_to_path = self._node_to_path
+        if node in node_to_path:
+            return node_to_path[node]
+        # find the closest ancestor with a known path
+        ancestors: list[_Element] = []
+        current: Optional[_Element] = node
+        while current is not None and current not in node_to_path:
+            ancestors.append(current)
+            current = current.getparent()
+        for ancestor in reversed(ancestors):
+            if ancestor not in node_to_path:    # could have been added as a sibling of a previous ancestor
+                self._compute_sibling_paths(ancestor)
+        return node_to_path[node]
+
+    def _compute_sibling_paths(self, node: _Element):
+        """ Computes the paths of the node and its siblings (the path of the parent must be known). """
+        parent = node.getparent()
+        if parent is None:
+            self._set_path(node, node.getroottree().getpath(node))
+            return
+        parent_path = self._node_to_path[parent]
+        tag_counts: dict[Any, int] = {}
+        for child in parent:
+            tag_counts[child.tag] = tag_counts.get(child.tag, 0) + 1
+        tag_indices: dict[str, int] = {}
+        for child in parent:
+            tag = child.tag
+            if not isinstance(tag, str) or tag.startswith('{'):
+                # comments, processing instructions and namespaced nodes are rare - let lxml handle them
+                self._set_path(child, child.getroottree().getpath(child))
+            elif tag_counts[tag] == 1:
+                self._set_path(child, f'{parent_path}/{tag}')
             else:
-                return f'node({roottree.getpath(dom_point.node)})'
+                index = tag_indices[tag] = tag_indices.get(tag, 0) + 1
+                self._set_path(child, f'{parent_path}/{tag}[{index}]')
+
+    def _set_path(self, node: _Element, path: str):
+        self._node_to_path[node] = path
+        self._path_to_node[path] = node
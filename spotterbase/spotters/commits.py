@@ -0,0 +1,99 @@
+"""
+Checkpointed commits of the results of a spotter run, which make it possible to continue an interrupted run
+exactly once (i.e. without losing results or writing the results of a document twice).
+
+The runner buffers results and commits them periodically:
+First, the buffered data is appended to the files (result files, ``processed_docs.txt``, ...)
+and synced to the disk.
+Afterwards, a commit record with the new lengths of all files is appended to the commit log (``commits.jsonl``).
+Writing the commit record is the point of no return:
+When continuing a run, all files are truncated to the lengths in the last complete commit record,
+which discards everything that was written after it
+(e.g. results of documents that have not been recorded as processed yet).
+Results are appended as complete gzip members, so truncating the files leaves valid gzip files.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+COMMIT_LOG_FILE_NAME = 'commits.jsonl'
+
+
+@dataclasses.dataclass
+class Commit:
+    sequence_number: int
+    file_lengths: dict[str, int]        # file name (relative to the directory) -> length in bytes
+    metadata: dict[str, Any] = dataclasses.field(default_factory=dict)     # e.g. a snapshot of the shard manifest
+
+    def to_json(self) -> dict[str, Any]:
+        return {'seq': self.sequence_number, 'files': self.file_lengths, 'metadata': self.metadata}
+
+    @classmethod
+    def from_json(cls, json_: dict[str, Any]) -> Commit:
+        return cls(sequence_number=json_['seq'], file_lengths=json_['files'], metadata=json_.get('metadata', {}))
+
+
+def sync_file(path: Path) -> int:
+    """ Makes sure that the content of the file has been written to the disk and returns its length """
+    if not path.is_file():
+        return 0
+    with open(path, 'rb') as fp:
+        os.fsync(fp.fileno())
+        return fp.seek(0, os.SEEK_END)
+
+
+class CommitLog:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.path = directory / COMMIT_LOG_FILE_NAME
+        self.last_commit: Optional[Commit] = None
+        if self.path.is_file():
+            self._load()
+
+    def _load(self):
+        valid_length = 0
+        with open(self.path, 'rb+') as fp:
+            for line in fp:
+                if not line.endswith(b'\n'):
+                    break       # incomplete commit record (the process was killed while writing it)
+                self.last_commit = Commit.from_json(json.loads(line))
+                valid_length += len(line)
+            if valid_length < fp.seek(0, os.SEEK_END):
+                logger.warning(f'Truncating incomplete commit record in {self.path}')
+                fp.truncate(valid_length)
+
+    def recover(self) -> Optional[Commit]:
+        """ Truncates the files to their lengths in the last commit and returns the commit """
+        if self.last_commit is None:
+            return None
+        for file_name, length in self.last_commit.file_lengths.items():
+            path = self.directory / file_name
+            actual_length = path.stat().st_size if path.is_file() else 0
+            if actual_length < length:
+                raise Exception(f'{path} is shorter than in commit {self.last_commit.sequence_number} '
+                                f'({actual_length} < {length} bytes)')
+            if actual_length > length:
+                logger.info(f'Discarding {actual_length - length} uncommitted bytes of {path}')
+                with open(path, 'rb+') as fp:
+                    fp.truncate(length)
+                    os.fsync(fp.fileno())
+        logger.info(f'Recovered the state of commit {self.last_commit.sequence_number}')
+        return self.last_commit
+
+    def commit(self, file_lengths: dict[str, int], metadata: Optional[dict[str, Any]] = None) -> Commit:
+        """ Records the new file lengths. The files have to be synced (see :func:`sync_file`) before. """
+        sequence_number = self.last_commit.sequence_number + 1 if self.last_commit is not None else 0
+        commit = Commit(sequence_number, dict(file_lengths), metadata or {})
+        with open(self.path, 'a') as fp:
+            fp.write(json.dumps(commit.to_json()) + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+        self.last_commit = commit
+        return commit
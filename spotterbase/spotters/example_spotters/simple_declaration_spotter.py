@@ -157,7 +157,8 @@ class SimpleDeclarationSpotter(UriGeneratorMixin, Spotter):
         # tree = etree.parse(document.open(), parser=etree.HTMLParser())  # type: ignore
         tree = document.get_html_tree(cached=True)
         selector_converter = document.get_selector_converter()
-        dnm = ARXMLIV_STANDARD_DNM_FACTORY_SIMPLE.dnm_from_document(document).lower()
+        # cached: the DNM can be shared with other spotters (the runner releases it afterwards)
+        dnm = ARXMLIV_STANDARD_DNM_FACTORY_SIMPLE.dnm_from_document(document, cached=True).lower()
 
         # regex_univ = re.compile('((let)|(for (every|all))|(where)) (?P<m>mathnode)')
         regex_univ1 = re.compile('(for ((every)|(all)|(any))) (?P<c>SpottedConcept)?(?P<m>mathnode)')
@@ -210,21 +211,23 @@ class SimpleDeclarationSpotter(UriGeneratorMixin, Spotter):
                     # part 3: identifier occurrences
                     math_nodes_in_para = para_node.xpath('.//math')
                     assert isinstance(math_nodes_in_para, list)
+                    matched_nodes: list[_Element] = []
                     for math_node in math_nodes_in_para:
                         assert isinstance(math_node, _Element)
                         for matched_node in find_node_matches(math_node, id_node):
-                            if matched_node == id_node:
-                                continue
-                            uri = next(uri_generator)
-                            id_occ_target = FragmentTarget(
-                                uri('target'), source=document.get_uri(),
-                                selectors=selector_converter.dom_to_selectors(DomRange.from_node(matched_node))
-                            )
-                            yield from id_occ_target.to_triples()
-                            yield from Annotation(
-                                uri('anno'), target_uri=id_occ_target.uri,
-                                body=IdentifierOccurrence(occurrence_of=identifier.uri), creator_uri=self.ctx.run_uri
-                            ).to_triples()
+                            if matched_node != id_node:
+                                matched_nodes.append(matched_node)
+                    all_selectors = selector_converter.dom_ranges_to_selectors(
+                        DomRange.from_node(matched_node) for matched_node in matched_nodes
+                    )
+                    for selectors in all_selectors:
+                        uri = next(uri_generator)
+                        id_occ_target = FragmentTarget(uri('target'), source=document.get_uri(), selectors=selectors)
+                        yield from id_occ_target.to_triples()
+                        yield from Annotation(
+                            uri('anno'), target_uri=id_occ_target.uri,
+                            body=IdentifierOccurrence(occurrence_of=identifier.uri), creator_uri=self.ctx.run_uri
+                        ).to_triples()
 
 
 if __name__ == '__main__':
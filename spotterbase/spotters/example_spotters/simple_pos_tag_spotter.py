@@ -73,7 +73,8 @@ class SimplePosTagSpotter(UriGeneratorMixin, Spotter):
     def process_document(self, document: Document) -> TripleI:
         uri_generator = self.get_uri_generator_for(document)
 
-        dnm = ARXMLIV_STANDARD_DNM_FACTORY_SIMPLE.dnm_from_document(document)
+        # cached: the DNM can be shared with other spotters (the runner releases it afterwards)
+        dnm = ARXMLIV_STANDARD_DNM_FACTORY_SIMPLE.dnm_from_document(document, cached=True)
 
         for sentence in sentence_tokenize(dnm):
             words = word_tokenize(sentence)
@@ -0,0 +1,138 @@
+"""
+Per-document resource limits for the worker processes of the spotter runner.
+
+Every worker process has a :class:`DocumentWatchdog` that supervises the document that is currently processed:
+
+* If processing the document takes longer than the time limit, :class:`DocumentLimitExceeded` is raised
+  in the main thread (via ``SIGALRM``).
+  If the main thread does not react (e.g. because it is stuck in C code), the worker process is terminated
+  after a grace period of the same length.
+* If the resident memory of the worker process exceeds the memory limit, the worker process is terminated
+  (Python would not necessarily release the memory otherwise).
+
+Documents that lead to the termination of a worker process are reported to the main process via a queue,
+the pool of the main process then starts a new worker process.
+"""
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Optional, Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentLimitExceeded(BaseException):
+    """ Raised if a document exceeds the time limit.
+    It is not a subclass of :class:`Exception` to ensure that it is not caught by the usual error handling
+    (e.g. of the spotters). """
+
+
+@dataclasses.dataclass
+class DocumentLimits:
+    timeout: Optional[float] = None         # in seconds
+    memory_limit: Optional[int] = None      # resident memory in bytes
+
+    def is_active(self) -> bool:
+        return self.timeout is not None or self.memory_limit is not None
+
+
+@dataclasses.dataclass
+class DocumentFailure:
+    doc_uri: str
+    reason: str
+
+
+_PAGE_SIZE: int = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_resident_memory() -> Optional[int]:
+    """ Returns the resident memory of the current process in bytes (currently only supported on Linux) """
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+class DocumentWatchdog:
+    """ Has to be created in the main thread of the worker process (see :func:`init_limits_worker`) """
+
+    def __init__(self, limits: DocumentLimits, failure_queue: Any, poll_interval: float = 0.2):
+        self.limits = limits
+        self.failure_queue = failure_queue      # a multiprocessing.SimpleQueue for DocumentFailure objects
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._current_doc: Optional[tuple[str, float]] = None     # (uri, start time)
+
+        if limits.memory_limit is not None and get_resident_memory() is None:
+            logger.warning('The memory limit is not supported on this system')
+        if limits.timeout is not None:
+            signal.signal(signal.SIGALRM, self._handle_alarm)
+        threading.Thread(target=self._supervise, daemon=True, name='document-watchdog').start()
+
+    def _handle_alarm(self, signum, frame):
+        # no locking here: the main thread might already hold the lock
+        if self._current_doc is not None:
+            raise DocumentLimitExceeded(f'time limit of {self.limits.timeout}s exceeded')
+
+    @contextlib.contextmanager
+    def watch(self, doc_uri: str) -> Iterator[None]:
+        with self._lock:
+            self._current_doc = (doc_uri, time.monotonic())
+        if self.limits.timeout is not None:
+            signal.setitimer(signal.ITIMER_REAL, self.limits.timeout)
+        try:
+            yield
+        finally:
+            # disarm the timer first, so that the alarm cannot interrupt the cleanup
+            # (otherwise, the document would remain the current one and the idle worker process could be terminated)
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            with self._lock:
+                self._current_doc = None
+
+    def _supervise(self):
+        while True:
+            time.sleep(self.poll_interval)
+            # The lock is held while terminating the process, so the main thread cannot finish the document
+            # in the meantime. Otherwise, it could e.g. hold the lock of the pool's result queue
+            # when the process is terminated, which would block the other processes.
+            with self._lock:
+                if self._current_doc is None:
+                    continue
+                doc_uri, start_time = self._current_doc
+                if self.limits.timeout is not None and time.monotonic() - start_time > 2 * self.limits.timeout:
+                    self._terminate(DocumentFailure(doc_uri, f'time limit of {self.limits.timeout}s exceeded '
+                                                             f'(the worker process had to be terminated)'))
+                if self.limits.memory_limit is not None:
+                    memory = get_resident_memory()
+                    if memory is not None and memory > self.limits.memory_limit:
+                        self._terminate(DocumentFailure(doc_uri, f'memory limit of {self.limits.memory_limit} bytes '
+                                                                 f'exceeded ({memory} bytes)'))
+
+    def _terminate(self, failure: DocumentFailure):
+        logger.error(f'Terminating worker process {os.getpid()} while processing {failure.doc_uri}: {failure.reason}')
+        self.failure_queue.put(failure)
+        os._exit(1)
+
+
+# state of the worker process
+_watchdog: Optional[DocumentWatchdog] = None
+
+
+def init_limits_worker(limits: DocumentLimits, failure_queue: Any):
+    global _watchdog
+    if limits.is_active():
+        _watchdog = DocumentWatchdog(limits, failure_queue)
+
+
+def watch_document(doc_uri: str) -> contextlib.AbstractContextManager:
+    """ Enforces the limits (if :func:`init_limits_worker` was called) while processing the document """
+    if _watchdog is None:
+        return contextlib.nullcontext()
+    return _watchdog.watch(doc_uri)
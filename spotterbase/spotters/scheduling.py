@@ -0,0 +1,226 @@
+"""
+Scheduling of documents for the worker processes of the spotter runner.
+
+Documents can vary a lot in size (e.g. arXMLiv documents range from a few KB to dozens of MB).
+To keep all workers busy, the :class:`AdaptiveScheduler`
+
+* sorts documents by their (estimated) size within a window of upcoming documents
+  and dispatches large documents first (so that they do not hold up the end of a run),
+* keeps documents from the same archive (e.g. a zip file of the arXMLiv corpus) together:
+  they are batched in the order in which they are stored in the archive
+  and a batch never contains documents from different archives,
+* groups documents into batches that should take roughly the same time,
+  based on the observed processing time per byte (or per document, if the size is unknown),
+* keeps only a bounded number of batches in flight (so that the batch sizes can adapt quickly),
+* re-submits the remaining documents of a batch if the worker process was terminated
+  because of a document that exceeded the limits (see :mod:`spotterbase.spotters.limits`), and
+* records how busy every worker process was.
+"""
+from __future__ import annotations
+
+import dataclasses
+import itertools
+import logging
+import os
+import queue
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from spotterbase.corpora.interface import Document
+from spotterbase.spotters.limits import DocumentFailure, DocumentLimitExceeded
+from spotterbase.utils import timing
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Batch:
+    documents: list[Document]
+    sizes: list[Optional[int]]     # estimated sizes of the documents (if known)
+
+
+@dataclasses.dataclass
+class BatchResult:
+    results: list[Any]
+    pid: int
+    busy_time: float    # in seconds
+    failures: list[DocumentFailure] = dataclasses.field(default_factory=list)
+    timings: Optional[dict[str, timing.StageStatistics]] = None     # if timing is enabled in the worker process
+
+    @classmethod
+    def compute(cls, function: Callable[[Document], Any], documents: Iterable[Document]) -> BatchResult:
+        """ Applies ``function`` to every document (intended to be called in the worker process).
+        Documents for which :class:`DocumentLimitExceeded` is raised are recorded as failures. """
+        start = time.perf_counter()
+        results = []
+        failures = []
+        for document in documents:
+            try:
+                results.append(function(document))
+            except DocumentLimitExceeded as e:
+                logger.error(f'Failed to process {document.get_uri()}: {e}')
+                failures.append(DocumentFailure(str(document.get_uri()), str(e)))
+        return BatchResult(results, os.getpid(), time.perf_counter() - start, failures,
+                           timing.collect() if timing.is_enabled() else None)
+
+
+class AdaptiveScheduler:
+    def __init__(self, target_batch_duration: float = 2.0, window_size: int = 1000, initial_batch_size: int = 5,
+                 max_batch_size: int = 500, smoothing: float = 0.2):
+        self.target_batch_duration = target_batch_duration
+        self.window_size = window_size
+        self.initial_batch_size = initial_batch_size
+        self.max_batch_size = max_batch_size
+        self.smoothing = smoothing
+
+        # exponentially weighted moving averages of the processing times
+        self.seconds_per_byte: Optional[float] = None
+        self.seconds_per_document: Optional[float] = None
+
+        # statistics
+        self.busy_time_by_pid: dict[int, float] = {}
+        self.documents_by_pid: dict[int, int] = {}
+        self.number_of_batches: int = 0
+        self.processed_bytes: int = 0       # total (estimated) size of the processed documents
+        self.start_time: float = time.perf_counter()
+
+    def _estimate_duration(self, size: Optional[int]) -> Optional[float]:
+        if size is not None and self.seconds_per_byte is not None:
+            return size * self.seconds_per_byte
+        return self.seconds_per_document
+
+    def batches(self, documents: Iterable[Document]) -> Iterator[Batch]:
+        document_iterator = iter(documents)
+        while window := list(itertools.islice(document_iterator, self.window_size)):
+            # archive -> (position in archive, size, document)
+            by_archive: dict[str, list[tuple[int, Optional[int], Document]]] = {}
+            other_documents: list[tuple[Optional[int], Document]] = []
+            for document in window:
+                size = document.get_size_estimate()
+                location = document.get_archive_location()
+                if location is None:
+                    other_documents.append((size, document))
+                else:
+                    by_archive.setdefault(location[0], []).append((location[1], size, document))
+
+            runs: list[list[tuple[Optional[int], Document]]] = []
+            for members in by_archive.values():
+                members.sort(key=lambda member: member[0])
+                runs.append([(size, document) for _, size, document in members])
+            # archives with a lot of content first
+            runs.sort(key=lambda run: sum(size or 0 for size, _ in run), reverse=True)
+            # large documents first (documents with unknown size at the end)
+            other_documents.sort(key=lambda pair: -1 if pair[0] is None else pair[0], reverse=True)
+            runs.append(other_documents)
+
+            for run in runs:
+                yield from self._make_batches(run)
+
+    def _make_batches(self, sized_documents: list[tuple[Optional[int], Document]]) -> Iterator[Batch]:
+        batch = Batch([], [])
+        batch_duration = 0.0
+        for size, document in sized_documents:
+            batch.documents.append(document)
+            batch.sizes.append(size)
+            duration = self._estimate_duration(size)
+            if duration is None:    # no observations yet
+                is_full = len(batch.documents) >= self.initial_batch_size
+            else:
+                batch_duration += duration
+                is_full = batch_duration >= self.target_batch_duration
+            if is_full or len(batch.documents) >= self.max_batch_size:
+                yield batch
+                batch = Batch([], [])
+                batch_duration = 0.0
+        if batch.documents:
+            yield batch
+
+    def record(self, batch: Batch, result: BatchResult):
+        self.number_of_batches += 1
+        self.busy_time_by_pid[result.pid] = self.busy_time_by_pid.get(result.pid, 0.0) + result.busy_time
+        self.documents_by_pid[result.pid] = self.documents_by_pid.get(result.pid, 0) + len(batch.documents)
+        self.processed_bytes += sum(size for size in batch.sizes if size is not None)
+
+        self.seconds_per_document = self._smoothed(self.seconds_per_document,
+                                                   result.busy_time / len(batch.documents))
+        if all(size is not None for size in batch.sizes):
+            total_size = sum(batch.sizes)   # type: ignore
+            if total_size > 0:
+                self.seconds_per_byte = self._smoothed(self.seconds_per_byte, result.busy_time / total_size)
+
+    def _smoothed(self, old: Optional[float], new: float) -> float:
+        if old is None:
+            return new
+        return (1 - self.smoothing) * old + self.smoothing * new
+
+    def imap(self, pool: Any, function: Callable[[list[Document]], BatchResult], documents: Iterable[Document],
+             max_in_flight: int, failure_queue: Any = None) -> Iterator[BatchResult]:
+        """ Like ``pool.imap_unordered``, but with the batching described above.
+        ``function`` is called with batches of documents in the worker processes
+        (and should use :meth:`BatchResult.compute`).
+
+        ``failure_queue`` is the queue to which the worker processes report documents
+        that lead to their termination (see :mod:`spotterbase.spotters.limits`).
+        For the affected batch, a result with only the failure is returned
+        and the other documents are re-submitted.
+        """
+        result_queue: queue.Queue = queue.Queue()
+        batches = self.batches(documents)
+        resubmitted: deque[Batch] = deque()
+        in_flight: dict[int, Batch] = {}
+        exhausted = False
+        while True:
+            while len(in_flight) < max_in_flight and (resubmitted or not exhausted):
+                if resubmitted:
+                    batch = resubmitted.popleft()
+                elif (next_batch := next(batches, None)) is not None:
+                    batch = next_batch
+                else:
+                    exhausted = True
+                    break
+                in_flight[id(batch)] = batch
+                pool.apply_async(function, (batch.documents,),
+                                 callback=lambda r, b=batch: result_queue.put((b, r, None)),
+                                 error_callback=lambda e, b=batch: result_queue.put((b, None, e)))
+            if not in_flight:
+                return
+
+            if failure_queue is not None:
+                while not failure_queue.empty():
+                    failure: DocumentFailure = failure_queue.get()
+                    yield self._handle_lost_batch(failure, in_flight, resubmitted)
+            try:
+                batch, result, error = result_queue.get(timeout=None if failure_queue is None else 0.5)
+            except queue.Empty:
+                continue
+            del in_flight[id(batch)]
+            if error is not None:
+                raise error
+            self.record(batch, result)
+            yield result
+
+    def _handle_lost_batch(self, failure: DocumentFailure, in_flight: dict[int, Batch],
+                           resubmitted: deque[Batch]) -> BatchResult:
+        for batch_id, batch in in_flight.items():
+            uris = [str(document.get_uri()) for document in batch.documents]
+            if failure.doc_uri in uris:
+                del in_flight[batch_id]
+                index = uris.index(failure.doc_uri)
+                remaining = Batch(batch.documents[:index] + batch.documents[index + 1:],
+                                  batch.sizes[:index] + batch.sizes[index + 1:])
+                if remaining.documents:
+                    resubmitted.append(remaining)
+                break
+        else:
+            logger.warning(f'Failed to find the batch of {failure.doc_uri}')
+        return BatchResult([], pid=0, busy_time=0.0, failures=[failure])
+
+    def log_utilization_report(self):
+        wall_time = time.perf_counter() - self.start_time
+        lines = [f'Processed {sum(self.documents_by_pid.values())} documents in {self.number_of_batches} batches '
+                 f'({wall_time:.1f}s)']
+        for pid, busy_time in sorted(self.busy_time_by_pid.items()):
+            lines.append(f'  worker {pid}: {self.documents_by_pid[pid]} documents, busy for {busy_time:.1f}s '
+                         f'({100 * busy_time / wall_time if wall_time else 0:.1f}% utilization)')
+        logger.info('\n'.join(lines))
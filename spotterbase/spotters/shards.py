@@ -0,0 +1,173 @@
+"""
+Support for sharded spotter output, i.e. every worker process writes to its own files.
+
+That way, the compression of the results happens in parallel.
+Every document's results are appended to the shard as a separate gzip member,
+so a shard remains readable even if the process is killed.
+The shards only contain the triples (without prefixes).
+They can be merged into the main result files (which contain the prefixes etc.) with :func:`merge_shards`
+(``python -m spotterbase.spotters.shards --dir <directory>``).
+
+The manifest (``shards.json``) lists the shards along with the number of documents in them
+and their committed lengths (see :mod:`spotterbase.spotters.commits`).
+Only the committed part of a shard is merged
+(a worker process might have been terminated after appending results that were never committed).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import re
+from pathlib import Path
+from typing import BinaryIO, Optional, Any
+
+from spotterbase.spotters.commits import CommitLog
+from spotterbase.utils import config_loader
+from spotterbase.utils.config_loader import ConfigPath
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = 'shards.json'
+_SHARD_FILE_REGEX = re.compile(r'.*-shard-(?P<number>[0-9]+)\.ttl\.gz')
+
+
+def get_main_file(directory: Path, spotter_id: str) -> Path:
+    return directory / f'{spotter_id}.ttl.gz'
+
+
+def get_shard_file(directory: Path, spotter_id: str, shard_number: int) -> Path:
+    return directory / f'{spotter_id}-shard-{shard_number}.ttl.gz'
+
+
+class ShardManifest:
+    def __init__(self, directory: Path):
+        self.path = directory / MANIFEST_FILE_NAME
+        # spotter id -> shard file name -> number of documents
+        self.shards: dict[str, dict[str, int]] = {}
+        # shard file name -> length in bytes (the rest of the shard is ignored)
+        self.lengths: dict[str, int] = {}
+        if self.path.is_file():
+            with open(self.path) as fp:
+                self.restore(json.load(fp))
+
+    def add_document(self, spotter_id: str, shard_file_name: str, length: int):
+        """ ``length`` is the length of the shard file after appending the results of the document """
+        shards = self.shards.setdefault(spotter_id, {})
+        shards[shard_file_name] = shards.get(shard_file_name, 0) + 1
+        self.lengths[shard_file_name] = max(self.lengths.get(shard_file_name, 0), length)
+
+    def remove_shard(self, spotter_id: str, shard_file_name: str):
+        del self.shards[spotter_id][shard_file_name]
+        self.lengths.pop(shard_file_name, None)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'shards': self.shards,
+            'lengths': self.lengths,
+            'processed documents': 'processed_docs.txt',
+        }
+
+    def restore(self, json_: dict[str, Any]):
+        self.shards = json_['shards']
+        self.lengths = json_.get('lengths', {})
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as fp:
+            json.dump(self.to_json(), fp, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class ShardWriter:
+    """ Writes results to the shards of the current process.
+
+    :func:`init_shard_worker` has to be called in every worker process (e.g. as the initializer of the pool).
+    The files are kept open for the lifetime of the process.
+    """
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    @staticmethod
+    def get_shard_number_counter(directory: Path) -> Any:
+        """ Returns a counter for the shard numbers that can be shared with the worker processes
+        (the numbers of existing shards are skipped). """
+        numbers = [int(match.group('number')) for path in directory.iterdir()
+                   if (match := _SHARD_FILE_REGEX.fullmatch(path.name))]
+        return multiprocessing.Value('i', max(numbers, default=0) + 1)
+
+    def write(self, spotter_id: str, serialized_triples: str) -> tuple[str, int]:
+        """ Appends the results for a document to the shard.
+        Returns the name of the shard file and its new length. """
+        if _shard_number is None:
+            raise RuntimeError('init_shard_worker has not been called in this process')
+        path = get_shard_file(self.directory, spotter_id, _shard_number)
+        fp = _open_shards.get(path)
+        if fp is None:
+            fp = open(path, 'ab')
+            _open_shards[path] = fp
+        fp.write(gzip.compress(serialized_triples.encode('utf-8')))
+        fp.flush()
+        return path.name, fp.tell()
+
+
+# state of the worker process
+_shard_number: Optional[int] = None
+_open_shards: dict[Path, BinaryIO] = {}
+
+
+def init_shard_worker(shard_number_counter: Any):
+    global _shard_number
+    with shard_number_counter.get_lock():
+        _shard_number = shard_number_counter.value
+        shard_number_counter.value += 1
+
+
+def merge_shards(directory: Path):
+    """ Appends the shards to the main result files and deletes them (and the manifest) afterwards.
+    As gzip files can be concatenated, the shards do not have to be decompressed. """
+    commit_log = CommitLog(directory)
+    manifest = ShardManifest(directory)
+    if (commit := commit_log.recover()) is not None and 'shard_manifest' in commit.metadata:
+        manifest.restore(commit.metadata['shard_manifest'])
+        manifest.save()
+    for spotter_id, shards in manifest.shards.items():
+        main_file = get_main_file(directory, spotter_id)
+        if not main_file.is_file():
+            raise FileNotFoundError(f'{main_file} does not exist')
+        with open(main_file, 'ab') as out_fp:
+            for shard_file_name in list(shards):
+                logger.info(f'Merging {shard_file_name} ({shards[shard_file_name]} documents) into {main_file}')
+                shard_path = directory / shard_file_name
+                remaining: Optional[int] = manifest.lengths.get(shard_file_name)
+                with open(shard_path, 'rb') as in_fp:
+                    while chunk := in_fp.read(2 ** 20 if remaining is None else min(2 ** 20, remaining)):
+                        out_fp.write(chunk)
+                        if remaining is not None:
+                            remaining -= len(chunk)
+                out_fp.flush()
+                os.fsync(out_fp.fileno())
+                # update the manifest right away to avoid merging a shard twice
+                manifest.remove_shard(spotter_id, shard_file_name)
+                if commit_log.last_commit is not None:
+                    file_lengths = dict(commit_log.last_commit.file_lengths)
+                    file_lengths.pop(shard_file_name, None)
+                    file_lengths[main_file.name] = out_fp.tell()
+                    commit_log.commit(file_lengths, {'shard_manifest': manifest.to_json()})
+                manifest.save()
+                shard_path.unlink()
+    # everything has been merged (the manifest can still be restored from the commit log if necessary)
+    manifest.path.unlink(missing_ok=True)
+
+
+def main():
+    directory = ConfigPath('--dir', 'Directory with the (sharded) spotter results', required=True)
+    config_loader.auto()
+    assert directory.value is not None
+    merge_shards(directory.value)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,28 +10,37 @@ from __future__ import annotations
 
 import dataclasses
 import gzip
+import json
 import logging
 import multiprocessing
+import os
 import pickle
-import uuid
+import time
 from datetime import datetime
+from io import StringIO
 from pathlib import Path
-from typing import Iterable, Iterator
+from typing import Iterable, Iterator, Optional, Any, Container, Sized, BinaryIO
 
 from spotterbase.corpora.document_queries import document_iterable_from_query
 from spotterbase.corpora.interface import Document
+from spotterbase.corpora.prefetch import prefetch_documents
 from spotterbase.corpora.resolver import Resolver
-from spotterbase.data.locator import TmpDir
 from spotterbase.model_core import OA, SB
 from spotterbase.rdf import TripleI
 from spotterbase.rdf.serializer import TurtleSerializer
 from spotterbase.rdf.uri import Uri, NameSpace
 from spotterbase.rdf.vocab import RDF, RDFS, XSD
+from spotterbase.spotters.commits import CommitLog, sync_file
+from spotterbase.spotters.limits import DocumentLimits, DocumentFailure, init_limits_worker, watch_document
+from spotterbase.spotters.scheduling import AdaptiveScheduler, BatchResult
+from spotterbase.spotters.shards import ShardWriter, ShardManifest, init_shard_worker
 from spotterbase.spotters.spotter import Spotter
-from spotterbase.utils import config_loader
-from spotterbase.utils.config_loader import ConfigUri, ConfigPath, ConfigInt, ArgumentGroup, MutexGroup
+from spotterbase.utils import config_loader, timing
+from spotterbase.utils.compact_uri_set import CompactUriSet
+from spotterbase.utils.config_loader import ConfigUri, ConfigPath, ConfigInt, ArgumentGroup, MutexGroup, ConfigFlag
 from spotterbase.utils.exit import DefaultSignalDelay
 from spotterbase.utils.progress_updater import ProgressUpdater
+from spotterbase.utils.timing import timed
 
 logger = logging.getLogger()
 
@@ -50,6 +59,27 @@ DOC_QUERY_PATH = ConfigPath(
 
 NUMBER_OF_PROCESSES = ConfigInt('--number-of-processes', description='number of processes', default=4)
 DIRECTORY = ConfigPath('--dir', 'Directory for the spotter results', required=True)
+SHARDED_OUTPUT = ConfigFlag('--sharded-output',
+                            'every process writes the results to separate files '
+                            '(they can be merged with python -m spotterbase.spotters.shards)')
+DOCUMENT_TIMEOUT = ConfigInt('--document-timeout',
+                             'time limit (in seconds) for processing a document '
+                             '(documents exceeding it are recorded in failed_docs.txt)')
+DOCUMENT_MEMORY_LIMIT = ConfigInt('--document-memory-limit',
+                                  'limit for the resident memory (in MB) of a worker process '
+                                  'while processing a document '
+                                  '(documents exceeding it are recorded in failed_docs.txt)')
+PREFETCH_DEPTH = ConfigInt('--prefetch-depth',
+                           'number of documents that every worker process reads ahead in a background thread '
+                           '(0 disables prefetching)', default=0)
+PREFETCH_MEMORY_LIMIT = ConfigInt('--prefetch-memory-limit',
+                                  'limit for the size (in MB) of prefetched documents per worker process', default=256)
+COMMIT_INTERVAL = ConfigInt('--commit-interval',
+                            'interval (in seconds) for committing results to the disk '
+                            '(an interrupted run is continued from the last commit)', default=10)
+COLLECT_TIMINGS = ConfigFlag('--collect-timings',
+                             'measure the time spent in the different stages of processing '
+                             '(written to timings.json in the results directory)')
 
 
 # namespaces used for turtle prefixes
@@ -61,41 +91,81 @@ STANDARD_NAMESPACES: list[NameSpace] = [
 
 
 class RunnerTtlSerializer(TurtleSerializer):
+    """ Buffers the serialized triples in memory until they are committed (see :meth:`commit`) """
     def __init__(self, path: Path):
         assert path.name.endswith('.ttl.gz')
         self.path = path
-        self.fp = gzip.open(path, 'at')
-        super().__init__(self.fp, fixed_prefixes=STANDARD_NAMESPACES)
+        self._buffer = StringIO()
+        self._file: BinaryIO = open(path, 'ab')
+        super().__init__(self._buffer, fixed_prefixes=STANDARD_NAMESPACES)
+
+    def get_buffer_size(self) -> int:
+        return self._buffer.tell()
+
+    def commit(self) -> int:
+        """ Appends the buffered triples to the file as a gzip member and syncs it.
+        Returns the new length of the file. """
+        self.flush()
+        if content := self._buffer.getvalue():
+            self._file.write(gzip.compress(content.encode('utf-8')))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        return self._file.tell()
 
     def close(self):
+        """ Closes the file (triples that have not been committed are discarded) """
         super().close()
-        self.fp.close()
+        self._file.close()
 
 
 class _ProcessedDocTracker:
+    """ Keeps track of the processed documents (to continue interrupted runs).
+
+    The URIs are appended to ``file``.
+    In memory, only hashes of the URIs are kept (see :class:`CompactUriSet`),
+    which matters for corpora with millions of documents.
+    """
     def __init__(self, file: Path):
         self.file: Path = file
-        # strings are more light-weight (we will have to keep them in memory)
-        self.previously_processed_docs: set[str] = set()
-        self.additionally_processed_docs_saved: set[str] = set()
-        self.unsaved_processed_docs: set[str] = set()
+        self.processed_docs: CompactUriSet = CompactUriSet()    # including the ones from previous runs
+        self.number_of_previously_processed_docs: int = 0
+        self.unsaved_processed_docs: list[str] = []
         if self.file.exists():
-            with open(self.file) as fp:
-                for line in fp:
-                    uri = line.strip()
-                    if uri:
-                        self.previously_processed_docs.add(uri)
-
-    def filter_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
-        duplicate_check: set[str] = set()
+            self._load()
+
+    def _load(self):
+        valid_length = 0
+
+        def read_uris(fp: BinaryIO) -> Iterator[str]:
+            nonlocal valid_length
+            for line in fp:
+                if not line.endswith(b'\n'):
+                    # incomplete last line (the process was killed while writing) - it will be truncated
+                    break
+                valid_length += len(line)
+                if uri := line.strip():
+                    yield uri.decode('utf-8')
+
+        with open(self.file, 'rb+') as fp:
+            self.processed_docs.update(read_uris(fp))
+            if valid_length < fp.seek(0, 2):
+                logger.warning(f'Truncating incomplete last line of {self.file}')
+                fp.truncate(valid_length)
+        self.number_of_previously_processed_docs = len(self.processed_docs)
+
+    def filter_documents(self, documents: Iterable[Document], exclude: Container[str] = ()) -> Iterator[Document]:
+        duplicate_check = CompactUriSet()
         for document in documents:
             uri_str = str(document.get_uri())
-            if uri_str not in self.previously_processed_docs and uri_str not in duplicate_check:
-                duplicate_check.add(uri_str)
+            if uri_str not in self.processed_docs and uri_str not in exclude and duplicate_check.add(uri_str):
                 yield document
 
     def add(self, document: Uri | str):
-        self.unsaved_processed_docs.add(str(document))
+        uri_str = str(document)
+        self.processed_docs.add(uri_str)
+        self.unsaved_processed_docs.append(uri_str)
 
     def __enter__(self) -> _ProcessedDocTracker:
         return self
@@ -107,10 +177,10 @@ class _ProcessedDocTracker:
         if not self.unsaved_processed_docs:
             return
         with open(self.file, 'a') as fp:
-            for doc in self.unsaved_processed_docs:
-                fp.write(doc + '\n')
-        self.additionally_processed_docs_saved.update(self.unsaved_processed_docs)
-        self.unsaved_processed_docs = set()
+            fp.write(''.join(doc + '\n' for doc in self.unsaved_processed_docs))
+            fp.flush()
+            os.fsync(fp.fileno())
+        self.unsaved_processed_docs = []
 
     def __del__(self):
         assert not self.unsaved_processed_docs, 'Not all processed documents were saved'
@@ -118,42 +188,183 @@ class _ProcessedDocTracker:
     def remove(self):
         """ Remove file (should only be done when processing is finished) """
         # free up memory
-        self.previously_processed_docs = set()
-        self.additionally_processed_docs_saved = set()
-        self.unsaved_processed_docs = set()
+        self.processed_docs = CompactUriSet()
+        self.unsaved_processed_docs = []
         self.file.unlink(missing_ok=True)
 
 
+class _ResultCommitter:
+    """ Periodically commits the results along with the processed documents (see :mod:`spotterbase.spotters.commits`),
+    which ensures that an interrupted run can be continued exactly once. """
+    def __init__(self, commit_log: CommitLog, serializers: dict[str, RunnerTtlSerializer],
+                 doc_tracker: _ProcessedDocTracker, failed_doc_log: _FailedDocLog,
+                 shard_manifest: Optional[ShardManifest], interval: float, max_buffer_size: int = 2 ** 26):
+        self.commit_log = commit_log
+        self.serializers = serializers
+        self.doc_tracker = doc_tracker
+        self.failed_doc_log = failed_doc_log
+        self.shard_manifest = shard_manifest
+        self.interval = interval
+        self.max_buffer_size = max_buffer_size
+        self.unsynced_shards: set[str] = set()
+        self.last_commit_time: float = time.monotonic()
+
+    def add_document(self, doc_result: _DocResult):
+        for spotter_id, serialized_triples in doc_result.results.items():
+            self.serializers[spotter_id].fp.write(serialized_triples)
+        if self.shard_manifest is not None:
+            for spotter_id, (shard_file, length) in doc_result.shard_files.items():
+                self.shard_manifest.add_document(spotter_id, shard_file, length)
+                self.unsynced_shards.add(shard_file)
+        self.doc_tracker.add(doc_result.doc_uri)
+
+    def commit_if_due(self):
+        if time.monotonic() - self.last_commit_time >= self.interval or \
+                sum(serializer.get_buffer_size() for serializer in self.serializers.values()) >= self.max_buffer_size:
+            self.commit()
+
+    def commit(self):
+        with DefaultSignalDelay(), timed('commit'):
+            file_lengths: dict[str, int] = {}
+            for serializer in self.serializers.values():
+                file_lengths[serializer.path.name] = serializer.commit()
+            self.doc_tracker.save()
+            file_lengths[self.doc_tracker.file.name] = sync_file(self.doc_tracker.file)
+            self.failed_doc_log.save()
+            file_lengths[self.failed_doc_log.file.name] = sync_file(self.failed_doc_log.file)
+            metadata: dict[str, Any] = {}
+            if self.shard_manifest is not None:
+                # the worker processes do not sync the shards
+                for shard_file in self.unsynced_shards:
+                    sync_file(self.commit_log.directory / shard_file)
+                self.unsynced_shards.clear()
+                file_lengths.update(self.shard_manifest.lengths)
+                metadata['shard_manifest'] = self.shard_manifest.to_json()
+            self.commit_log.commit(file_lengths, metadata)
+            if self.shard_manifest is not None:
+                # the manifest can be restored from the commit log, so it does not matter if this fails
+                self.shard_manifest.save()
+        self.last_commit_time = time.monotonic()
+
+
+class _FailedDocLog:
+    """ Records documents that could not be processed (e.g. because they exceeded the time limit).
+    The file has a line with the document URI and the reason (separated by a tab) for every document.
+    The documents are skipped when continuing a run (delete the file to retry them).
+    Like the processed documents, the failures are only written when the results are committed. """
+    def __init__(self, file: Path):
+        self.file: Path = file
+        self.previously_failed_docs: set[str] = set()
+        self.unsaved_failures: list[DocumentFailure] = []
+        if self.file.exists():
+            with open(self.file) as fp:
+                for line in fp:
+                    if uri := line.split('\t')[0].strip():
+                        self.previously_failed_docs.add(uri)
+
+    def add(self, failure: DocumentFailure):
+        self.unsaved_failures.append(failure)
+
+    def save(self):
+        if not self.unsaved_failures:
+            return
+        with open(self.file, 'a') as fp:
+            fp.write(''.join(f'{failure.doc_uri}\t{failure.reason}\n' for failure in self.unsaved_failures))
+            fp.flush()
+            os.fsync(fp.fileno())
+        self.unsaved_failures = []
+
+
+def _init_worker(shard_number_counter: Any, limits: DocumentLimits, failure_queue: Any, collect_timings: bool):
+    if collect_timings:
+        timing.enable()
+        timing.collect()    # drops the statistics inherited from the main process (they are counted there)
+    if shard_number_counter is not None:
+        init_shard_worker(shard_number_counter)
+    init_limits_worker(limits, failure_queue)
+
+
 @dataclasses.dataclass
 class _DocResult:
-    files: dict[str, Path]    # spotter id -> path with pickled triples
+    results: dict[str, str]    # spotter id -> serialized triples (turtle without prefixes)
+    # spotter id -> name and new length of the shard file with the results (for sharded output)
+    shard_files: dict[str, tuple[str, int]]
     doc_uri: Uri
+    number_of_triples: int = 0
 
 
 @dataclasses.dataclass
 class _DocProcessor:
     spotters: list[Spotter]
+    shard_writer: Optional[ShardWriter] = None
+    prefetch_depth: int = 0
+    prefetch_memory_limit: int = 2 ** 28     # in bytes
 
     def process_doc(self, document: Document) -> _DocResult:
-        result: dict[str, Path] = {}
-        for spotter in self.spotters:
-            try:
-                path = TmpDir.get(spotter.spotter_short_id + '-' + uuid.uuid4().hex + '.ttl')
-                result[spotter.spotter_short_id] = path
-                with (
-                    open(path, 'w') as fp,
-                    TurtleSerializer(fp, fixed_prefixes=STANDARD_NAMESPACES, write_prefixes=False) as serializer,
-                ):
-                    serializer.add_from_iterable(spotter.process_document(document))
-            except Exception:
-                logger.exception(f'{type(spotter)} raised an exception when processing {document.get_uri()}')
-        return _DocResult(result, document.get_uri())
-
-
-def run(spotter_classes: list[type[Spotter]], documents: Iterable[Document], *, corpus_descr: str, directory: Path):
+        # The results are serialized in the worker process and sent to the main process as a single string.
+        # That way, the main process only has to write them to the output files.
+        # With sharded output, the worker process writes them to its own files instead.
+        # If the document exceeds the limits, DocumentLimitExceeded is raised and no results are kept.
+        # The spotters share the artifacts of the document (e.g. DNMs), which are released afterwards.
+        result: dict[str, str] = {}
+        number_of_triples = 0
+        try:
+            with watch_document(str(document.get_uri())):
+                for spotter in self.spotters:
+                    buffer = StringIO()
+                    try:
+                        with timed(f'spotter:{spotter.spotter_short_id}'):
+                            triples = list(spotter.process_document(document))
+                        number_of_triples += len(triples)
+                        with timed('serialize'), TurtleSerializer(buffer, fixed_prefixes=STANDARD_NAMESPACES,
+                                                                  write_prefixes=False) as serializer:
+                            serializer.add_from_iterable(triples)
+                    except Exception:
+                        logger.exception(f'{type(spotter)} raised an exception when processing {document.get_uri()}')
+                    result[spotter.spotter_short_id] = buffer.getvalue()
+        finally:
+            document.release_artifacts()
+        shard_files: dict[str, tuple[str, int]] = {}
+        if self.shard_writer is not None:
+            with timed('write_shards'):
+                for spotter_id, serialized_triples in result.items():
+                    shard_files[spotter_id] = self.shard_writer.write(spotter_id, serialized_triples)
+            result = {}
+        return _DocResult(result, shard_files, document.get_uri(), number_of_triples)
+
+    def process_batch(self, documents: list[Document]) -> BatchResult:
+        # reading the next documents (in the background) can overlap with processing the current one
+        return BatchResult.compute(
+            self.process_doc, prefetch_documents(documents, self.prefetch_depth, self.prefetch_memory_limit)
+        )
+
+
+def run(spotter_classes: list[type[Spotter]], documents: Iterable[Document], *, corpus_descr: str, directory: Path,
+        sharded_output: bool = False, limits: Optional[DocumentLimits] = None, prefetch_depth: int = 0,
+        prefetch_memory_limit: int = 2 ** 28, collect_timings: bool = False,
+        number_of_documents: Optional[int] = None, commit_interval: float = 10.0):
+    """ Runs the spotters over the documents and writes the results to ``directory``.
+
+    If ``sharded_output`` is set, every worker process writes the results to separate files
+    (see :mod:`spotterbase.spotters.shards`).
+    Documents that exceed the ``limits`` (see :mod:`spotterbase.spotters.limits`)
+    are recorded in ``failed_docs.txt``.
+    With ``prefetch_depth > 0``, the worker processes read documents ahead
+    (see :mod:`spotterbase.corpora.prefetch`).
+    With ``collect_timings``, statistics about the time spent in the different stages
+    (see :mod:`spotterbase.utils.timing`) are written to ``timings.json``.
+    ``number_of_documents`` is used for progress updates (if ``documents`` does not have a length).
+    The results are committed every ``commit_interval`` seconds (see :mod:`spotterbase.spotters.commits`).
+    If the directory contains results from an interrupted run, they are continued from the last commit.
+    """
+    if collect_timings:
+        timing.enable()
     directory.mkdir(exist_ok=True)
+    commit_log = CommitLog(directory)
+    last_commit = commit_log.recover()
     spotters: list[Spotter] = []
     serializers: dict[str, RunnerTtlSerializer] = {}
+    new_contexts: dict[Path, Any] = {}     # contexts that have to be stored after the first commit
     for spotter_class in spotter_classes:
         spotter_id = spotter_class.spotter_short_id
         assert spotter_id not in serializers
@@ -165,8 +376,12 @@ def run(spotter_classes: list[type[Spotter]], documents: Iterable[Document], *,
         if continuing:
             with open(spotter_ctx_path, 'rb') as fp:
                 context = pickle.load(fp)
+            if last_commit is None:
+                logger.warning(f'There is no commit log in {directory} - '
+                               f'results of the interrupted run might be incomplete or duplicated')
         else:
             context, triples = spotter_class.setup_run()
+            new_contexts[spotter_ctx_path] = context
         spotters.append(spotter_class(context))
 
         rdf_file_path = directory / f'{spotter_id}.ttl.gz'
@@ -186,35 +401,83 @@ def run(spotter_classes: list[type[Spotter]], documents: Iterable[Document], *,
             serializer.write_comment('Triples from processing actual content:')
 
     doc_tracker: _ProcessedDocTracker = _ProcessedDocTracker(directory / 'processed_docs.txt')
-    if doc_tracker.previously_processed_docs:
-        logger.info(f'{len(doc_tracker.previously_processed_docs)} documents were already processed '
+    if doc_tracker.number_of_previously_processed_docs:
+        logger.info(f'{doc_tracker.number_of_previously_processed_docs} documents were already processed '
                     f'according to {doc_tracker.file}')
-    doc_processor: _DocProcessor = _DocProcessor(spotters)
-    progress_updater = ProgressUpdater(message='{progress} documents were processed')
+    failed_doc_log = _FailedDocLog(directory / 'failed_docs.txt')
+    if failed_doc_log.previously_failed_docs:
+        logger.info(f'{len(failed_doc_log.previously_failed_docs)} documents are skipped because they failed before '
+                    f'according to {failed_doc_log.file}')
+    doc_processor: _DocProcessor = _DocProcessor(spotters, prefetch_depth=prefetch_depth,
+                                                 prefetch_memory_limit=prefetch_memory_limit)
+    shard_manifest: Optional[ShardManifest] = None
+    shard_number_counter: Any = None
+    if sharded_output:
+        doc_processor.shard_writer = ShardWriter(directory)
+        shard_manifest = ShardManifest(directory)
+        if last_commit is not None and 'shard_manifest' in last_commit.metadata:
+            shard_manifest.restore(last_commit.metadata['shard_manifest'])
+        shard_number_counter = ShardWriter.get_shard_number_counter(directory)
+    committer = _ResultCommitter(commit_log, serializers, doc_tracker, failed_doc_log, shard_manifest,
+                                 commit_interval)
+    if new_contexts:
+        # the contexts are stored once the setup triples have been committed (they mark a run as resumable)
+        committer.commit()
+        for spotter_ctx_path, context in new_contexts.items():
+            tmp_path = spotter_ctx_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as fp:
+                pickle.dump(context, fp)
+            os.replace(tmp_path, spotter_ctx_path)
+    limits = limits or DocumentLimits()
+    failure_queue: Any = multiprocessing.SimpleQueue() if limits.is_active() else None
+    if number_of_documents is None and isinstance(documents, Sized):
+        number_of_documents = len(documents)
+    if number_of_documents is not None:
+        # (approximately) the number of documents that still have to be processed
+        number_of_documents = max(number_of_documents - doc_tracker.number_of_previously_processed_docs
+                                  - len(failed_doc_log.previously_failed_docs), 0)
+    progress_updater = ProgressUpdater(message='{progress} documents were processed', total=number_of_documents,
+                                       unit='documents')
+    i = 0   # number of processed documents
+    number_of_triples = 0
+
+    # documents are dispatched in batches, ordered by size (see spotterbase.spotters.scheduling)
+    scheduler = AdaptiveScheduler()
+    number_of_processes = NUMBER_OF_PROCESSES.value or 1
 
     try:
-        with multiprocessing.Pool(processes=NUMBER_OF_PROCESSES.value) as pool:
-            doc_result: _DocResult
-            for i, doc_result in enumerate(
-                    pool.imap_unordered(
-                        doc_processor.process_doc, doc_tracker.filter_documents(documents), chunksize=5
-                    )
+        with multiprocessing.Pool(processes=number_of_processes, initializer=_init_worker,
+                                  initargs=(shard_number_counter, limits, failure_queue, collect_timings)) as pool:
+            batch_result: BatchResult
+            for batch_result in scheduler.imap(
+                    pool, doc_processor.process_batch,
+                    doc_tracker.filter_documents(documents, exclude=failed_doc_log.previously_failed_docs),
+                    max_in_flight=2 * number_of_processes, failure_queue=failure_queue
             ):
-                progress_updater.update(i)
-                with DefaultSignalDelay():
-                    for spotter_id, path in doc_result.files.items():
-                        with open(path) as fp:
-                            for line in fp:
-                                serializers[spotter_id].fp.write(line)
-                        path.unlink()
-                    doc_tracker.add(doc_result.doc_uri)
+                timing.merge(batch_result.timings)
+                for failure in batch_result.failures:
+                    failed_doc_log.add(failure)
+                doc_result: _DocResult
+                for doc_result in batch_result.results:
+                    i += 1
+                    number_of_triples += doc_result.number_of_triples
+                    with timed('write_results'):
+                        committer.add_document(doc_result)
+                committer.commit_if_due()
+                progress_updater.update(i, bytes=scheduler.processed_bytes, triples=number_of_triples)
     except KeyboardInterrupt:
         logger.info('KeyboardInterrupt... Shutting down')
     finally:
-        logger.info('Closing files')
+        progress_updater.finish(i, bytes=scheduler.processed_bytes, triples=number_of_triples)
+        scheduler.log_utilization_report()
+        logger.info('Committing results and closing files')
+        committer.commit()
         for serializer in serializers.values():
             serializer.close()
-        doc_tracker.save()
+        if collect_timings:
+            with open(directory / 'timings.json', 'w') as fp:
+                json.dump(timing.to_json(timing.collect()), fp, indent=2)
+            timing.disable()
 
 
 def auto_run_spotter(spotter_class: type[Spotter] | list[type[Spotter]]):
@@ -227,20 +490,30 @@ def auto_run_spotter(spotter_class: type[Spotter] | list[type[Spotter]]):
         if document is None:
             raise Exception(f'Failed to find document {document}')
         documents_iterator = iter([document])
+        number_of_documents: Optional[int] = 1
         corpus_descr = f'document {document.get_uri()}'
     elif CORPUS.value is not None:
         corpus = Resolver.get_corpus(CORPUS.value)
         if corpus is None:
             raise Exception(f'Failed to find corpus {corpus}')
         documents_iterator = iter(corpus)
+        number_of_documents = corpus.get_number_of_documents()
         corpus_descr = f'corpus {corpus.get_uri()}'
     elif DOC_QUERY_PATH.value is not None:
         query = DOC_QUERY_PATH.value.read_text()
         documents_iterator = iter(document_iterable_from_query(query))
+        number_of_documents = None
         corpus_descr = f'query {query}'
     else:
         assert False, 'DOC_SOURCE_MUTEX should ensure that exactly one option is set'
 
     directory = DIRECTORY.value
     assert directory is not None
-    run(spotter_classes, documents_iterator, corpus_descr=corpus_descr, directory=directory)
+    limits = DocumentLimits(
+        timeout=DOCUMENT_TIMEOUT.value,
+        memory_limit=DOCUMENT_MEMORY_LIMIT.value * 2 ** 20 if DOCUMENT_MEMORY_LIMIT.value is not None else None,
+    )
+    run(spotter_classes, documents_iterator, corpus_descr=corpus_descr, directory=directory,
+        sharded_output=bool(SHARDED_OUTPUT), limits=limits, prefetch_depth=PREFETCH_DEPTH.value or 0,
+        prefetch_memory_limit=(PREFETCH_MEMORY_LIMIT.value or 256) * 2 ** 20, collect_timings=bool(COLLECT_TIMINGS),
+        number_of_documents=number_of_documents, commit_interval=COMMIT_INTERVAL.value or 10)
@@ -1,5 +1,5 @@
 import io
-from typing import IO
+from typing import IO, Optional
 
 from spotterbase.corpora.interface import Document
 from spotterbase.rdf import Uri
@@ -15,3 +15,9 @@ class InMemoryDocument(Document):
 
     def open_binary(self) -> IO[bytes]:
         return io.BytesIO(self._content)
+
+    def read_binary(self) -> bytes:
+        return self._content
+
+    def get_size_estimate(self) -> Optional[int]:
+        return len(self._content)
@@ -0,0 +1,27 @@
+"""
+Benchmark for :meth:`LinkedStr.replacements_at_positions` (via the white space normalization of DNMs).
+
+Run with ``python -m spotterbase.test.benchmark_linked_str``.
+For comparisons, run it on different revisions of the code.
+"""
+import timeit
+
+from spotterbase.corpora.test_corpus import TEST_CORPUS
+from spotterbase.dnm.defaults import get_arxmliv_dnm_factory, whitespace_normalization_post_processing
+from spotterbase.dnm.dnm import Dnm
+
+
+def main(number: int = 20, repeat: int = 5, scale: int = 50):
+    factory = get_arxmliv_dnm_factory(normalize_white_space=False)
+    for document in TEST_CORPUS:
+        dnm = factory.dnm_from_document(document)
+        big_dnm = Dnm(meta_info=dnm.get_meta_info(), string=str(dnm) * scale,
+                      start_refs=list(dnm.get_start_refs()) * scale, end_refs=list(dnm.get_end_refs()) * scale)
+        for label, d in [('', dnm), (f' x{scale}', big_dnm)]:
+            time = min(timeit.repeat(lambda: whitespace_normalization_post_processing(d),
+                                     number=number, repeat=repeat)) / number
+            print(f'{document.get_uri()}{label} ({len(d)} chars): {time * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import unittest
+
+from spotterbase.corpora.artifact_pool import ARTIFACT_POOL
+from spotterbase.rdf.uri import Uri
+from spotterbase.test import InMemoryDocument
+
+
+class TestArtifactPool(unittest.TestCase):
+    def setUp(self):
+        ARTIFACT_POOL.budget = 250      # a tree and offset converter for one of the documents need about 14 * 12 bytes
+
+    def tearDown(self):
+        ARTIFACT_POOL.budget = None
+
+    def test_eviction(self):
+        docs = [InMemoryDocument(Uri(f'http://example.org/doc{i}'), f'<p>doc {i}</p>'.encode())
+                for i in range(3)]
+        with docs[0]:
+            for doc in docs:
+                doc.get_offset_converter()
+            # docs[1] was the least recently used document that is not pinned
+            self.assertEqual([doc.has_cached_tree() for doc in docs], [True, False, True])
+            self.assertEqual(len(ARTIFACT_POOL), 2)
+        # docs[0] is released at the end of the with block
+        self.assertFalse(docs[0].has_cached_tree())
+        self.assertEqual(len(ARTIFACT_POOL), 1)
+        docs[2].release_artifacts()
+        self.assertEqual(ARTIFACT_POOL.total_memory, 0)
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from spotterbase.plugins.arxiv.arxmliv import ArXMLivCorpus, ZipArXMLivDocument
+from spotterbase.plugins.arxiv.arxiv import ArxivId
+from spotterbase.plugins.arxiv.arxmliv_index import ArXMLivIndex
+
+
+def _write_archive(path: Path, names: list[str]):
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in names:
+            zf.writestr(name, f'<html>{name}</html>')
+
+
+class TestArXMLivIndex(unittest.TestCase):
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            archive_a = directory / '1234.zip'
+            archive_b = directory / '0101.zip'
+            _write_archive(archive_a, ['1234/1234.0002.html', '1234/README', '1234/1234.0001.html'])
+            _write_archive(archive_b, ['0101/hep-th0101001.html'])
+            index = ArXMLivIndex(directory / 'index.sqlite', ArXMLivCorpus._member_to_arxivid)
+            index.update([archive_a, archive_b])
+
+            self.assertEqual([arxiv_id for arxiv_id, _ in index.get_members(archive_a)], ['1234.0002', '1234.0001'])
+            self.assertEqual(index.count(), 3)
+            found = index.lookup('hep-th/0101001')
+            assert found is not None
+            self.assertEqual(found[0], archive_b.resolve())
+            with zipfile.ZipFile(archive_b) as zf:
+                zip_info = zf.getinfo('0101/hep-th0101001.html')
+            self.assertEqual((found[1].header_offset, found[1].crc), (zip_info.header_offset, zip_info.CRC))
+
+            # changed archives are re-indexed when they are looked up, removed ones are dropped when updating
+            _write_archive(archive_a, ['1234/1234.0003.html'])
+            os.utime(archive_a, ns=(0, 0))
+            self.assertIsNone(index.lookup('1234.0001'))
+            self.assertIsNotNone(index.lookup('1234.0003'))
+            index.update([archive_a])
+            self.assertEqual(index.count(), 1)
+            index.close()
+
+            with self.assertRaises(sqlite3.Error):
+                ArXMLivIndex(directory, ArXMLivCorpus._member_to_arxivid).open()
+
+    def test_duplicate_ids(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            archive_a = directory / '1234.zip'
+            archive_b = directory / '1235.zip'
+            _write_archive(archive_a, ['1234/1234.0001.html'])
+            _write_archive(archive_b, ['1235/1234.0001.html', '1235/1235.0001.html'])
+            index = ArXMLivIndex(directory / 'index.sqlite', ArXMLivCorpus._member_to_arxivid)
+            with self.assertLogs('spotterbase.plugins.arxiv.arxmliv_index', 'WARNING'):
+                index.update([archive_b, archive_a])
+            # both occurrences are kept, but only the first one is found by a lookup
+            self.assertEqual(index.count(), 3)
+            self.assertEqual([arxiv_id for arxiv_id, _ in index.get_members(archive_a)], ['1234.0001'])
+            found = index.lookup('1234.0001')
+            assert found is not None
+            self.assertEqual(found[0], archive_a.resolve())
+            index.close()
+
+    def test_corpus_without_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            _write_archive(directory / '1234.zip', ['1234/1234.0002.html', '1234/README', '1234/1234.0001.html'])
+            corpus = ArXMLivCorpus('2020')
+            with mock.patch.object(corpus, 'get_path', return_value=directory), \
+                    mock.patch('spotterbase.plugins.arxiv.arxmliv.CacheDir.get', side_effect=PermissionError):
+                with self.assertLogs('spotterbase.plugins.arxiv.arxmliv', 'WARNING'):
+                    documents = list(corpus)
+                self.assertIsNone(corpus.get_index())
+                self.assertIsNone(corpus.get_number_of_documents())
+            self.assertEqual([str(document.arxivid) for document in documents], ['1234.0002', '1234.0001'])
+            self.assertEqual(documents[0].read_binary(), b'<html>1234/1234.0002.html</html>')
+
+    def test_stale_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            archive = Path(tmp_dir) / '1234.zip'
+            _write_archive(archive, ['1234/1234.0001.html', '1234/1234.0002.html'])
+            index = ArXMLivIndex(Path(tmp_dir) / 'index.sqlite', ArXMLivCorpus._member_to_arxivid)
+            index.update([archive])
+            found = index.lookup('1234.0002')
+            index.close()
+            assert found is not None
+            # members whose index entries do not match the archive (anymore) are read with zipfile instead
+            for member in [found[1]._replace(header_offset=0), found[1]._replace(crc=0),
+                           found[1]._replace(compress_size=2)]:
+                document = ZipArXMLivDocument(ArxivId('1234.0002'), '2020', archive, member.name, member)
+                with self.assertLogs('spotterbase.plugins.arxiv.arxmliv', 'WARNING'):
+                    self.assertEqual(document.read_binary(), b'<html>1234/1234.0002.html</html>')
+                with self.assertLogs('spotterbase.plugins.arxiv.arxmliv', 'WARNING'):
+                    with document.open_binary() as fp:
+                        self.assertEqual(fp.read(), b'<html>1234/1234.0002.html</html>')
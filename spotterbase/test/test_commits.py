@@ -0,0 +1,43 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from spotterbase.spotters.commits import CommitLog, sync_file
+from spotterbase.spotters.spotter_runner import RunnerTtlSerializer
+
+
+def _append(path: Path, text: str):
+    with open(path, 'a') as fp:
+        fp.write(text)
+
+
+class TestCommits(unittest.TestCase):
+    def test_recover(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            results = directory / 'spotter.ttl.gz'
+            processed_docs = directory / 'processed_docs.txt'
+            serializer = RunnerTtlSerializer(results)
+            commit_log = CommitLog(directory)
+            for i in range(2):
+                serializer.fp.write(f'# document {i}\n')
+                _append(processed_docs, f'http://example.org/doc{i}\n')
+                commit_log.commit({results.name: serializer.commit(), processed_docs.name: sync_file(processed_docs)})
+            # simulate a process that was killed in the middle of a commit
+            serializer.fp.write('# document 2\n')
+            serializer.commit()
+            serializer.close()
+            with open(results, 'ab') as fp:
+                fp.write(gzip.compress(b'# document 3\n')[:10])
+            _append(processed_docs, 'http://example.org/doc2\n')
+            _append(commit_log.path, '{"seq": 2, "fil')
+
+            commit_log = CommitLog(directory)
+            commit = commit_log.recover()
+            assert commit is not None
+            self.assertEqual(commit.sequence_number, 1)
+            # (the results start with the prefixes)
+            self.assertTrue(gzip.decompress(results.read_bytes()).endswith(b'\n# document 0\n# document 1\n'))
+            self.assertEqual(processed_docs.read_text(), 'http://example.org/doc0\nhttp://example.org/doc1\n')
+            self.assertEqual(commit_log.commit(commit.file_lengths).sequence_number, 2)
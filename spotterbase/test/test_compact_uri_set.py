@@ -0,0 +1,16 @@
+import unittest
+
+from spotterbase.utils.compact_uri_set import CompactUriSet
+
+
+class TestCompactUriSet(unittest.TestCase):
+    def test_add_and_update(self):
+        uri_set = CompactUriSet(min_merge_size=4)
+        uris = [f'http://example.org/doc{i}' for i in range(100)]
+        for uri in uris[:50]:
+            self.assertTrue(uri_set.add(uri))
+        self.assertFalse(uri_set.add(uris[0]))
+        uri_set.update(uris[25:] + uris[:10])
+        self.assertEqual(len(uri_set), 100)
+        self.assertTrue(all(uri in uri_set for uri in uris))
+        self.assertNotIn('http://example.org/doc100', uri_set)
@@ -1,10 +1,12 @@
 import unittest
 
 from spotterbase.corpora.interface import Corpus, Document
+from spotterbase.corpora.prefetch import prefetch_documents
 from spotterbase.corpora.resolver import Resolver
 from spotterbase.corpora.test_corpus import TEST_CORPUS_URI
 from spotterbase.plugins.arxiv.arxmliv import ArXMLivUris
 from spotterbase.rdf.uri import Uri
+from spotterbase.test import InMemoryDocument
 
 
 class TestDnm(unittest.TestCase):
@@ -16,3 +18,24 @@ class TestDnm(unittest.TestCase):
     def test_resolver_get_document(self):
         self.assertIsInstance(Resolver.get_document(TEST_CORPUS_URI / 'paperA'), Document)
         self.assertIsNone(Resolver.get_document(Uri('http://not-a-real-corpus.org/not-a-real-document')))
+
+    def test_prefetch(self):
+        for depth, memory_limit in [(0, 0), (2, 1), (4, 2 ** 20), (4, 2500)]:
+            with self.subTest(depth=depth, memory_limit=memory_limit):
+                documents = [InMemoryDocument(Uri(f'http://example.org/doc{i}'), f'<p>{i}</p>'.encode() + b' ' * 1000)
+                             for i in range(10)]
+                max_bytes_held = 0
+                for i, document in enumerate(prefetch_documents(documents, depth, memory_limit)):
+                    self.assertIs(document, documents[i])
+                    max_bytes_held = max(max_bytes_held, sum(len(d._prefetched_content) for d in documents
+                                                             if d._prefetched_content is not None))
+                    if i % 2:   # the prefetched content of the other documents is not used
+                        self.assertEqual(document.get_html_tree(cached=False).xpath('string(//p)'), str(i))
+                self.assertLessEqual(max_bytes_held, max(memory_limit, len(documents[0].read_binary())))
+                self.assertEqual(max_bytes_held > 0, depth > 0)
+                # unused contents are discarded
+                self.assertEqual([d._prefetched_content for d in documents], [None] * len(documents))
+
+    def test_utf8_without_charset_declaration(self):
+        document = InMemoryDocument(Uri('http://example.org/doc'), '<html><body><p>Grüße €</p></body></html>'.encode())
+        self.assertEqual(document.get_html_tree(cached=False).xpath('string(//p)'), 'Grüße €')
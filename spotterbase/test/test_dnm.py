@@ -1,8 +1,11 @@
 import io
 import unittest
+from unittest import mock
 
 from lxml import etree
 
+from spotterbase.corpora.test_corpus import TEST_CORPUS
+from spotterbase.dnm.defaults import get_arxmliv_dnm_factory
 from spotterbase.dnm.dnm import Dnm
 from spotterbase.dnm.node_based_dnm_factory import TextExtractingNP, SkippingNP, ReplacingNP, NodeBasedDnmFactory
 from spotterbase.dnm.replacement_pattern import StandardReplacementPattern, CategoryStyle
@@ -66,6 +69,60 @@ class TestDnm(GraphTestMixin, unittest.TestCase):
         self.assertEqual((DNM_3.get_start_refs(), DNM_3.get_end_refs()),
                          (DNM_3_NODEBASED.get_start_refs(), DNM_3_NODEBASED.get_end_refs()))
 
+    def test_compact_refs(self):
+        dom = etree.parse(io.StringIO('<a>AB<x>CD</x>E<y>FG</y>H</a>')).getroot()
+        dnm = SimpleDnmFactory(nodes_to_replace={'x': '', 'y': 'YZ'}, compact_refs=True).anonymous_dnm_from_node(dom)
+        self.assertIsInstance(dnm.get_start_refs(), memoryview)
+        self.assertEqual(str(dnm), str(DNM_3))
+        self.assertEqual((list(dnm.get_start_refs()), list(dnm.get_end_refs())),
+                         (DNM_3.get_start_refs(), DNM_3.get_end_refs()))
+        # sub-DNMs share the underlying array
+        self.assertIs(dnm[1:4].get_start_refs().obj, dnm.get_start_refs().obj)   # type: ignore
+        self.assertEqual(dnm.get_indices_from_ref_range(9, 10), DNM_3.get_indices_from_ref_range(9, 10))
+        replaced = dnm.replacements_at_positions([(0, 2, 'ab')], positions_are_references=False)
+        self.assertIsInstance(replaced.get_start_refs(), memoryview)
+
+    def test_overlapping_replacements(self):
+        dnm = DNM_2.replacements_at_positions([(3, 5, 'Y'), (0, 2, 'X'), (1, 4, 'Z')], positions_are_references=False)
+        self.assertEqual(str(dnm), 'XZYf')
+        self.assertEqual(list(dnm.get_start_refs()), [1, 2, 4, 6])
+        self.assertEqual(list(dnm.get_end_refs()), [3, 5, 6, 7])
+
+    def test_compiled_factory_matches_node_based(self):
+        for options in [{}, {'normalize_white_space': False}, {'keep_titles': False, 'number_replacements': False}]:
+            for document in TEST_CORPUS:
+                with self.subTest(options=options, document=document.get_uri()):
+                    expected = get_arxmliv_dnm_factory(**options).dnm_from_document(document)
+                    actual = get_arxmliv_dnm_factory(compiled=True, **options).dnm_from_document(document)
+                    self.assertEqual(str(actual), str(expected))
+                    self.assertEqual((actual.get_start_refs(), actual.get_end_refs()),
+                                     (expected.get_start_refs(), expected.get_end_refs()))
+                    self.assertEqual(
+                        [(r, rng.start, rng.end, a.uri) for r, rng, a in actual.get_meta_info().embedded_annotations],
+                        [(r, rng.start, rng.end, a.uri) for r, rng, a in expected.get_meta_info().embedded_annotations]
+                    )
+
+    def test_compiled_factory_beyond_offset_array(self):
+        document = TEST_CORPUS.get_document(TEST_CORPUS.get_uri() / 'paperA')
+        expected = get_arxmliv_dnm_factory().dnm_from_document(document)
+        with mock.patch('spotterbase.dnm.compiled_dnm_factory._MAX_OFFSET_ARRAY_SIZE', 1000):
+            factory = get_arxmliv_dnm_factory(compiled=True)
+            actual = factory.dnm_from_document(document)
+        self.assertEqual((actual.get_start_refs(), actual.get_end_refs()),
+                         (expected.get_start_refs(), expected.get_end_refs()))
+
+    def test_shared_dnm(self):
+        document = TEST_CORPUS.get_document(TEST_CORPUS.get_uri() / 'paperA')
+        factory = get_arxmliv_dnm_factory()
+        self.assertIsNot(factory.dnm_from_document(document), factory.dnm_from_document(document))
+        dnm = factory.dnm_from_document(document, cached=True)
+        self.assertIs(factory.dnm_from_document(document, cached=True), dnm)
+        self.assertIsNot(get_arxmliv_dnm_factory().dnm_from_document(document, cached=True), dnm)
+        document.release_artifacts()
+        self.assertFalse(document.has_cached_tree())
+        self.assertIsNot(factory.dnm_from_document(document, cached=True), dnm)
+        self.assertEqual(str(factory.dnm_from_document(document, cached=True)), str(dnm))
+
     def test_dom_range_to_dnm_range(self):
         for dnm, selector, expected_from, expected_to, expected_str in [
             (DNM_3, OffsetSelector(start=1, end=3), 0, 2, 'AB'),
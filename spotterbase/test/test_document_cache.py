@@ -0,0 +1,56 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from lxml import etree
+
+from spotterbase.corpora.document_cache import _PersistentDocumentCache, DocumentData
+from spotterbase.rdf.uri import Uri
+from spotterbase.selectors.offset_converter import OffsetConverter
+
+_CONTENT = b'<html><body><p id="p1">a<b>b</b></p><p id="p2">c</p></body></html>'
+
+
+def _parse(content: bytes) -> etree._ElementTree:
+    return etree.parse(io.BytesIO(content), etree.HTMLParser(encoding='utf-8'))
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = _PersistentDocumentCache(Path(self.tmp_dir.name))
+
+    def tearDown(self):
+        self.cache._require_cache().close()
+        self.tmp_dir.cleanup()
+
+    def test_hit_and_miss(self):
+        uri = Uri('http://example.org/doc')
+        key = self.cache.get_key(uri, _CONTENT)
+        root = _parse(_CONTENT).getroot()
+        self.assertIsNone(self.cache.get(key, root))
+        self.cache.put(key, DocumentData(OffsetConverter(root), {'p1': root.xpath('//p')[0]}))  # type: ignore
+
+        # a re-parsed DOM gets the same offsets
+        new_root = _parse(_CONTENT).getroot()
+        data = self.cache.get(key, new_root)
+        assert data is not None
+        self.assertIs(data.node_by_id['p1'], new_root.xpath('//p')[0])  # type: ignore
+        self.assertEqual(data.offset_converter.to_bytes(), OffsetConverter(new_root).to_bytes())
+
+        # changed documents get a different key
+        changed_content = _CONTENT.replace(b'c</p>', b'cd</p><p>e</p>')
+        changed_key = self.cache.get_key(uri, changed_content)
+        self.assertNotEqual(changed_key, key)
+        self.assertIsNone(self.cache.get(changed_key, _parse(changed_content).getroot()))
+        # data that does not match the DOM is ignored
+        with self.assertLogs('spotterbase.corpora.document_cache', 'WARNING'):
+            self.assertIsNone(self.cache.get(key, _parse(changed_content).getroot()))
+
+    def test_forked_process(self):
+        cache = self.cache._require_cache()
+        self.cache._pid = -1     # pretend that we are in a forked process
+        self.assertIsNot(self.cache._require_cache(), cache)
+        self.assertEqual(self.cache._inherited_caches, [cache])
+        cache.close()
@@ -0,0 +1,28 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from spotterbase.data.mapped_zip import MappedZipArchives, ZipMemberInfo
+
+
+class TestMappedZip(unittest.TestCase):
+    def test_read_member(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            archive = Path(tmp_dir) / 'archive.zip'
+            content = 'Tschüss\n'.encode('utf-8') * 1000
+            with zipfile.ZipFile(archive, 'w') as zf:
+                zf.writestr('stored.html', content, compress_type=zipfile.ZIP_STORED)
+                zf.writestr('dir/deflated-ä.html', content, compress_type=zipfile.ZIP_DEFLATED)
+                members = {zip_info.filename: ZipMemberInfo.from_zip_info(zip_info) for zip_info in zf.infolist()}
+
+            archives = MappedZipArchives()
+            stored = archives.read_member(archive, members['stored.html'])
+            self.assertIsInstance(stored, memoryview)
+            self.assertEqual(stored, content)
+            self.assertEqual(archives.read_member(archive, members['dir/deflated-ä.html']), content)
+
+            with self.assertRaises(zipfile.BadZipFile):
+                archives.read_member(archive, members['stored.html']._replace(header_offset=1))
+            with self.assertRaises(zipfile.BadZipFile):
+                archives.read_member(archive, members['stored.html']._replace(crc=0))
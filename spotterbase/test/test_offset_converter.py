@@ -78,3 +78,43 @@ class TestOffsetConverter(unittest.TestCase):
                 dom_point = conv.get_dom_point(text_offset, OffsetType.Text, is_start)
                 self.assertEqual(conv.get_offset(dom_point, OffsetType.NodeText), node_text_offset)
                 # self.assertEqual(conv.get_offset(dom_point, OffsetType.Text), text_offset)
+
+    def test_bulk_dom_points(self):
+        tree = etree.parse(io.StringIO('<p>x<emph><b>yz</b></emph>ab<c/>d</p>'))
+        conv = OffsetConverter(tree.getroot())
+        offsets = [13, 0, 7, 3, 9, 3, 12, 1]
+        self.assertEqual(conv.get_dom_points(offsets, OffsetType.NodeText),
+                         [conv.get_dom_point(offset, OffsetType.NodeText) for offset in offsets])
+        offsets = [5, 1, 3, 2, 4]
+        for is_start in [True, False]:
+            self.assertEqual(conv.get_dom_points(offsets, OffsetType.Text, is_start),
+                             [conv.get_dom_point(offset, OffsetType.Text, is_start) for offset in offsets])
+
+    def test_serialization(self):
+        source = '<p>x<emph><b>yz</b><!-- c --></emph>ab<c/>d</p>'
+        conv = OffsetConverter(etree.parse(io.StringIO(source)).getroot())
+        tree = etree.parse(io.StringIO(source))   # a re-parsed DOM
+        restored = OffsetConverter.from_bytes(tree.getroot(), conv.to_bytes())
+        for node in tree.getroot().iter('*'):
+            self.assertEqual(restored.get_offset_data(node),
+                             conv.get_offset_data(conv.get_node_at_pre_order_index(restored.get_pre_order_index(node))))
+        for offset in range(15):
+            self.assertEqual(repr(restored.get_dom_point(offset, OffsetType.NodeText)),
+                             repr(conv.get_dom_point(offset, OffsetType.NodeText)))
+        with self.assertRaises(ValueError):
+            OffsetConverter.from_bytes(etree.parse(io.StringIO('<p>x</p>')).getroot(), conv.to_bytes())
+
+    def test_comments_and_deep_nesting(self):
+        tree = etree.parse(io.StringIO('<p>x<!-- comment -->y<b>z</b></p>'))
+        conv = OffsetConverter(tree.getroot())
+        b_offs = conv.get_offset_data(get_xpath_node(tree, '/p/b[1]'))
+        self.assertEqual(b_offs.text_offset_before, 2)     # the tail of the comment is counted
+        self.assertEqual(b_offs.node_text_offset_before, 3)
+
+        root = node = etree.Element('a')
+        for _ in range(5000):   # deeper than the recursion limit
+            node = etree.SubElement(node, 'a')
+        node.text = 'x'
+        conv = OffsetConverter(root)
+        self.assertEqual(conv.get_offset_data(node).text_offset_after, 1)
+        self.assertEqual(conv.get_dom_point(5001, OffsetType.NodeText), DomPoint(node, text_offset=0))
@@ -0,0 +1,39 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from spotterbase.utils import progress_updater
+from spotterbase.utils.progress_updater import ProgressUpdater, FixedDelay
+
+
+class TestProgressUpdater(unittest.TestCase):
+    def test_rates_and_json_log(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = Path(tmp_dir) / 'progress.jsonl'
+            progress_updater.PROGRESS_LOG.value = log_file
+            try:
+                updater = ProgressUpdater('{progress} documents', timer_strategy=FixedDelay(-1), total=100,
+                                          unit='documents')
+                updater.start_time -= 10
+                updater.last_message -= 10
+                with self.assertLogs(progress_updater.logger):
+                    updater.update(20, bytes=2000, elapsed=5)
+                self.assertAlmostEqual(updater.rates['documents'], 2, places=1)
+                self.assertAlmostEqual(updater.get_eta(20) or 0, 40, delta=1)
+                with self.assertLogs(progress_updater.logger):
+                    updater.finish(100, bytes=10000)
+                entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+            finally:
+                progress_updater.PROGRESS_LOG.value = None
+        self.assertEqual([entry['progress'] for entry in entries], [20, 100])
+        self.assertEqual(entries[0]['total'], 100)
+        # quantities cannot overwrite the other entries
+        self.assertEqual(entries[0]['quantities'], {'bytes': 2000, 'elapsed': 5})
+        self.assertAlmostEqual(entries[0]['elapsed'], 10, delta=1)
+        self.assertTrue(entries[1]['final'])
+
+    def test_quantity_named_like_unit(self):
+        updater = ProgressUpdater('{progress} documents', timer_strategy=FixedDelay(-1), unit='documents')
+        with self.assertRaises(ValueError):
+            updater.update(1, documents=2)
@@ -1,6 +1,8 @@
 import unittest
+from unittest import mock
 
-from spotterbase.evaluate.rangecmp import OffsetEquis, OffsetEquiConfig
+from spotterbase.evaluate.annocollection import AnnoCollection
+from spotterbase.evaluate.rangecmp import OffsetEquis, OffsetEquiConfig, RangeMatching
 from spotterbase.rdf import Uri
 from spotterbase.test import InMemoryDocument
 
@@ -10,3 +12,22 @@ class TestDocumentation(unittest.TestCase):
         document = InMemoryDocument(Uri('file:///test'), b'<html><body>ab<c></c>d</body></html>')
         oe = OffsetEquis.from_doc_simple(document, OffsetEquiConfig(set(), set()))
         self.assertEqual(len(oe.invis), 3)   # tag clusters
+
+    def test_documents_are_pinned(self):
+        document = InMemoryDocument(Uri('file:///test'), b'<html><body>ab<c></c>d</body></html>')
+        collection = AnnoCollection({document.get_uri(): []})
+        pins: list[int] = []
+
+        def from_doc_simple(doc, config):
+            pins.append(doc._pins)
+            doc.get_html_tree(cached=True)
+            raise ValueError()
+
+        with mock.patch('spotterbase.evaluate.rangecmp.Resolver.get_document', return_value=document), \
+                mock.patch.object(OffsetEquis, 'from_doc_simple', side_effect=from_doc_simple):
+            with self.assertRaises(ValueError):
+                RangeMatching.from_anno_collections(collection, collection, OffsetEquiConfig(set(), set()))
+        # the document is pinned while it is compared and released afterwards (even if there is an exception)
+        self.assertEqual(pins, [1])
+        self.assertEqual(document._pins, 0)
+        self.assertIsNone(document._html_tree)
@@ -8,7 +8,7 @@ import rdflib
 from lxml import etree
 
 from spotterbase.model_core.sb import SB_JSONLD_CONTEXT
-from spotterbase.rdf.literal import Literal, HtmlFragment
+from spotterbase.rdf.literal import Literal, HtmlFragment, LazyHtmlFragment
 from spotterbase.rdf.bnode import BlankNode, counter_factory
 from spotterbase.rdf.uri import NameSpace, Vocabulary, Uri
 from spotterbase.rdf.namespace_collection import NameSpaceCollection
@@ -141,3 +141,10 @@ mv:thingA mv:someRel mv:thingA,
         l = Literal.from_py_val(f)
         self.assertEqual(l.to_turtle(),
                          '"<a><b>x</b>y<c>z</c></a>"^^<http://www.w3.org/1999/02/22-rdf-syntax-ns#HTML>')
+
+    def test_lazy_html_literal(self):
+        root = etree.parse(io.StringIO('<a><b>x</b>y<c>z</c></a>')).getroot()
+        f = LazyHtmlFragment(root[0], strip_tail=True)
+        self.assertEqual(Literal.from_py_val(f).string, '<b>x</b>')
+        self.assertEqual(len(f.get_wrapped_lxml_element()), 1)
+        self.assertEqual(len(root), 2)   # the original DOM is unchanged
@@ -0,0 +1,59 @@
+import unittest
+from typing import Optional
+
+from spotterbase.corpora.interface import Document
+from spotterbase.rdf import Uri
+from spotterbase.spotters.limits import DocumentLimitExceeded
+from spotterbase.spotters.scheduling import AdaptiveScheduler, BatchResult
+from spotterbase.test import InMemoryDocument
+
+
+def _make_documents(sizes: list[int]) -> list[Document]:
+    return [InMemoryDocument(Uri(f'http://example.org/doc{i}'), b'x' * size) for i, size in enumerate(sizes)]
+
+
+class _ArchivedDocument(InMemoryDocument):
+    def __init__(self, uri: Uri, content: bytes, archive: str, position: int):
+        super().__init__(uri, content)
+        self.archive = archive
+        self.position = position
+
+    def get_archive_location(self) -> Optional[tuple[str, int]]:
+        return self.archive, self.position
+
+
+class TestScheduling(unittest.TestCase):
+    def test_large_documents_first(self):
+        scheduler = AdaptiveScheduler(initial_batch_size=2)
+        batches = list(scheduler.batches(_make_documents([10, 50, 20, 40, 30])))
+        self.assertEqual([batch.sizes for batch in batches], [[50, 40], [30, 20], [10]])
+
+    def test_adaptive_batch_size(self):
+        scheduler = AdaptiveScheduler(target_batch_duration=1.0, initial_batch_size=1)
+        batches = scheduler.batches(_make_documents([100] * 20))
+        batch = next(batches)
+        # 0.25 seconds per document -> 4 documents per batch
+        scheduler.record(batch, BatchResult([None], pid=1, busy_time=0.25))
+        self.assertEqual(len(next(batches).documents), 4)
+        self.assertEqual(scheduler.documents_by_pid, {1: 1})
+
+    def test_failures(self):
+        def process(document: Document) -> str:
+            if document.get_uri() == Uri('http://example.org/doc1'):
+                raise DocumentLimitExceeded('time limit exceeded')
+            return str(document.get_uri())
+
+        result = BatchResult.compute(process, _make_documents([1, 2, 3]))
+        self.assertEqual(result.results, ['http://example.org/doc0', 'http://example.org/doc2'])
+        self.assertEqual([failure.doc_uri for failure in result.failures], ['http://example.org/doc1'])
+
+    def test_archive_locality(self):
+        documents: list[Document] = [
+            _ArchivedDocument(Uri(f'http://example.org/archived{i}'), b'x' * 10, archive, position)
+            for i, (archive, position) in enumerate([('a.zip', 30), ('b.zip', 10), ('a.zip', 10), ('a.zip', 20)])
+        ]
+        documents += _make_documents([5, 50])
+        scheduler = AdaptiveScheduler(initial_batch_size=2)
+        batches = [[document.get_uri().relative_to('http://example.org/') for document in batch.documents]
+                   for batch in scheduler.batches(documents)]
+        self.assertEqual(batches, [['archived2', 'archived3'], ['archived0'], ['archived1'], ['doc1', 'doc0']])
@@ -1,11 +1,13 @@
+import gc
 import io
 import unittest
+import weakref
 
 from lxml import etree
 from spotterbase.model_core.selector import PathSelector
 
 from spotterbase.selectors.dom_range import DomPoint, DomRange
-from spotterbase.selectors.offset_converter import OffsetConverter
+from spotterbase.selectors.offset_converter import OffsetConverter, OffsetType
 from spotterbase.selectors.selector_converter import SelectorConverter
 from spotterbase.rdf.uri import Uri
 
@@ -45,3 +47,55 @@ class TestSelectorConverter(unittest.TestCase):
         selector = converter.dom_to_path_selector(dom_range)
         self.assertEqual(selector.start, 'char(/a/b,0)')
         self.assertEqual(selector.end, 'char(/a/b,2)')
+
+    def test_cached_paths(self):
+        dom = etree.parse(io.StringIO('<a><b/><c><!--x--><b/><b/></c><d xmlns="http://example.org"><b/></d></a>'))
+        converter = SelectorConverter(Uri('http://example.org'), dom.getroot(), OffsetConverter(dom.getroot()))
+        for node in reversed(list(dom.getroot().iter())):
+            self.assertEqual(converter.get_path(node), dom.getpath(node))
+
+        dom_ranges = [DomRange.from_node(node) for node in dom.xpath('//b')]   # type: ignore
+        selectors = converter.dom_ranges_to_selectors(dom_ranges)
+        self.assertEqual([(s.start, s.end) for s, _ in selectors],   # type: ignore
+                         [(f'node({dom.getpath(r.start.node)})', f'after-node({dom.getpath(r.end.node)})')
+                          for r in dom_ranges])
+
+    def test_batch_selectors(self):
+        dom = etree.parse(io.StringIO('<a>x<b>yz</b>uv<c><b/>w</c>t</a>'))
+        offset_converter = OffsetConverter(dom.getroot())
+        converter = SelectorConverter(Uri('http://example.org'), dom.getroot(), offset_converter)
+        max_offset = offset_converter.get_offset_data(dom.getroot()).node_text_offset_after
+        dom_ranges = [DomRange(offset_converter.get_dom_point(start, OffsetType.NodeText),
+                               offset_converter.get_dom_point(end, OffsetType.NodeText))
+                      for start in range(max_offset) for end in range(start + 1, max_offset + 1)]
+        expected = [converter.dom_to_selectors(dom_range) for dom_range in dom_ranges]
+        actual = converter.dom_ranges_to_selectors(dom_ranges)
+        self.assertEqual([[(s.start, s.end) for s in selectors] for selectors in actual],  # type: ignore
+                         [[(s.start, s.end) for s in selectors] for selectors in expected])  # type: ignore
+
+    def test_xpath_resolution(self):
+        dom = etree.parse(io.StringIO('<a><b/><c><b/><b>x</b></c><d xmlns="http://example.org"><b/></d></a>'))
+        converter = SelectorConverter(Uri('http://example.org'), dom.getroot(), OffsetConverter(dom.getroot()))
+        for node in dom.getroot().iter():
+            self.assertIs(converter.selector_to_dom(PathSelector(start=f'node({dom.getpath(node)})',
+                                                                 end=f'after-node({dom.getpath(node)})'))[0].start.node,
+                          node)
+        # non-canonical XPaths are still supported
+        dom_range, _ = converter.selector_to_dom(PathSelector(start='char(//c/b[2],0)', end='char(//c/b[2],1)'))
+        self.assertEqual(dom_range.start.node.text, 'x')
+        for invalid_xpath in ['/a/c/b', '/a/c/b[3]', '/a[2]']:
+            with self.assertRaises(Exception):
+                converter.selector_to_dom(PathSelector(start=f'node({invalid_xpath})', end='node(/a)'))
+
+    def test_no_reference_cycles(self):
+        # converters (and their DOMs) should be freed without waiting for the cyclic garbage collector
+        dom = etree.parse(io.StringIO('<a><b/><c><b/></c></a>'))
+        converter = SelectorConverter(Uri('http://example.org'), dom.getroot(), OffsetConverter(dom.getroot()))
+        converter.selector_to_dom(PathSelector(start='node(//c/b)', end='after-node(/a/c/b)'))
+        reference = weakref.ref(converter)
+        gc.disable()
+        try:
+            del converter
+            self.assertIsNone(reference())
+        finally:
+            gc.enable()
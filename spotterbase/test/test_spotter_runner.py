@@ -0,0 +1,133 @@
+import gzip
+import json
+import signal
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from spotterbase.corpora.interface import Document
+from spotterbase.rdf import Uri, TripleI
+from spotterbase.rdf.literal import Literal
+from spotterbase.rdf.vocab import RDFS
+from spotterbase.spotters import spotter_runner
+from spotterbase.spotters.limits import DocumentLimits
+from spotterbase.spotters.shards import merge_shards, MANIFEST_FILE_NAME
+from spotterbase.spotters.spotter import Spotter
+from spotterbase.spotters.spotter_runner import _ProcessedDocTracker
+from spotterbase.test import InMemoryDocument
+
+
+class _LengthSpotter(Spotter):
+    spotter_short_id = 'length'
+
+    def process_document(self, document: Document) -> TripleI:
+        yield document.get_uri(), RDFS.label, Literal.from_py_val(len(document.read_binary()))
+
+
+class _SlowSpotter(_LengthSpotter):
+    """ Exceeds the time limit for some documents """
+    def process_document(self, document: Document) -> TripleI:
+        if str(document.get_uri()).endswith('/slow'):
+            time.sleep(30)
+        elif str(document.get_uri()).endswith('/stuck'):
+            # the alarm cannot interrupt it, so the worker process has to be terminated
+            signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+            time.sleep(30)
+        yield from super().process_document(document)
+
+
+def _make_documents(n: int) -> list[Document]:
+    return [InMemoryDocument(Uri(f'http://example.org/doc{i}'), b'<p>' + b'x' * i + b'</p>') for i in range(n)]
+
+
+def _read_triples(path: Path) -> list[str]:
+    with gzip.open(path, 'rt') as fp:
+        return sorted(line for line in fp if line.strip() and not line.startswith(('#', '@prefix')))
+
+
+class TestSpotterRunner(unittest.TestCase):
+    def test_processed_doc_tracker(self):
+        documents = [InMemoryDocument(Uri(f'http://example.org/doc{i}'), b'') for i in range(5)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir) / 'processed_docs.txt'
+            with _ProcessedDocTracker(file) as tracker:
+                tracker.add(documents[0].get_uri())
+                tracker.add(documents[1].get_uri())
+            # simulate a process that was killed while writing
+            with open(file, 'a') as fp:
+                fp.write('http://example.org/do')
+
+            tracker = _ProcessedDocTracker(file)
+            self.assertEqual(tracker.number_of_previously_processed_docs, 2)
+            self.assertEqual(file.read_text(), 'http://example.org/doc0\nhttp://example.org/doc1\n')
+            self.assertEqual([document.get_uri() for document in tracker.filter_documents(documents + documents)],
+                             [document.get_uri() for document in documents[2:]])
+
+    def test_sharded_run_and_merge(self):
+        documents = _make_documents(20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            spotter_runner.run([_LengthSpotter], documents, corpus_descr='test', directory=directory / 'normal')
+            spotter_runner.run([_LengthSpotter], documents, corpus_descr='test', directory=directory / 'sharded',
+                               sharded_output=True)
+            self.assertTrue(list((directory / 'sharded').glob('length-shard-*.ttl.gz')))
+            merge_shards(directory / 'sharded')
+
+            self.assertEqual(list((directory / 'sharded').glob('length-shard-*.ttl.gz')), [])
+            self.assertFalse((directory / 'sharded' / MANIFEST_FILE_NAME).exists())
+            expected = _read_triples(directory / 'normal' / 'length.ttl.gz')
+            self.assertEqual(len(expected), 20)
+            self.assertEqual(_read_triples(directory / 'sharded' / 'length.ttl.gz'), expected)
+
+    def test_timings_with_several_processes(self):
+        documents = _make_documents(20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            timings = {}
+            for number_of_processes in [1, 3]:
+                with mock.patch.object(spotter_runner.NUMBER_OF_PROCESSES, 'value', number_of_processes):
+                    spotter_runner.run([_LengthSpotter], documents, corpus_descr='test',
+                                       directory=directory / str(number_of_processes), collect_timings=True)
+                with open(directory / str(number_of_processes) / 'timings.json') as fp:
+                    timings[number_of_processes] = json.load(fp)
+            # the statistics that the workers inherited from the main process must not be counted again
+            self.assertEqual(timings[3]['commit']['count'], timings[1]['commit']['count'])
+            self.assertEqual(timings[3]['write_results']['count'], 20)
+
+    def test_document_limits(self):
+        documents = _make_documents(10)
+        documents.insert(3, InMemoryDocument(Uri('http://example.org/slow'), b'<p>slow</p>'))
+        documents.insert(7, InMemoryDocument(Uri('http://example.org/stuck'), b'<p>stuck</p>'))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            spotter_runner.run([_SlowSpotter], documents, corpus_descr='test', directory=directory,
+                               limits=DocumentLimits(timeout=0.5))
+            failed_docs = (directory / 'failed_docs.txt').read_text().splitlines()
+            self.assertEqual(sorted(line.split('\t')[0] for line in failed_docs),
+                             ['http://example.org/slow', 'http://example.org/stuck'])
+            self.assertEqual(len(_read_triples(directory / 'length.ttl.gz')), 10)
+            self.assertEqual(len((directory / 'processed_docs.txt').read_text().splitlines()), 10)
+
+    def test_resume_after_crash(self):
+        documents = _make_documents(20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            spotter_runner.run([_LengthSpotter], documents[:10], corpus_descr='test', directory=directory)
+            # simulate a process that was killed after writing some (uncommitted) data
+            with open(directory / 'length.ttl.gz', 'ab') as fp:
+                fp.write(gzip.compress(b'<http://example.org/doc10> rdfs:label 15 .\n'))
+                fp.write(gzip.compress(b'<http://example.org/doc11> rdfs:label 16 .\n')[:20])
+            with open(directory / 'processed_docs.txt', 'a') as fp:
+                fp.write('http://example.org/doc10\nhttp://example.org/do')
+            with open(directory / 'failed_docs.txt', 'a') as fp:
+                fp.write('http://example.org/doc12\ttime limit exceeded\n')
+
+            spotter_runner.run([_LengthSpotter], documents, corpus_descr='test', directory=directory)
+            triples = _read_triples(directory / 'length.ttl.gz')
+            self.assertEqual(len(triples), 20)
+            self.assertEqual(len(set(triples)), 20)
+            self.assertEqual(sorted((directory / 'processed_docs.txt').read_text().splitlines()),
+                             sorted(str(document.get_uri()) for document in documents))
+            self.assertEqual((directory / 'failed_docs.txt').read_text(), '')
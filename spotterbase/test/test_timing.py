@@ -0,0 +1,30 @@
+import unittest
+
+from spotterbase.utils import timing
+from spotterbase.utils.timing import timed, StageStatistics
+
+
+class TestTiming(unittest.TestCase):
+    def tearDown(self):
+        timing.disable()
+        timing.collect()
+
+    def test_disabled(self):
+        with timed('stage'):
+            pass
+        self.assertEqual(timing.collect(), {})
+
+    def test_statistics(self):
+        timing.enable()
+        for _ in range(3):
+            with timed('stage'):
+                pass
+        other = StageStatistics()
+        other.add(0.5)
+        timing.merge({'stage': other})
+        statistics = timing.collect()['stage']
+        self.assertEqual(statistics.count, 4)
+        self.assertEqual(statistics.max, 0.5)
+        self.assertEqual(sum(statistics.histogram.values()), 4)
+        self.assertEqual(timing.to_json({'stage': other})['stage']['histogram'], {'<524.288ms': 1})
+        self.assertEqual(timing.collect(), {})
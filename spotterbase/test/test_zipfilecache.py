@@ -0,0 +1,47 @@
+import io
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from spotterbase.data.zipfilecache import ZipFileCache, ZipFileCacheStatistics
+
+
+class TestZipFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths: list[Path] = []
+        for i in range(3):
+            path = Path(self.tmp_dir.name) / f'archive{i}.zip'
+            with zipfile.ZipFile(path, 'w') as zf:
+                zf.writestr('file.txt', f'content {i}\n')
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lru(self):
+        cache = ZipFileCache(max_open=2)
+        member = cache.open_member(self.paths[0], 'file.txt')
+        zf0 = cache[self.paths[0]]
+        cache[self.paths[1]]
+        cache[self.paths[0]]        # now archive1 is the least recently used one
+        cache[self.paths[2]]
+        self.assertEqual([Path(name).name for name in cache.zipfiles], ['archive0.zip', 'archive2.zip'])
+
+        cache[self.paths[1]]        # evicts archive0, which is still in use
+        self.assertEqual(cache.statistics, ZipFileCacheStatistics(hits=2, misses=4, evictions=2, deferred_closes=1))
+        self.assertIsNotNone(zf0.fp)
+        with io.TextIOWrapper(member) as fp:
+            self.assertEqual(fp.read(), 'content 0\n')
+        self.assertIsNone(zf0.fp)   # closed together with the last member
+        cache.close()
+
+    def test_forked_process(self):
+        cache = ZipFileCache()
+        zf = cache[self.paths[0]]
+        cache._pid = -1         # pretend that we are in a forked process
+        self.assertIsNot(cache[self.paths[0]], zf)
+        self.assertIsNone(zf.fp)
+        self.assertEqual(cache.statistics.misses, 1)
+        cache.close()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import heapq
+import itertools
+from array import array
+from typing import Iterable, Iterator
+
+
+class CompactUriSet:
+    """ A memory-efficient set of URIs (or other strings), e.g. for keeping track of millions of documents.
+
+    Only 64-bit hashes of the URIs are stored, which means that there can be false positives
+    (the probability is negligible: roughly n² / 2⁶⁵ for n URIs).
+    Most hashes are kept in a sorted array (8 bytes per entry).
+    Recently added hashes are kept in a set, which is merged into the array once it gets large.
+    """
+
+    def __init__(self, min_merge_size: int = 2 ** 16):
+        self._sorted_hashes: array = array('Q')
+        self._recent_hashes: set[int] = set()
+        self.min_merge_size = min_merge_size
+
+    @staticmethod
+    def hash(uri: str) -> int:
+        return int.from_bytes(hashlib.blake2b(uri.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def _contains_hash(self, hash_: int) -> bool:
+        if hash_ in self._recent_hashes:
+            return True
+        i = bisect.bisect_left(self._sorted_hashes, hash_)
+        return i < len(self._sorted_hashes) and self._sorted_hashes[i] == hash_
+
+    def __contains__(self, uri: object) -> bool:
+        return isinstance(uri, str) and self._contains_hash(self.hash(uri))
+
+    def add(self, uri: str) -> bool:
+        """ Adds the URI and returns True if it was not in the set before """
+        hash_ = self.hash(uri)
+        if self._contains_hash(hash_):
+            return False
+        self._recent_hashes.add(hash_)
+        if len(self._recent_hashes) >= max(self.min_merge_size, len(self._sorted_hashes) // 4):
+            self._merge()
+        return True
+
+    def update(self, uris: Iterable[str], chunk_size: int = 2 ** 18):
+        """ Adds many URIs at once (faster than :meth:`add`) """
+        hash_ = self.hash
+        sorted_chunks: list[array] = [self._sorted_hashes, array('Q', sorted(self._recent_hashes))]
+        for chunk in _chunks(uris, chunk_size):
+            sorted_chunks.append(array('Q', sorted(hash_(uri) for uri in chunk)))
+        self._sorted_hashes = array('Q', _unique(heapq.merge(*sorted_chunks)))
+        self._recent_hashes = set()
+
+    def _merge(self):
+        self._sorted_hashes = array('Q', heapq.merge(self._sorted_hashes, sorted(self._recent_hashes)))
+        self._recent_hashes = set()
+
+    def __len__(self) -> int:
+        return len(self._sorted_hashes) + len(self._recent_hashes)
+
+
+def _chunks(iterable: Iterable[str], chunk_size: int) -> Iterator[list[str]]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+def _unique(sorted_values: Iterable[int]) -> Iterator[int]:
+    previous = None
+    for value in sorted_values:
+        if value != previous:
+            yield value
+            previous = value
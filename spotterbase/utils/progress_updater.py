@@ -1,11 +1,16 @@
 import abc
 import dataclasses
 import datetime
+import json
+import logging
 import time
 from typing import Optional
 
+from spotterbase.utils.config_loader import ConfigPath
 
-# TODO: Move this to utils.logging and use a logger instead of print
+logger = logging.getLogger(__name__)
+
+PROGRESS_LOG = ConfigPath('--progress-log', 'file to which progress updates are appended (as JSON lines)')
 
 
 class PrintTimerStrategy(abc.ABC):
@@ -36,23 +41,113 @@ class IncreasingDelay(PrintTimerStrategy):
 
 
 class ProgressUpdater:
-    """ Prints regular messages about the progress of a large task.
+    """ Logs regular messages about the progress of a large task.
+
+     The messages include the throughput (as a moving average) and,
+     if the total is known, the percentage and the estimated remaining time.
+     Additionally, the updates can be appended to a file as JSON lines (``--progress-log``),
+     e.g. for monitoring.
 
      Note that it does not start a background thread and only considers
      creating a log when :meth:`update` is called.
      """
-    def __init__(self, message: str, timer_strategy: Optional[PrintTimerStrategy] = None):
+    def __init__(self, message: str, timer_strategy: Optional[PrintTimerStrategy] = None,
+                 total: Optional[int] = None, unit: str = 'items', smoothing: float = 0.3):
         """ ``message`` should be a string that has a placeholder ``"progress"``.
             For example, ``message`` could be
             :code:`"Progress update: {progress} documents were processed"`.
+            ``unit`` is used for the throughput of the progress (e.g. ``"documents"``).
+            ``smoothing`` is the weight of the latest throughput in the moving average.
         """
         self.message = message
         self.timer_strategy = timer_strategy or FixedDelay(delay_in_secs=5)
-        self.last_message = time.time()
+        self.total = total
+        self.unit = unit
+        self.smoothing = smoothing
+        self.start_time = time.time()
+        self.last_message = self.start_time
+        self._last_values: dict[str, float] = {}
+        self.rates: dict[str, float] = {}   # quantity -> moving average of the throughput (per second)
 
-    def update(self, progress):
-        """ Logs the ``progress`` iff enough time has passed since the last log message."""
+    def update(self, progress: int, **quantities: float):
+        """ Logs the ``progress`` iff enough time has passed since the last log message.
+            ``quantities`` are further cumulative quantities whose throughput should be reported
+            (e.g. ``bytes=...``). """
         now = time.time()
         if now - self.last_message > self.timer_strategy.get_delay_in_sec():
-            self.last_message = now
-            print(datetime.datetime.now().isoformat(), self.message.format(progress=progress))
+            self._log(now, progress, quantities)
+
+    def finish(self, progress: int, **quantities: float):
+        """ Logs the final progress (along with the average throughput) """
+        now = time.time()
+        duration = now - self.start_time
+        self.rates = {name: value / duration for name, value in self._get_values(progress, quantities).items()
+                      if duration > 0}
+        self._log(now, progress, quantities, final=True)
+
+    def _get_values(self, progress: int, quantities: dict[str, float]) -> dict[str, float]:
+        if self.unit in quantities:
+            raise ValueError(f'{self.unit!r} is the unit of the progress and cannot be used for other quantities')
+        values = {self.unit: float(progress)}
+        values.update(quantities)
+        return values
+
+    def _update_rates(self, now: float, values: dict[str, float]):
+        elapsed = now - self.last_message
+        if elapsed <= 0:
+            return
+        for name, value in values.items():
+            rate = (value - self._last_values.get(name, 0.0)) / elapsed
+            if name in self.rates:
+                rate = self.smoothing * rate + (1 - self.smoothing) * self.rates[name]
+            self.rates[name] = rate
+        self._last_values = values
+
+    def get_eta(self, progress: int) -> Optional[float]:
+        """ Returns the estimated remaining time in seconds (if it can be estimated) """
+        rate = self.rates.get(self.unit)
+        if self.total is None or not rate:
+            return None
+        return max(self.total - progress, 0) / rate
+
+    def _log(self, now: float, progress: int, quantities: dict[str, float], final: bool = False):
+        values = self._get_values(progress, quantities)
+        if not final:
+            self._update_rates(now, values)
+        self.last_message = now
+
+        details: list[str] = []
+        if self.total:
+            details.append(f'{100 * progress / self.total:.1f}% of {self.total}')
+        for name, rate in self.rates.items():
+            details.append(f'{_format_quantity(rate, name)}/s')
+        eta = self.get_eta(progress)
+        if eta is not None and not final:
+            details.append(f'ETA {datetime.timedelta(seconds=round(eta))}')
+        message = self.message.format(progress=progress)
+        logger.info(f'{message} ({", ".join(details)})' if details else message)
+
+        if PROGRESS_LOG.value is not None:
+            entry = {
+                'time': datetime.datetime.now().isoformat(),
+                'message': message,
+                'progress': progress,
+                'total': self.total,
+                'elapsed': now - self.start_time,
+                'rates': self.rates,
+                'eta': eta,
+                'final': final,
+                'quantities': quantities,
+            }
+            with open(PROGRESS_LOG.value, 'a') as fp:
+                fp.write(json.dumps(entry) + '\n')
+
+
+def _format_quantity(value: float, name: str) -> str:
+    if name == 'bytes':
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if value < 1000:
+                return f'{value:.1f} {unit}'
+            value /= 1000
+        return f'{value:.1f} TB'
+    return f'{value:.1f} {name}'
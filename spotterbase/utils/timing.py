@@ -0,0 +1,138 @@
+"""
+Instrumentation for finding out where the time goes (e.g. in spotter runs).
+
+Code regions are wrapped in ``with timed('stage name'):``.
+Timing is disabled by default, in which case :func:`timed` returns a shared no-op context manager.
+Once enabled, the durations are aggregated per stage (count, total, min, max and a histogram with
+power-of-two buckets).
+The statistics of different processes can be combined with :func:`merge`.
+
+Stages can be nested (e.g. creating the offset converter may require parsing the document),
+so the times of different stages do not necessarily add up.
+"""
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import math
+import threading
+import time
+from typing import Any, ContextManager, Optional
+
+_enabled: bool = False
+_lock = threading.Lock()
+_NO_OP_TIMER = contextlib.nullcontext()
+
+
+@dataclasses.dataclass
+class StageStatistics:
+    count: int = 0
+    total: float = 0.0      # in seconds
+    min: float = math.inf
+    max: float = 0.0
+    # exponent e -> number of durations d with 2 ** (e - 1) <= d < 2 ** e (in microseconds)
+    histogram: dict[int, int] = dataclasses.field(default_factory=dict)
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        exponent = max(math.frexp(duration * 1e6)[1], 0)
+        self.histogram[exponent] = self.histogram.get(exponent, 0) + 1
+
+    def merge(self, other: StageStatistics):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for exponent, count in other.histogram.items():
+            self.histogram[exponent] = self.histogram.get(exponent, 0) + count
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min if self.count else None,
+            'max': self.max,
+            'histogram': {f'<{_format_duration(2 ** exponent / 1e6)}': count
+                          for exponent, count in sorted(self.histogram.items())},
+        }
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:g}us'
+    if seconds < 1:
+        return f'{seconds * 1e3:g}ms'
+    return f'{seconds:g}s'
+
+
+_statistics: dict[str, StageStatistics] = {}
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self.start
+        with _lock:
+            statistics = _statistics.get(self.stage)
+            if statistics is None:
+                statistics = _statistics[self.stage] = StageStatistics()
+            statistics.add(duration)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def timed(stage: str) -> ContextManager:
+    """ Measures the time spent in the ``with`` block (if timing is enabled) """
+    if not _enabled:
+        return _NO_OP_TIMER
+    return _Timer(stage)
+
+
+def collect(reset: bool = True) -> dict[str, StageStatistics]:
+    """ Returns the statistics recorded so far (in this process) """
+    global _statistics
+    with _lock:
+        statistics = _statistics
+        if reset:
+            _statistics = {}
+        else:
+            statistics = {stage: dataclasses.replace(s, histogram=dict(s.histogram)) for stage, s in statistics.items()}
+    return statistics
+
+
+def merge(statistics: Optional[dict[str, StageStatistics]]):
+    """ Adds statistics (e.g. from another process) to the statistics of this process """
+    if not statistics:
+        return
+    with _lock:
+        for stage, stage_statistics in statistics.items():
+            _statistics.setdefault(stage, StageStatistics()).merge(stage_statistics)
+
+
+def to_json(statistics: dict[str, StageStatistics]) -> dict[str, Any]:
+    return {stage: stage_statistics.to_json() for stage, stage_statistics in sorted(statistics.items())}